@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+"""
+Measure lambda cold starts locally: each run spawns a fresh interpreter that imports a
+handler and invokes it against a stand-in PostgREST server on localhost (canned responses,
+optional injected latency), timing the import, the first (cold) invocation, a warm cache
+miss and a warm cache hit. --sdk also times importing the supabase SDK and creating its
+client, which the handlers used to do at import time, when it is installed.
+"""
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("bench_cold_start")
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+SHARED_DIR = BACKEND_DIR / "shared"
+EVENTS = {
+    "get_articulations": ({"course_id": "1"}, {"course_id": "2"}),
+    "get_courses": ({"inst_id": "7"}, {"inst_id": "8"}),
+    "get_satisfies": ({"cc_course_id": "110"}, {"cc_course_id": "120"}),
+}
+
+# runs in the child interpreter: argv = [lambda dir, shared dir, cold event, warm event]
+HANDLER_DRIVER = """
+import json, os, sys, time
+start = time.perf_counter()
+sys.path[:0] = sys.argv[1:3]
+sys.stdout = open(os.devnull, "w")  # handlers log to stdout
+import lambda_function
+imported = time.perf_counter()
+cold, warm = ({"queryStringParameters": json.loads(arg)} for arg in sys.argv[3:5])
+assert lambda_function.lambda_handler(cold, None)["statusCode"] == 200
+first = time.perf_counter()
+lambda_function.lambda_handler(warm, None)
+miss = time.perf_counter()
+lambda_function.lambda_handler(warm, None)
+hit = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - start) * 1e3,
+    "first_call_ms": (first - imported) * 1e3,
+    "warm_miss_ms": (miss - first) * 1e3,
+    "warm_hit_ms": (hit - miss) * 1e3,
+}), file=sys.stderr)
+"""
+
+SDK_DRIVER = """
+import json, os, sys, time
+start = time.perf_counter()
+from supabase import create_client
+imported = time.perf_counter()
+create_client(supabase_url=os.environ["SUPABASE_URL"], supabase_key=os.environ["SUPABASE_ANON_KEY"])
+created = time.perf_counter()
+print(json.dumps({"import_ms": (imported - start) * 1e3, "create_client_ms": (created - imported) * 1e3}), file=sys.stderr)
+"""
+
+
+def stand_in_server(latency: float) -> ThreadingHTTPServer:
+    """PostgREST stand-in answering the handlers' queries with small canned bodies."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, like PostgREST behind Supabase
+        disable_nagle_algorithm = True  # headers & body are written separately
+
+        def _reply(self, body: object) -> None:
+            time.sleep(latency)
+            data = json.dumps(body).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:  # rpc/get_articulation_bundle & get_course_satisfies
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            articulations = {cc: {"conj": "Or", "items": [[cc * 10], [cc * 10 + 1, cc * 10 + 2]]} for cc in range(1, 40)}
+            glossary = {cc * 10: {"course_id": cc * 10, "course_code": f"MATH {cc}"} for cc in range(1, 40)}
+            self._reply([articulations, glossary])
+
+        def do_GET(self) -> None:  # etl_meta & glossary selects
+            if self.path.startswith("/rest/v1/etl_meta"):
+                self._reply([{"value": "bench"}])
+            else:
+                self._reply([{"course_id": i, "course_code": f"MATH {i}", "course_name": "Calculus"} for i in range(500)])
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_child(driver: str, args: list[str], env: dict[str, str]) -> dict[str, float]:
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", driver, *args], env=env, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"child failed:\n{proc.stderr}")
+    return {"process_ms": elapsed * 1e3, **json.loads(proc.stderr.strip().splitlines()[-1])}
+
+
+def report(label: str, runs: list[dict[str, float]]) -> None:
+    medians = ", ".join(f"{k} {statistics.median(r[k] for r in runs):.2f}" for k in runs[0])
+    logger.info(f" {label} (median of {len(runs)}): {medians}")
+
+
+def main(runs: int = 20, latency_ms: float = 0.0, sdk: bool = False) -> None:
+    # 1. start the stand-in & point the handlers at it
+
+    server = stand_in_server(latency_ms / 1e3)
+    env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{server.server_port}",
+        "SUPABASE_ANON_KEY": "bench",
+    }
+    env.pop("ARTIFACT_DIR", None)
+
+    # 2. time fresh interpreters importing & invoking each handler
+
+    for name, (cold, warm) in EVENTS.items():
+        args = [str(BACKEND_DIR / name), str(SHARED_DIR), json.dumps(cold), json.dumps(warm)]
+        report(name, [run_child(HANDLER_DRIVER, args, env) for _ in range(runs)])
+
+    # 3. the supabase SDK the handlers used to import
+
+    if sdk:
+        if importlib.util.find_spec("supabase") is None:
+            logger.warning(" supabase is not installed, skipping --sdk")
+        else:
+            report("supabase SDK", [run_child(SDK_DRIVER, [], env) for _ in range(runs)])
+
+    server.shutdown()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark lambda cold starts against a local PostgREST stand-in")
+    parser.add_argument("--runs", type=int, default=20, help="fresh interpreters per handler, the median is reported")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="latency the stand-in adds to every response")
+    parser.add_argument("--sdk", action="store_true", help="also time importing the supabase SDK & creating its client")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(runs=args.runs, latency_ms=args.latency_ms, sdk=args.sdk)
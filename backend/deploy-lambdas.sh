@@ -12,6 +12,11 @@ ROLE_NAME="cacourses-lambda-role"
 REGION="us-west-1"
 DEPENDENCIES_DIR="./dependencies"
 DEPENDENCIES_FILE="./requirements.txt"
+SHARED_DIR="./shared"  # modules shared by every lambda, packaged next to lambda_function.py
+ARTIFACTS_DIR="../artifacts"  # optional precomputed responses (etl_pipeline all_to_db.py --artifacts)
+declare -A ARTIFACT_SUBDIRS=([get_articulations]=articulations [get_courses]=courses)  # the ones each lambda serves
+BUILD_DIR="./build"
+PYTHON_VERSION="3.12"  # lambda runtime, bytecode is precompiled for it
 LAMBDA_DIRS="*/lambda_function.py"
 
 # Config: utility functions
@@ -43,18 +48,42 @@ uv pip install -q -r $DEPENDENCIES_FILE \
     --link-mode copy
 rm -r $DEPENDENCIES_FILE
 
+# Strip what is never imported at runtime (test suites, type stubs, stale bytecode)
+if [[ -d "$DEPENDENCIES_DIR" ]]; then
+    find "$DEPENDENCIES_DIR" -depth \( -name "__pycache__" -o -name "tests" -o -name "*.pyi" \) -exec rm -rf {} +
+fi
+
 # Create lambda zip packages
 for dir in $dirs; do
     if [[ -d "$dir" ]] && [[ -f "$dir/lambda_function.py" ]]; then
-        rm "$dir/lambda.zip"
-        if [[ -d "$DEPENDENCIES_DIR" ]]; then
-            (cd "$DEPENDENCIES_DIR" && zip -rq "../$dir/lambda.zip" .)
+        rm -f "$dir/lambda.zip"
+        build="$BUILD_DIR/$(basename $dir)"
+        rm -rf "$build" && mkdir -p "$build"
+
+        [[ -d "$DEPENDENCIES_DIR" ]] && cp -r "$DEPENDENCIES_DIR/." "$build"
+        cp "$dir/lambda_function.py" "$SHARED_DIR"/*.py "$build"
+
+        # only the lambdas serving artifacts get them, and only their own subdir of each year
+        subdir="${ARTIFACT_SUBDIRS[$(basename $dir)]}"
+        if [[ -n "$subdir" ]] && [[ -d "$ARTIFACTS_DIR" ]]; then
+            for year_dir in "$ARTIFACTS_DIR"/year=*/; do
+                [[ -d "$year_dir$subdir" ]] || continue
+                mkdir -p "$build/artifacts/$(basename $year_dir)"
+                cp -r "$year_dir$subdir" "${year_dir}VERSION" "$build/artifacts/$(basename $year_dir)"
+            done
         fi
-        (cd "$dir" && zip -g -rq "lambda.zip" "lambda_function.py")
-        log "Packaged $(basename $dir) and dependencies into zip"
+
+        # the lambda filesystem is read-only, so bytecode that isn't shipped is recompiled on
+        # every cold start; unchecked-hash pycs are also trusted without an mtime check
+        uv run -q --no-project --python $PYTHON_VERSION python -m compileall -q -j 0 \
+            --invalidation-mode unchecked-hash "$build" > /dev/null
+        [[ $? -ne 0 ]] && err "Could not precompile $(basename $dir)."
+
+        (cd "$build" && zip -rq "$OLDPWD/$dir/lambda.zip" .)
+        log "Packaged $(basename $dir), shared modules and dependencies into zip"
     fi
 done
-rm -r $DEPENDENCIES_DIR
+rm -rf $DEPENDENCIES_DIR $BUILD_DIR
 
 # Check for existence of AWS Lambda access role 'cacourses-lambda-role'
 
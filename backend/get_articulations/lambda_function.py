@@ -2,82 +2,135 @@
 
 import json
 import os
+from collections.abc import Iterator
+from functools import partial
 from typing import Any
 
-from postgrest.exceptions import APIError
-from supabase import Client, create_client
+from artifacts import ARTIFACT_DIR, artifact_version, read_artifact
+from http_response import DEFAULT_CACHE_CONTROL, cached_response, columnar_glossary, create_response
+from params import parse_ids
+from postgrest_client import PostgrestClient
+from response_cache import ResponseCache, load_version
 
 
 # set up globals to init once per 'cold start'
+MAX_BATCH_COURSES = 50
+FORMATS = ("rows", "columnar")
 SUPA_URL: str | None = os.getenv("SUPABASE_URL")
 SUPA_KEY: str | None = os.getenv("SUPABASE_ANON_KEY")
 
-if not (SUPA_URL and SUPA_KEY):
+if ARTIFACT_DIR is None and not (SUPA_URL and SUPA_KEY):
     raise RuntimeError("Could not find environment variables SUPA_URL or SUPA_KEY.")
 
-SUPA_CLIENT: Client = create_client(supabase_url=SUPA_URL, supabase_key=SUPA_KEY)
+# cheap to create, the connection is only opened (then reused) by the first query
+SUPA_CLIENT: PostgrestClient | None = (
+    PostgrestClient(url=SUPA_URL, key=SUPA_KEY) if ARTIFACT_DIR is None else None  # type: ignore
+)
+
+
+CACHE = ResponseCache(
+    name="get_articulations",
+    maxsize=int(os.getenv("CACHE_MAXSIZE", "1024")),
+    ttl=float(os.getenv("CACHE_TTL", "3600")),
+    get_version=partial(load_version, SUPA_CLIENT) if ARTIFACT_DIR is None else artifact_version,
+)
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", DEFAULT_CACHE_CONTROL)
+
+
+def fetch_articulations(course_id: int, year: int | None) -> str:
+    if ARTIFACT_DIR is not None:
+        # a course without articulations has no artifact, answer like the database would
+        body = read_artifact("articulations", course_id, year)
+        return body if body is not None else "[{},{}]"
+
+    # articulations & the glossary of every course they reference, assembled in postgres
+    # by get_articulation_bundle (etl_pipeline/sql/) in a single round trip
+    params: dict[str, Any] = {"p_course_id": course_id}
+    if year is not None:  # otherwise the latest year loaded
+        params["p_year"] = year
+    return SUPA_CLIENT.rpc("get_articulation_bundle", params)  # type: ignore
+
+
+def _course_ids(node: Any) -> Iterator[int]:
+    """Course ids referenced by a (DNF or compact) articulation."""
+    if isinstance(node, int):
+        yield node
+    elif isinstance(node, dict):
+        node = node.get("items") or []
+    if isinstance(node, list):
+        for item in node:
+            yield from _course_ids(item)
+
+
+def fetch_articulation_batch(course_ids: tuple[int, ...], ccs: tuple[int, ...] | None, year: int | None) -> str:
+    if ARTIFACT_DIR is not None:
+        articulation_maps, glossary = {}, {}
+        for course_id in course_ids:
+            articulations, courses = json.loads(read_artifact("articulations", course_id, year) or "[{},{}]")
+            if ccs is not None:
+                articulations = {cc: a for cc, a in articulations.items() if int(cc) in ccs}
+            referenced = {str(i) for a in articulations.values() for i in _course_ids(a)}
+            articulation_maps[str(course_id)] = articulations
+            glossary.update((i, course) for i, course in courses.items() if i in referenced)
+        return json.dumps([articulation_maps, glossary])
+
+    # every course's articulations & one glossary shared between them, in a single round trip
+    params: dict[str, Any] = {"p_course_ids": list(course_ids)}
+    if ccs is not None:
+        params["p_ccs"] = list(ccs)
+    if year is not None:
+        params["p_year"] = year
+    return SUPA_CLIENT.rpc("get_articulation_bundles", params)  # type: ignore
+
+
+def get_articulations(course_id: int, year: int | None, format: str, request_headers: dict[str, str]):
+    def fetch() -> str:
+        body = fetch_articulations(course_id, year)
+        return columnar_glossary(body) if format == "columnar" else body
+
+    return cached_response(CACHE, (course_id, year, format), fetch, request_headers, CACHE_CONTROL)
+
+
+def get_articulation_batch(
+    course_ids: tuple[int, ...],
+    ccs: tuple[int, ...] | None,
+    year: int | None,
+    format: str,
+    request_headers: dict[str, str],
+):
+    def fetch() -> str:
+        body = fetch_articulation_batch(course_ids, ccs, year)
+        return columnar_glossary(body) if format == "columnar" else body
+
+    return cached_response(CACHE, ("batch", course_ids, ccs, year, format), fetch, request_headers, CACHE_CONTROL)
 
 
-def create_response(status_code: int, body: Any):
-    return {
-        "statusCode": status_code,
-        "headers": {
-            "Content-Type": "application/json",
-            'Access-Control-Allow-Origin': '*',
-        },
-        "body": json.dumps(body)
-    }
+def lambda_handler(event, context):
+    params = event.get('queryStringParameters') or {}
+    request_headers = event.get('headers') or {}
 
+    if (format := params.get("format", "rows")) not in FORMATS:
+        return create_response(400, {"message": f"format must be one of {', '.join(FORMATS)}"})
 
-def get_articulations(course_id: int):
+    # year=75 picks an academic year, by default the latest one loaded
     try:
-        query = (
-            SUPA_CLIENT
-            .table("articulations")
-            .select("cc", "articulation")
-            .eq("course_id", course_id)
-            .execute()
-        )
-        
-        # Transform data into the desired dictionary format
-        articulation_map: dict[int, str] = {
-            elem.get("cc"): elem.get("articulation") 
-            for elem in query.data 
-            if isinstance(elem, dict)
-        } # type: ignore
-
-        course_id_set = set()
-        for articulation_str in articulation_map.values():
-            articulation = json.loads(articulation_str)
-            for and_group in articulation.get("items"):
-                course_id_set.update(and_group.get("items"))
-        
-        query = (
-            SUPA_CLIENT
-            .table("glossary")
-            .select("*")
-            .in_("course_id", course_id_set)
-            .execute()
-        )
-        
-        glossary_map: dict[int, str] = {
-            elem.get("course_id"): elem
-            for elem in query.data
-            if isinstance(elem, dict)
-        } # type: ignore
-
-        return create_response(200, [articulation_map, glossary_map])
-        
-    except APIError as e:
-        print(f"Database error: {e}") # Log for CloudWatch
-        return create_response(502, {"error": "Database connection failed"})
-    except Exception as e:
-        print(f"Unexpected error: {e}")
-        return create_response(500, {"error": "Internal server error"})
-    
-
-def lambda_handler(event, context):
-    params = event.get('queryStringParameters') or {}
+        year = int(year_raw) if (year_raw := params.get("year")) else None
+    except ValueError:
+        return create_response(400, {"message": "year must be an integer"})
+
+    # 0. Batch requests: course_ids=1,2,3 with an optional cc=110,113 filter
+    if course_ids_raw := params.get("course_ids"):
+        try:
+            course_ids = parse_ids(course_ids_raw)
+            ccs = parse_ids(cc_raw) if (cc_raw := params.get("cc")) else None
+        except ValueError:
+            return create_response(400, {"message": "course_ids and cc must be comma-separated integers"})
+        if not 0 < len(course_ids) <= MAX_BATCH_COURSES:
+            return create_response(400, {"message": f"course_ids must list 1 to {MAX_BATCH_COURSES} courses"})
+        return get_articulation_batch(course_ids, ccs, year, format, request_headers)
+
+    if params.get("cc"):
+        return create_response(400, {"message": "cc filter requires the course_ids parameter"})
 
     # 1. Validation: Check existence
     if not (course_id_raw := params.get("course_id")) :
@@ -90,4 +143,4 @@ def lambda_handler(event, context):
         return create_response(400, {"message": "course_id must be an integer"})
 
     # 3. 
-    return get_articulations(course_id)
+    return get_articulations(course_id, year, format, request_headers)
@@ -2,49 +2,108 @@
 
 import json
 import os
-from typing import Any
+from functools import partial
 
-from postgrest.exceptions import APIError
-from supabase import Client, create_client
+from artifacts import ARTIFACT_DIR, artifact_version, read_artifact
+from http_response import DEFAULT_CACHE_CONTROL, cached_response, create_response, to_columns
+from postgrest_client import PostgrestClient
+from response_cache import ResponseCache, load_version
 
 # set up globals to init once per 'cold start'
+FORMATS = ("rows", "columnar")
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
 SUPA_URL: str | None = os.getenv("SUPABASE_URL")
 SUPA_KEY: str | None = os.getenv("SUPABASE_ANON_KEY")
 
-if not (SUPA_URL and SUPA_KEY):
+if ARTIFACT_DIR is None and not (SUPA_URL and SUPA_KEY):
     raise RuntimeError("Could not find environment variables SUPA_URL or SUPA_KEY.")
 
-SUPA_CLIENT: Client = create_client(supabase_url=SUPA_URL, supabase_key=SUPA_KEY)
+# cheap to create, the connection is only opened (then reused) by the first query
+SUPA_CLIENT: PostgrestClient | None = (
+    PostgrestClient(url=SUPA_URL, key=SUPA_KEY) if ARTIFACT_DIR is None else None  # type: ignore
+)
 
 
-def create_response(status_code: int, body: Any):
-    return {
-        "statusCode": status_code,
-        "headers": {
-            "Content-Type": "application/json", 
-            'Access-Control-Allow-Origin': '*'
-        },
-        "body": json.dumps(body)
-    }
+CACHE = ResponseCache(
+    name="get_courses",
+    maxsize=int(os.getenv("CACHE_MAXSIZE", "1024")),
+    ttl=float(os.getenv("CACHE_TTL", "3600")),
+    get_version=partial(load_version, SUPA_CLIENT) if ARTIFACT_DIR is None else artifact_version,
+)
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", DEFAULT_CACHE_CONTROL)
 
 
-def get_courses(inst_id: int):
-    try:
-        query = (
-            SUPA_CLIENT
-            .table("glossary")
-            .select("course_id", "course_code", "course_name")
-            .eq("inst_id", inst_id)
-            .execute()
+def year_param(year: int | None) -> dict[str, int]:
+    """p_year argument of the SQL functions, omitted to get the latest year loaded."""
+    return {"p_year": year} if year is not None else {}
+
+
+def fetch_courses(inst_id: int, year: int | None, format: str) -> str:
+    if ARTIFACT_DIR is not None:
+        body = read_artifact("courses", inst_id, year)
+        body = body if body is not None else "[]"
+    else:
+        # the year's glossary partition only, see get_course_list (etl_pipeline/sql/)
+        body = SUPA_CLIENT.rpc("get_course_list", {"p_inst_id": inst_id, **year_param(year)})  # type: ignore
+
+    if format == "columnar":  # {course_id: [...], course_code: [...], course_name: [...]}
+        return json.dumps(to_columns(json.loads(body)))
+    return body
+
+
+def search_artifact(inst_id: int, query: str, limit: int, year: int | None) -> list[dict]:
+    """search_courses (etl_pipeline/sql/search_courses.sql) over the institution's course list artifact."""
+    query = query.lower()
+    matches = [
+        course
+        for course in json.loads(read_artifact("courses", inst_id, year) or "[]")
+        if query in course["course_code"].lower() or query in course["course_name"].lower()
+    ]
+
+    def rank(course: dict) -> tuple:
+        if course["course_code"].lower().startswith(query):
+            prefix = 0
+        elif course["course_name"].lower().startswith(query):
+            prefix = 1
+        else:
+            prefix = 2
+        return prefix, course["course_code"], course["course_id"]
+
+    return sorted(matches, key=rank)[:limit]
+
+
+def fetch_search(inst_id: int, query: str, limit: int, year: int | None, format: str) -> str:
+    if ARTIFACT_DIR is not None:
+        body = json.dumps(search_artifact(inst_id, query, limit, year))
+    else:
+        # substring match served by the glossary's trigram indexes, ranked & limited in postgres
+        body = SUPA_CLIENT.rpc(  # type: ignore
+            "search_courses", {"p_inst_id": inst_id, "p_query": query, "p_limit": limit, **year_param(year)}
         )
 
-        return create_response(200, query.data)
+    if format == "columnar":
+        return json.dumps(to_columns(json.loads(body)))
+    return body
 
-    except APIError as e:
-        print(f"Database error: {e}")
-        return create_response(502, {"error": "Database connection failed"})
-    except Exception as e:
-        print(f"Unexpected error: {e}")
+
+def get_courses(inst_id: int, year: int | None, format: str, request_headers: dict[str, str]):
+    return cached_response(
+        CACHE, (inst_id, year, format), lambda: fetch_courses(inst_id, year, format), request_headers, CACHE_CONTROL
+    )
+
+
+def search_courses(
+    inst_id: int, query: str, limit: int, year: int | None, format: str, request_headers: dict[str, str]
+):
+    # matching is case-insensitive, so differently cased queries share a cache entry
+    return cached_response(
+        CACHE,
+        (inst_id, "search", query.lower(), limit, year, format),
+        lambda: fetch_search(inst_id, query, limit, year, format),
+        request_headers,
+        CACHE_CONTROL,
+    )
 
 
 def lambda_handler(event, context):
@@ -57,5 +116,24 @@ def lambda_handler(event, context):
         inst_id_raw = int(inst_id_raw)
     except ValueError:
         return create_response(400, {"message": "inst_id must be an integer"})
-    
-    return get_courses(inst_id_raw)
\ No newline at end of file
+
+    if (format := params.get("format", "rows")) not in FORMATS:
+        return create_response(400, {"message": f"format must be one of {', '.join(FORMATS)}"})
+
+    # year=75 picks an academic year, by default the latest one loaded
+    try:
+        year = int(year_raw) if (year_raw := params.get("year")) else None
+    except ValueError:
+        return create_response(400, {"message": "year must be an integer"})
+
+    # search mode: q=calc returns the best matches instead of the whole catalog
+    if (query := params.get("q", "").strip()):
+        try:
+            limit = int(params.get("limit", DEFAULT_SEARCH_LIMIT))
+        except ValueError:
+            return create_response(400, {"message": "limit must be an integer"})
+        if not 0 < limit <= MAX_SEARCH_LIMIT:
+            return create_response(400, {"message": f"limit must be between 1 and {MAX_SEARCH_LIMIT}"})
+        return search_courses(inst_id_raw, query, limit, year, format, event.get('headers') or {})
+
+    return get_courses(inst_id_raw, year, format, event.get('headers') or {})
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+import os
+from functools import partial
+
+from http_response import DEFAULT_CACHE_CONTROL, cached_response, columnar_glossary, create_response
+from params import parse_ids
+from postgrest_client import PostgrestClient
+from response_cache import ResponseCache, load_version
+
+
+# set up globals to init once per 'cold start'
+FORMATS = ("rows", "columnar")
+SUPA_URL: str | None = os.getenv("SUPABASE_URL")
+SUPA_KEY: str | None = os.getenv("SUPABASE_ANON_KEY")
+
+# the reverse index only lives in postgres (course_satisfies), there are no precomputed artifacts of it
+if not (SUPA_URL and SUPA_KEY):
+    raise RuntimeError("Could not find environment variables SUPA_URL or SUPA_KEY.")
+
+# cheap to create, the connection is only opened (then reused) by the first query
+SUPA_CLIENT = PostgrestClient(url=SUPA_URL, key=SUPA_KEY)
+
+
+CACHE = ResponseCache(
+    name="get_satisfies",
+    maxsize=int(os.getenv("CACHE_MAXSIZE", "1024")),
+    ttl=float(os.getenv("CACHE_TTL", "3600")),
+    get_version=partial(load_version, SUPA_CLIENT),
+)
+CACHE_CONTROL = os.getenv("CACHE_CONTROL", DEFAULT_CACHE_CONTROL)
+
+
+def fetch_satisfies(cc_course_id: int, unis: tuple[int, ...] | None, year: int | None) -> str:
+    # university courses the cc course counts toward, the clauses it appears in & their glossary,
+    # assembled in postgres by get_course_satisfies (etl_pipeline/sql/) from the course_satisfies index
+    params: dict = {"p_cc_course_id": cc_course_id}
+    if unis is not None:
+        params["p_unis"] = list(unis)
+    if year is not None:  # otherwise the latest year loaded
+        params["p_year"] = year
+    return SUPA_CLIENT.rpc("get_course_satisfies", params)
+
+
+def get_satisfies(
+    cc_course_id: int,
+    unis: tuple[int, ...] | None,
+    year: int | None,
+    format: str,
+    request_headers: dict[str, str],
+):
+    def fetch() -> str:
+        body = fetch_satisfies(cc_course_id, unis, year)
+        return columnar_glossary(body) if format == "columnar" else body
+
+    return cached_response(CACHE, (cc_course_id, unis, year, format), fetch, request_headers, CACHE_CONTROL)
+
+
+def lambda_handler(event, context):
+    params = event.get('queryStringParameters') or {}
+    request_headers = event.get('headers') or {}
+
+    if (format := params.get("format", "rows")) not in FORMATS:
+        return create_response(400, {"message": f"format must be one of {', '.join(FORMATS)}"})
+
+    # 1. Validation: Check existence
+    if not (cc_course_id_raw := params.get("cc_course_id")):
+        return create_response(400, {"message": "Missing cc_course_id parameter"})
+
+    # 2. Validation: Check types, uni=1,7 optionally limits the answer to some universities
+    #    and year=75 picks an academic year (by default the latest one loaded)
+    try:
+        cc_course_id = int(cc_course_id_raw)
+        unis = parse_ids(uni_raw) if (uni_raw := params.get("uni")) else None
+        year = int(year_raw) if (year_raw := params.get("year")) else None
+    except ValueError:
+        return create_response(
+            400, {"message": "cc_course_id and year must be integers and uni comma-separated integers"}
+        )
+
+    # 3. Lookup
+    return get_satisfies(cc_course_id, unis, year, format, request_headers)
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+
+import gzip
+import os
+from pathlib import Path
+
+"""
+Precomputed responses shared by the lambdas (deploy-lambdas.sh packages ./shared/*.py
+next to each lambda_function.py). With ARTIFACT_DIR set, responses are read from the
+ETL's static gzip artifacts (etl_pipeline all_to_db.py --artifacts) instead of supabase,
+one set per academic year (ARTIFACT_DIR/year=75/), the latest answering requests without a year.
+"""
+
+ARTIFACT_DIR: Path | None = Path(artifact_dir) if (artifact_dir := os.getenv("ARTIFACT_DIR")) else None
+ARTIFACT_YEARS: tuple[int, ...] = tuple(sorted(
+    int(year) for fp in ARTIFACT_DIR.glob("year=*") if (year := fp.name.removeprefix("year=")).isdigit()
+)) if ARTIFACT_DIR is not None else ()
+
+if ARTIFACT_DIR is not None and not ARTIFACT_YEARS:
+    raise RuntimeError(f"Could not find any year=[year] artifact set in {ARTIFACT_DIR}.")
+
+
+def read_artifact(subdir: str, key: int, year: int | None) -> str | None:
+    """JSON body of a precomputed response (see etl_pipeline/utils/artifacts.py), None if missing."""
+    year_dir = ARTIFACT_DIR / f"year={year if year is not None else ARTIFACT_YEARS[-1]}"  # type: ignore
+    try:
+        return gzip.decompress((year_dir / subdir / f"{key}.json.gz").read_bytes()).decode()
+    except FileNotFoundError:
+        return None
+
+
+def artifact_version() -> str | None:
+    """Content hashes of every year's artifact set, written next to each by the ETL."""
+    return ",".join(
+        (ARTIFACT_DIR / f"year={year}" / "VERSION").read_text().strip() for year in ARTIFACT_YEARS  # type: ignore
+    )
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+import base64
+import gzip
+import hashlib
+import json
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from postgrest_client import PostgrestError
+from response_cache import ResponseCache
+
+try:  # optional: add brotli to pyproject.toml's dependencies to serve `br`
+    import brotli
+except ImportError:
+    brotli = None
+
+"""
+Lambda function URL responses shared by the lambdas: JSON bodies compressed with the best
+encoding the client accepts (brotli if packaged, else gzip), Cache-Control for browsers &
+CDNs, and strong ETags derived from the ETL load version so unchanged responses can be
+answered with an empty 304.
+"""
+
+# browsers & CDNs may reuse a response for an hour, then revalidate it with If-None-Match
+DEFAULT_CACHE_CONTROL = "public, max-age=3600, stale-while-revalidate=86400"
+
+
+def negotiate_encoding(accept_encoding: str | None) -> str | None:
+    """Content coding to compress a response with, from the request's Accept-Encoding header."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                pass
+        accepted[coding.strip()] = q
+
+    for coding in ("br", "gzip") if brotli is not None else ("gzip",):
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def make_etag(version: str, *parts: Any) -> str:
+    """Strong ETag of a representation: the load version plus everything that selects it."""
+    digest = hashlib.blake2b("|".join(map(str, (version, *parts))).encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return "*" in tags or etag in tags
+
+
+def to_columns(rows: list[dict]) -> dict[str, list]:
+    """{column: [values...]} of rows sharing the same keys, sent instead of repeating every key per row."""
+    if not rows:
+        return {}
+    return {key: [row[key] for row in rows] for key in rows[0]}
+
+
+def columnar_glossary(body: str) -> str:
+    """
+    [results, glossary] response body with its glossary as {course_id: [...], inst_id: [...], ...}
+    instead of one object per course.
+    """
+    results, glossary = json.loads(body)
+    return json.dumps([results, to_columns(list(glossary.values()))])
+
+
+def create_response(
+    status_code: int,
+    body: Any,
+    serialized: bool = False,
+    headers: dict[str, str] | None = None,
+    encoding: str | None = None,
+):
+    response_headers = {
+        "Content-Type": "application/json",
+        'Access-Control-Allow-Origin': '*',
+        **(headers or {}),
+    }
+    data = body if serialized else json.dumps(body)
+
+    if encoding is None or status_code == 304:
+        return {"statusCode": status_code, "headers": response_headers, "body": data}
+
+    raw = data.encode()
+    compressed = brotli.compress(raw) if encoding == "br" else gzip.compress(raw, compresslevel=6, mtime=0)  # type: ignore
+    response_headers["Content-Encoding"] = encoding
+    return {
+        "statusCode": status_code,
+        "headers": response_headers,
+        "body": base64.b64encode(compressed).decode(),
+        "isBase64Encoded": True,
+    }
+
+
+def cached_response(
+    cache: ResponseCache,
+    key: Hashable,
+    fetch: Callable[[], str],
+    request_headers: dict[str, str],
+    cache_control: str = DEFAULT_CACHE_CONTROL,
+):
+    """
+    200 response with the JSON body `fetch()` returns for `key`, served from `cache` when
+    possible, compressed as negotiated & tagged for HTTP caches. A request whose
+    If-None-Match still holds the current ETag is answered with an empty 304 instead.
+    """
+    encoding = negotiate_encoding(request_headers.get("accept-encoding"))
+    headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    if (version := cache.current_version()) is not None:
+        headers["ETag"] = make_etag(version, key, encoding)
+        if etag_matches(request_headers.get("if-none-match"), headers["ETag"]):
+            return create_response(304, "", serialized=True, headers=headers)
+
+    if (body := cache.get(key)) is None:
+        try:
+            body = fetch()
+        except PostgrestError as e:
+            print(f"Database error: {e}") # Log for CloudWatch
+            return create_response(502, {"error": "Database connection failed"})
+        except Exception as e:
+            print(f"Unexpected error: {e}")
+            return create_response(500, {"error": "Internal server error"})
+        cache.put(key, body)
+
+    return create_response(200, body, serialized=True, headers=headers, encoding=encoding)
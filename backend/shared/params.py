@@ -0,0 +1,11 @@
+#!/usr/bin/env python
+
+"""
+Query string parsing shared by the lambdas (deploy-lambdas.sh packages ./shared/*.py next
+to each lambda_function.py).
+"""
+
+
+def parse_ids(ids_raw: str) -> tuple[int, ...]:
+    """Sorted, deduplicated ids of a comma-separated parameter, so equal requests share a cache entry."""
+    return tuple(sorted({int(part) for part in ids_raw.split(",") if part.strip()}))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+
+import json
+from http.client import HTTPConnection, HTTPException, HTTPSConnection
+from urllib.parse import quote, urlencode, urlsplit
+
+"""
+Minimal PostgREST client for the lambdas, replacing the supabase SDK (which imports
+postgrest, realtime, storage, auth & httpx) with the standard library. Nothing touches
+the network until the first request; the HTTP(S) connection is then kept open and reused
+by every invocation of a warm container.
+"""
+
+
+class PostgrestError(Exception):
+    """Non-2xx response from PostgREST (or no response at all)."""
+
+    def __init__(self, message: str, status: int | None = None):
+        super().__init__(message if status is None else f"{status}: {message}")
+        self.status = status
+
+
+class PostgrestClient:
+    """
+    Read-only client for a Supabase project's REST API ([url]/rest/v1). Methods return the
+    response body as JSON text so callers can pass it through without re-serializing.
+    """
+
+    def __init__(self, url: str, key: str, timeout: float = 10.0):
+        parts = urlsplit(url)
+        self._https = parts.scheme == "https"
+        self._netloc = parts.netloc
+        self._base_path = parts.path.rstrip("/") + "/rest/v1"
+        self._timeout = timeout
+        self._headers = {
+            "apikey": key,
+            "Authorization": f"Bearer {key}",
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+        }
+        self._conn: HTTPConnection | None = None
+
+    def _connection(self) -> HTTPConnection:
+        if self._conn is None:
+            conn_cls = HTTPSConnection if self._https else HTTPConnection
+            self._conn = conn_cls(self._netloc, timeout=self._timeout)
+        return self._conn
+
+    def _request(self, method: str, path: str, body: bytes | None = None) -> str:
+        # a kept-alive connection may have been closed by the server while the container
+        # was frozen, so retry once on a fresh one
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request(method, self._base_path + path, body=body, headers=self._headers)
+                response = conn.getresponse()
+                data = response.read().decode()
+                break
+            except (HTTPException, OSError) as e:
+                conn.close()
+                self._conn = None
+                if attempt:
+                    raise PostgrestError(f"request failed: {e}") from e
+
+        if not 200 <= response.status < 300:
+            try:
+                message = json.loads(data).get("message", data)
+            except ValueError:
+                message = data
+            raise PostgrestError(message, status=response.status)
+        return data
+
+    def rpc(self, function: str, params: dict) -> str:
+        """JSON result of calling the SQL function `function` with named `params`."""
+        return self._request("POST", f"/rpc/{quote(function)}", body=json.dumps(params).encode())
+
+    def select(self, table: str, columns: tuple[str, ...] = ("*",), **filters: str) -> str:
+        """
+        JSON array of `table`'s rows. Filters are PostgREST operators per column, e.g.
+        select("glossary", ("course_id",), inst_id="eq.7").
+        """
+        query = urlencode({"select": ",".join(columns), **filters}, safe=",.*()")
+        return self._request("GET", f"/{quote(table)}?{query}")
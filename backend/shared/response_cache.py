@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from postgrest_client import PostgrestClient
+
+"""
+Module-level response cache shared by the lambdas (deploy-lambdas.sh packages ./shared/*.py
+next to each lambda_function.py). A warm container answers repeated requests for the same
+course/institution from memory instead of querying the database again.
+"""
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized response bodies. Entries expire after `ttl` seconds,
+    and the whole cache is dropped when `get_version` (polled at most every `version_ttl`
+    seconds) reports a new ETL load version. Hit/miss counts are kept for logging.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int = 1024,
+        ttl: float = 3600.0,
+        get_version: Callable[[], str | None] | None = None,
+        version_ttl: float = 60.0,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self.version: str | None = None
+        self.hits = self.misses = 0
+        self._get_version = get_version
+        self._version_expires = 0.0
+        self._entries: OrderedDict[Hashable, tuple[float, str]] = OrderedDict()
+
+    def _check_version(self, now: float) -> None:
+        if self._get_version is None or now < self._version_expires:
+            return
+        self._version_expires = now + self.version_ttl
+        try:
+            version = self._get_version()
+        except Exception as e:  # keep serving cached entries, retry after version_ttl
+            print(f"[{self.name}] could not fetch load version: {e}")
+            return
+        if version != self.version:
+            if self._entries:
+                print(f"[{self.name}] load version {self.version} -> {version}, dropping {len(self._entries)} entries")
+            self._entries.clear()
+            self.version = version
+
+    def current_version(self) -> str | None:
+        """The load version cached entries belong to, re-checked at most every `version_ttl`."""
+        self._check_version(time.monotonic())
+        return self.version
+
+    def get(self, key: Hashable) -> str | None:
+        now = time.monotonic()
+        self._check_version(now)
+
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._log("hit", key)
+            return entry[1]
+
+        if entry is not None:  # expired
+            del self._entries[key]
+        self.misses += 1
+        self._log("miss", key)
+        return None
+
+    def put(self, key: Hashable, body: str) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, body)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _log(self, outcome: str, key: Hashable) -> None:
+        print(
+            f"[{self.name}] {outcome} {key} (hits={self.hits} misses={self.misses}"
+            f" size={len(self._entries)} version={self.version})"
+        )
+
+
+def load_version(client: PostgrestClient) -> str | None:
+    """
+    Version of the last ETL load, stamped in etl_meta by the ETL scripts. The `get_version`
+    of a cache in front of the database (bound to its client), so responses of older loads
+    are dropped.
+    """
+    rows = json.loads(client.select("etl_meta", ("value",), key="eq.load_version"))
+    return rows[0]["value"] if rows else None
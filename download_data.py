@@ -1,130 +1,506 @@
 #!/usr/bin/env python3
 
+import argparse
 import asyncio
+import email.utils
+import hashlib
 import httpx
 import json
 import os
 import time
 import sys
+from collections import Counter, deque
 
 """
 Asynchronously download requests from ASSIST.org's API
 without getting rate limited (50 every 5 minutes)
 
-Data is queried from ASSIST's 2024-2025 academic year
-agreements. Missing articulation files are due to missing
-agreements between the institutions for the academic
-year.
+Data is queried from one ASSIST academic year's agreements
+(--year, by default 75 = 2024-2025), into its own directory
+(data/year=75/) next to the institution maps shared by every
+year. Missing articulation files are due to missing agreements
+between the institutions for the academic year.
+
+Requests are issued continuously by a pool of workers that
+share a sliding-window token bucket sized to ASSIST's limit,
+so a slow request never holds up the rest of the crawl.
+Progress is kept in an append-only journal (data/year=[year]/crawl_journal.jsonl)
+so an interrupted crawl resumes where it stopped.
+
+`--refresh` re-checks every finished agreement, keeping files whose
+content hash is unchanged untouched. Pairs whose data did change are
+appended to data/year=[year]/dirty_pairs.csv for the ETL to pick up.
 """
 
+BASE_URL = "https://assist.org/api/articulation/Agreements?Key={year}/"
+RESULTS_URL = "https://assist.org/transfer/results?year={year}&institution={cc}&agreement={uni}&agreementType=to&view=agreement&viewBy=major&viewSendingAgreements=false"
+DATA_DIR = "./data"
+YEAR = 75  # ASSIST's id of the 2024-2025 academic year
+
+RATE_LIMIT = 50           # requests allowed by ASSIST...
+RATE_WINDOW = 5*60 + 1    # ...per rolling 5 minutes (plus a second of slack)
+NUM_WORKERS = 10
+MAX_TIMEOUT_RETRIES = 3
+
+# queries are tried in order until one of them returns 200
+QUERY_TYPES = ("AllPrefixes", "AllDepartments", "AllMajors")
+
+# response metadata carried between journal records of the same pair
+RESPONSE_META = ("sha256", "bytes", "etag", "last_modified")
+
+
 def curtime() -> str:
     lt = time.localtime(time.time())
     return f"{lt.tm_hour:02}:{lt.tm_min:02}:{lt.tm_sec:02}"
 
 
+class CrawlJournal:
+    """
+    Append-only JSONL log of the crawl state of every cc/uni pair. Each line is
+    {"cc", "uni", "state", ...} and the last line for a pair wins, so resuming only
+    costs one read of the journal and a dict lookup per pair.
+
+    States: "pending", "prefixes"/"departments"/"majors" (fetched with that query),
+    "400" (no agreement exists), "empty" (the agreement has no articulations),
+    "timeout" and "error" (retried on the next run).
+    """
+
+    FINISHED = frozenset({"prefixes", "departments", "majors", "400", "empty"})
+
+    def __init__(self, fp: str, read_only: bool = False):
+        self.fp = fp
+        self.states: dict[tuple[int, int], dict] = {}
+        if os.path.exists(fp):
+            with open(fp) as journal:
+                for line in journal:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:  # torn write from a killed process
+                        continue
+                    self.states[(record["cc"], record["uni"])] = record
+        # read-only journals (e.g. --status) never create or append to the file
+        self._journal = None if read_only else open(fp, "a")
+
+    def record(self, cc: int, uni: int, state: str, **extra) -> None:
+        record = {"cc": cc, "uni": uni, "state": state, "ts": round(time.time()), **extra}
+        self._journal.write(json.dumps(record) + "\n")
+        self._journal.flush()
+        self.states[(cc, uni)] = record
+
+    def state(self, cc: int, uni: int) -> str | None:
+        record = self.states.get((cc, uni))
+        return record["state"] if record else None
+
+    def is_finished(self, cc: int, uni: int) -> bool:
+        return self.state(cc, uni) in self.FINISHED
+
+    def resume_query(self, cc: int, uni: int) -> str:
+        """Query type a retried pair should restart its fallback chain from."""
+        record = self.states.get((cc, uni)) or {}
+        # a timeout records the query that timed out, but an error records the last query
+        # tried, after earlier ones failed too: restart those from the top
+        if record.get("state") == "error":
+            return QUERY_TYPES[0]
+        return record.get("query_type", QUERY_TYPES[0])
+
+    def previous(self, cc: int, uni: int) -> dict | None:
+        """Latest record of a pair that fetched data, i.e. one that carries a content hash or file."""
+        record = self.states.get((cc, uni))
+        if record and (record["state"] in ("prefixes", "departments", "majors") or "sha256" in record):
+            return record
+        return None
+
+    def summary(self) -> Counter:
+        return Counter(record["state"] for record in self.states.values())
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self._journal.close()
+
+
+def bootstrap_journal(journal: CrawlJournal, data_dir: str) -> None:
+    """
+    Seed an empty journal from a data directory populated before journaling existed:
+    one directory listing per university plus the legacy skipread.csv.
+    """
+    for entry in os.scandir(data_dir):
+        if not (entry.is_dir() and entry.name.isdigit()):
+            continue
+        for fp in os.scandir(entry.path):
+            stem, _, suffix = fp.name.removesuffix(".json").rpartition("-")
+            cc, _, uni = stem.partition("to")
+            if suffix in ("prefixes", "departments", "majors") and cc.isdigit() and uni.isdigit():
+                journal.record(int(cc), int(uni), suffix, source="import")
+
+    skip_agreements_fp = f"{data_dir}/skipread.csv"
+    if os.path.exists(skip_agreements_fp):
+        with open(skip_agreements_fp) as fp:
+            for line in fp.read().split():
+                cc, uni = (int(x) for x in line.split(","))
+                if not journal.is_finished(cc, uni):
+                    journal.record(cc, uni, "400", source="import")
+
+
+class SlidingWindowLimiter:
+    """
+    Token bucket over a sliding window: at most `limit` requests may start within
+    any `window` seconds. A token is handed out as soon as the oldest start in the
+    window expires, and `pause` stalls every worker at once (e.g. after a 429).
+    """
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._starts: deque[float] = deque()
+        self._resume_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                while self._starts and now - self._starts[0] >= self.window:
+                    self._starts.popleft()
+
+                if now < self._resume_at:
+                    wait = self._resume_at - now
+                elif len(self._starts) >= self.limit:
+                    wait = self._starts[0] + self.window - now
+                else:
+                    self._starts.append(now)
+                    return
+                await asyncio.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+
+def payload_hash(data: list) -> str:
+    """Content hash of an articulations payload, independent of key order & whitespace."""
+    canonical = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def agreement_fp(data_dir: str, cc: int, uni: int, query_type: str) -> str:
+    return f"{data_dir}/{uni}/{cc}to{uni}-{query_type[3:].lower()}.json"
+
+
+def remove_stale_files(data_dir: str, cc: int, uni: int, keep: str | None = None) -> None:
+    """Delete a pair's files left over from query types other than `keep`."""
+    for query_type in QUERY_TYPES:
+        fp = agreement_fp(data_dir, cc, uni, query_type)
+        if query_type != keep and os.path.exists(fp):
+            os.remove(fp)
+
+
+def retry_after(response: httpx.Response, default: float) -> float:
+    """Seconds to wait according to a response's Retry-After header (delta or HTTP-date)."""
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
 async def fetch_data(
         client: httpx.AsyncClient,
+        limiter: SlidingWindowLimiter,
         cc: int,
         uni: int,
         query_type: str,
-        overflow: list,
-        overflow_query_type: str,
-        err400tracker: set
-    ) -> None:
+        data_dir: str,
+        previous: dict | None = None,
+        year: int = YEAR
+    ) -> tuple[int | None, dict]:
+    """
+    Query a single agreement and write its articulations locally. Returns the final
+    HTTP status code (None if the request timed out) and the response metadata.
+
+    If `previous` (the pair's last journal record) was fetched with the same query,
+    the request is made conditional on its ETag/Last-Modified, and a payload whose
+    hash matches the previous one is not rewritten (metadata has changed=False).
+    A 200 without articulations writes nothing and has empty=True.
+    """
     url_ext = f"{cc}/to/{uni}/{query_type}"
-    # print("[Status] Querying", url_ext)
-    response = None
-    try:
-        response = await client.get(url_ext, timeout=30)
-        if response is None:
-            raise RuntimeError("Error: client.get returned None...")
-        
-        json_response = response.json()
-        data = json.loads(json_response.get("result", {}).get("articulations", []))
-        if data:
-            os.makedirs(f"./data/{uni}", exist_ok=True)
-            with open(f"./data/{uni}/{cc}to{uni}-{query_type[3:].lower()}.json", "w") as fp:
-                json.dump(obj=data, fp=fp, indent=2)
+    fp = agreement_fp(data_dir, cc, uni, query_type)
+
+    headers = {}
+    if previous and previous["state"] != query_type[3:].lower():
+        previous = None
+    if previous:
+        if previous.get("etag"):
+            headers["If-None-Match"] = previous["etag"]
+        if previous.get("last_modified"):
+            headers["If-Modified-Since"] = previous["last_modified"]
+
+    while True:
+        await limiter.acquire()
+        try:
+            response = await client.get(url_ext, headers=headers, timeout=30)
+        except httpx.TimeoutException:
+            print(f"[Status] Fetching {cc=}, {uni=}, {query_type=} timed out")
+            return None, {}
+        except httpx.RequestError as err:
+            print(f"[Status] Uncaught error {err=} with {cc=} {uni=} {query_type=}")
+            raise
+
+        if response.status_code != 429:
+            break
+
+        delay = retry_after(response, default=RATE_WINDOW)
+        print(f"[Status] {cc=} and {uni=} hit status=429, pausing all workers for {delay:.0f} seconds...")
+        limiter.pause(delay)
+
+    if response.status_code == 304 and previous:
+        meta = {key: previous[key] for key in RESPONSE_META if key in previous}
+        return response.status_code, {**meta, "changed": False}
+
+    if response.status_code != 200:
+        print(f"Error fetching {cc}>{uni}: {response.status_code} at {RESULTS_URL.format(year=year, cc=cc, uni=uni)}", file=sys.stderr)
+        return response.status_code, {}
+
+    result = response.json().get("result") or {}
+    data = json.loads(result.get("articulations") or "[]")
+    if not data:
+        print(f"No valid data for {cc} -> {uni}", file=sys.stderr)
+        return response.status_code, {"empty": True}
+
+    meta = {
+        "sha256": payload_hash(data),
+        "bytes": len(response.content),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+    # files downloaded before hashes were journaled are hashed from disk once
+    known_hash = previous.get("sha256") if previous else None
+    if known_hash is None and os.path.exists(fp):
+        with open(fp) as existing:
+            known_hash = payload_hash(json.load(existing))
+
+    if known_hash == meta["sha256"] and os.path.exists(fp):
+        return response.status_code, {**meta, "changed": False}
+
+    os.makedirs(f"{data_dir}/{uni}", exist_ok=True)
+    with open(fp, "w") as out:
+        json.dump(obj=data, fp=out, indent=2)
+    return response.status_code, {**meta, "changed": True}
+
+
+async def crawl_pair(
+        client: httpx.AsyncClient,
+        limiter: SlidingWindowLimiter,
+        cc: int,
+        uni: int,
+        data_dir: str,
+        start_query: str = QUERY_TYPES[0],
+        previous: dict | None = None,
+        year: int = YEAR
+    ) -> tuple[str, str, dict]:
+    """
+    Walk the AllPrefixes -> AllDepartments -> AllMajors fallback chain for one
+    cc/uni pair, beginning at `start_query`. Returns (outcome, last query type,
+    response metadata), where outcome is the query type that succeeded, "empty"
+    if it succeeded without any articulations, "400" if the agreement does not
+    exist, or "timeout"/"error" if the pair should be retried later.
+    """
+    saw_400 = False
+    for query_type in QUERY_TYPES[QUERY_TYPES.index(start_query):]:
+        for _ in range(MAX_TIMEOUT_RETRIES):
+            status, meta = await fetch_data(client, limiter, cc, uni, query_type, data_dir, previous, year)
+            if status is not None:
+                break
         else:
-            print(f"No valid data for {cc} -> {uni}", file=sys.stderr)
-
-        while response.status_code == 429:
-            print(f"[Status] {cc=} and {uni=} hit status=429, sleeping 5 minutes...")
-            await asyncio.sleep(5*60 + 1)
-            response = await client.get(url_ext, timeout=30)
-
-        if response.status_code != 200:
-            print(f"Error fetching {cc}>{uni}: {response.status_code} at https://assist.org/transfer/results?year=75&institution={cc}&agreement={uni}&agreementType=to&view=agreement&viewBy=major&viewSendingAgreements=false", file=sys.stderr)
-            overflow.append((cc, uni, overflow_query_type))
-            if response.status_code == 400:
-                err400tracker.add(f"{cc},{uni}")
-            return
-        
-    except httpx.ReadTimeout:
-        overflow.append((cc, uni, query_type))
-        print(f"[Status] Fetching {cc=}, {uni=}, {query_type=} timed out, pushing to overflow") 
-    
-    except httpx.RequestError as err:
-        print(f"[Status] Uncaught error {err=} with {cc=} {uni=} {query_type=}")
-        exit(1)
+            return "timeout", query_type, {}
+
+        if status in (200, 304):
+            return ("empty" if meta.get("empty") else query_type), query_type, meta
+        saw_400 |= status == 400
+
+    return ("400" if saw_400 else "error"), query_type, {}
+
+
+async def crawl(
+        jobs: list[tuple[int, int, str, dict | None]],
+        base_url: str,
+        data_dir: str,
+        on_result,
+        rate_limit: int = RATE_LIMIT,
+        rate_window: float = RATE_WINDOW,
+        num_workers: int = NUM_WORKERS,
+        year: int = YEAR
+    ) -> None:
+    """
+    Feed (cc, uni, start query, previous record) jobs through a bounded queue to a
+    pool of workers sharing one rate limiter. `on_result(cc, uni, outcome,
+    query_type, meta)` is called as each pair finishes.
+    """
+    queue: asyncio.Queue[tuple[int, int, str, dict | None] | None] = asyncio.Queue(maxsize=2 * num_workers)
+    limiter = SlidingWindowLimiter(limit=rate_limit, window=rate_window)
+
+    async with httpx.AsyncClient(http2=True, base_url=base_url) as client:
+
+        async def worker() -> None:
+            while (job := await queue.get()) is not None:
+                cc, uni, start_query, previous = job
+                outcome, query_type, meta = await crawl_pair(
+                    client, limiter, cc, uni, data_dir, start_query, previous, year
+                )
+                on_result(cc, uni, outcome, query_type, meta)
+
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(num_workers):
+                tg.create_task(worker())
+            for job in jobs:
+                await queue.put(job)
+            for _ in range(num_workers):
+                await queue.put(None)
+
+
+def refresh_priority(record: dict | None) -> tuple:
+    """
+    Order in which finished pairs are re-checked by --refresh: pairs with no known
+    content hash first, then pairs that changed on their last check, then the ones
+    checked longest ago. Agreements that didn't exist (400) or were empty go last.
+    """
+    if record is None or record["state"] in ("400", "empty"):
+        return (3, 0)
+    if "sha256" not in record:
+        return (0, record["ts"])
+    return (1 if record.get("changed") else 2, record["ts"])
+
+
+def print_status(journal: CrawlJournal, num_pairs: int) -> None:
+    summary = journal.summary()
+    print(f"[Status] {num_pairs} cc/uni pairs, {num_pairs - len(journal.states)} never queried")
+    for state, count in summary.most_common():
+        print(f"  {state:<12} {count}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Download articulation agreements from ASSIST.org")
+    parser.add_argument("--status", action="store_true", help="print a summary of the crawl journal and exit")
+    parser.add_argument("--refresh", action="store_true", help="re-check finished agreements for changed content")
+    parser.add_argument("--year", type=int, default=YEAR, help="ASSIST academic year id to download (75 = 2024-2025)")
+    parser.add_argument("--base-url", default=BASE_URL, help="agreements API root (e.g. a local mock server), {year} is filled in")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="directory holding institution maps & each year's agreements")
+    parser.add_argument("--rate-limit", type=int, default=RATE_LIMIT, help="requests allowed per rate window")
+    parser.add_argument("--rate-window", type=float, default=RATE_WINDOW, help="rate window length in seconds")
+    parser.add_argument("--workers", type=int, default=NUM_WORKERS, help="number of concurrent workers")
+    return parser.parse_args()
 
 
 async def main():
-    BASE_URL = "https://assist.org/api/articulation/Agreements?Key=75/"
-    skip_agreements_fp = "./data/skipread.csv"
+    args = parse_args()
+    # agreements & crawl state are kept per academic year, institution maps are shared
+    data_dir = f"{args.data_dir}/year={args.year}"
+    journal_fp = f"{data_dir}/crawl_journal.jsonl"
+    dirty_fp = f"{data_dir}/dirty_pairs.csv"
 
     # Read in institution:id mappings
-    with open("./data/institutions_cc.json", "r") as cc_fp:
+    with open(f"{args.data_dir}/institutions_cc.json", "r") as cc_fp:
         ccs = json.load(cc_fp)
-    with open("./data/institutions_state.json", "r") as uni_fp:
+    with open(f"{args.data_dir}/institutions_state.json", "r") as uni_fp:
         unis = json.load(uni_fp)
-
-    # parse list of agreements to skip
-    if not os.path.exists(skip_agreements_fp):
-        with open(skip_agreements_fp, 'x') as fp:
-            pass
-    with open(skip_agreements_fp) as fp:
-        skip_agreements = set(fp.read().strip().split("\n"))
-
-    # initialize full list of agreements to check before pushing batches
-    overflow = [
-        (cc, uni, "AllPrefixes") for uni in sorted([int(k) for k in unis.keys()]) 
+    pairs = [
+        (cc, uni) for uni in sorted([int(k) for k in unis.keys()])
         for cc in sorted([int(k) for k in ccs.keys()])
-        if not os.path.exists(f"data/{uni}/{cc}to{uni}-prefixes.json")
-        and not os.path.exists(f"data/{uni}/{cc}to{uni}-departments.json")
-        and not os.path.exists(f"data/{uni}/{cc}to{uni}-majors.json")
-        and f"{cc},{uni}" not in skip_agreements
     ]
 
-    if not overflow:
+    if args.status:
+        if not os.path.exists(journal_fp):
+            print(f"[Status] no crawl journal at {journal_fp} yet, the next crawl creates it")
+        print_status(CrawlJournal(journal_fp, read_only=True), len(pairs))
+        return
+
+    # load crawl state, seeding it from existing files on the first journaled run
+    os.makedirs(data_dir, exist_ok=True)
+    is_new_journal = not os.path.exists(journal_fp)
+    journal = CrawlJournal(journal_fp)
+    if is_new_journal:
+        bootstrap_journal(journal, data_dir)
+
+    if args.refresh:
+        # every pair, re-checking fetched agreements with the query that found them
+        pending = [
+            (
+                cc, uni,
+                f"All{state.capitalize()}" if (state := journal.state(cc, uni)) in ("prefixes", "departments", "majors")
+                else journal.resume_query(cc, uni),
+                journal.previous(cc, uni)
+            )
+            for cc, uni in sorted(pairs, key=lambda pair: refresh_priority(journal.states.get(pair)))
+        ]
+    else:
+        # every pair that hasn't reached a final state, resuming its fallback chain
+        pending = [
+            (cc, uni, journal.resume_query(cc, uni), journal.previous(cc, uni)) for cc, uni in pairs
+            if not journal.is_finished(cc, uni)
+        ]
+
+    if not pending:
         print("[Status]: nothing to query, exiting...")
+        journal.close()
         exit(0)
 
-    # push batches of 50 queries at a time to async client & write responses locally
-    async with httpx.AsyncClient(http2=True, base_url=BASE_URL) as client:
+    for cc, uni, _, _ in pending:
+        if journal.state(cc, uni) is None:
+            journal.record(cc, uni, "pending")
+
+    completed = 0
+    changed = 0
 
-        for overflow_query_type in ("AllDepartments", "AllMajors", "Error"):
-            query_args = [overflow[i:i+50] for i in range(0, len(overflow), 50)]
-            overflow = []
+    def mark_dirty(cc: int, uni: int) -> None:
+        nonlocal changed
+        changed += 1
+        with open(dirty_fp, "a") as fp:
+            fp.write(f"{cc},{uni}\n")
 
-            if not query_args:
-                continue
-    
-            for i, batch in enumerate(query_args):
-                queries = [
-                    fetch_data(client, cc, uni, query_type, overflow, overflow_query_type, skip_agreements)
-                    for cc, uni, query_type in batch
-                ]
-                await asyncio.gather(*queries)
+    def on_result(cc: int, uni: int, outcome: str, query_type: str, meta: dict) -> None:
+        nonlocal completed
+        completed += 1
+        previous = journal.previous(cc, uni)
 
-                with open(skip_agreements_fp, "w") as fp:
-                    fp.write('\n'.join(skip_agreements))
+        if outcome in QUERY_TYPES:
+            journal.record(cc, uni, outcome[3:].lower(), **meta)
+            if meta.get("changed"):
+                remove_stale_files(data_dir, cc, uni, keep=outcome)
+                mark_dirty(cc, uni)
+        elif outcome in ("400", "empty"):
+            journal.record(cc, uni, outcome, query_type=query_type)
+            if previous:  # agreement was withdrawn or emptied since the last crawl
+                remove_stale_files(data_dir, cc, uni)
+                mark_dirty(cc, uni)
+        else:
+            carried = {key: previous[key] for key in RESPONSE_META if previous and key in previous}
+            journal.record(cc, uni, outcome, query_type=query_type, **carried)
+        print(f"[{curtime()}] {completed}/{len(pending)} {cc}->{uni}: {outcome}")
 
-                print(f"[{curtime()}] Completed run {i+1} batch {i+1} of {len(query_args)}, sleeping for 5 minutes...")
-                await asyncio.sleep(5*60 + 1)
+    try:
+        await crawl(
+            jobs=pending,
+            base_url=args.base_url.format(year=args.year),
+            data_dir=data_dir,
+            on_result=on_result,
+            rate_limit=args.rate_limit,
+            rate_window=args.rate_window,
+            num_workers=args.workers,
+            year=args.year
+        )
+    finally:
+        journal.close()
 
-                
+    print(f"[Status] {changed} agreements changed and were marked dirty in {dirty_fp}")
+    retry = sum(1 for cc, uni, _, _ in pending if not journal.is_finished(cc, uni))
+    if retry:
+        print(f"[Status] {retry} agreements timed out or errored, re-run to retry them", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+import random
+import time
+
+import polars as pl
+from utils import to_dnf, to_dnf_batch
+from utils.dnf_converter import MAX_DNF_CLAUSES
+
+"""
+Benchmark the per-row DNF converter (map_elements(to_dnf)) against
+the vectorized one (to_dnf_batch) on synthetic articulations shaped
+like articulations_from_agreements() output, and check that both
+produce byte-identical JSON. A few wide And-of-Ors are mixed in to
+exercise the --max-clauses fallback.
+"""
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("bench_dnf")
+
+ARTICULATION_DTYPE = pl.Struct({
+    "conj": pl.String,
+    "items": pl.List(pl.Struct({
+        "conj": pl.String,
+        "items": pl.List(pl.Struct({
+            "conj": pl.String,
+            "items": pl.List(pl.Int64),
+        })),
+    })),
+})
+
+
+# trees random_articulation() rarely or never draws: all-null & empty groups under Or/And
+EDGE_CASES = [
+    {"conj": "Or", "items": [{"conj": "Or", "items": [{"conj": "Or", "items": [None]}, {"conj": "And", "items": [5]}]}]},
+    {"conj": "Or", "items": [{"conj": "Or", "items": [{"conj": "Or", "items": [None]}]}]},
+    {"conj": "Or", "items": [{"conj": "And", "items": [{"conj": "Or", "items": [None, None]}, {"conj": "And", "items": [5]}]}]},
+    {"conj": "Or", "items": [{"conj": "And", "items": [{"conj": "Or", "items": []}, {"conj": "Or", "items": [1, 2]}]}]},
+    {"conj": "Or", "items": [{"conj": "And", "items": [None, {"conj": "Or", "items": [1, 2]}]}]},
+    {"conj": "Or", "items": []},
+]
+
+
+def random_articulation(rng: random.Random) -> dict | None:
+    """One articulation tree, including the null/empty edge cases to_dnf handles."""
+
+    def group():
+        if rng.random() < 0.02:
+            return None
+        ids = [rng.randint(1, 10**6) for _ in range(rng.choice((1, 1, 1, 2, 3)))]
+        if rng.random() < 0.02:
+            ids.append(None)
+        return {"conj": rng.choice(("And", "Or", "Or", None)), "items": ids if rng.random() > 0.02 else []}
+
+    def sending_articulation():
+        groups = [group() for _ in range(rng.choice((1, 1, 2, 2, 3, 4)))]
+        return {"conj": rng.choice(("And", "Or", "Or")), "items": groups}
+
+    def wide_and():  # (A1 or A2 or ...) and (B1 or B2 or ...) and ...
+        groups = [
+            {"conj": "Or", "items": [rng.randint(1, 10**6) for _ in range(rng.randint(2, 4))]}
+            for _ in range(rng.randint(4, 8))
+        ]
+        return {"conj": "And", "items": groups}
+
+    if rng.random() < 0.01:
+        return None
+    if rng.random() < 0.005:
+        return {"conj": "Or", "items": [wide_and()]}
+    return {"conj": "Or", "items": [sending_articulation() for _ in range(rng.choice((1, 1, 1, 2, 3)))]}
+
+
+def best_of(fn, repeat: int) -> tuple[float, pl.Series]:
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(rows: int = 100_000, seed: int = 0, repeat: int = 3, max_clauses: int = MAX_DNF_CLAUSES) -> None:
+    # 1. build synthetic articulations
+
+    rng = random.Random(seed)
+    articulations = pl.Series(
+        "articulation", EDGE_CASES + [random_articulation(rng) for _ in range(rows)], dtype=ARTICULATION_DTYPE
+    )
+
+    # 2. time both engines
+
+    row_time, expected = best_of(
+        lambda: articulations.map_elements(lambda expr: to_dnf(expr, max_clauses), return_dtype=pl.String), repeat
+    )
+    batch_time, actual = best_of(lambda: to_dnf_batch(articulations, max_clauses), repeat)
+    to_dnf_batch(articulations, max_clauses, logger=logger)  # report compact fallbacks once
+
+    # 3. check byte-identical output
+
+    mismatches = (expected != actual).fill_null(True) & ~(expected.is_null() & actual.is_null())
+    if mismatches.any():
+        first = mismatches.arg_true()[0]
+        raise AssertionError(
+            f"{mismatches.sum()} mismatching rows, e.g. row {first}:\n"
+            f" to_dnf:       {expected[first]}\n"
+            f" to_dnf_batch: {actual[first]}"
+        )
+
+    logger.info(f" {rows} articulations, best of {repeat}")
+    logger.info(f" map_elements(to_dnf): {row_time:.3f} seconds ({rows / row_time:,.0f} rows/s)")
+    logger.info(f" to_dnf_batch:         {batch_time:.3f} seconds ({rows / batch_time:,.0f} rows/s)")
+    logger.info(f" speedup: {row_time / batch_time:.1f}x, outputs identical")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark per-row vs vectorized DNF conversion")
+    parser.add_argument("--rows", type=int, default=100_000, help="number of synthetic articulations")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per engine, the best is reported")
+    parser.add_argument("--max-clauses", type=int, default=MAX_DNF_CLAUSES, help="DNF clause ceiling")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(rows=args.rows, seed=args.seed, repeat=args.repeat, max_clauses=args.max_clauses)
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import polars as pl
+from synthetic_assist import write_corpus
+from utils import (
+    articulations_to_dnf,
+    dedupe_glossary,
+    extract_articulations_lazy,
+    glossary_from_agreements,
+    load_full_schema,
+    to_dnf,
+    to_dnf_batch,
+    write_articulations_to_psql,
+    write_glossary_to_psql,
+)
+from utils.dnf_converter import MAX_DNF_CLAUSES
+from utils.generate_schema import _infer_schema, merge_schemas, tree_merge_schemas
+from utils.raw_store import scan_agreements
+
+"""
+Benchmark the ETL hot paths on a synthetic ASSIST corpus (see synthetic_assist.py):
+schema inference & merging, articulation extraction, DNF conversion (per row and
+vectorized), glossary creation and, with --db-url, the postgres writers.
+
+Each benchmark reports the best and median of --repeat runs. Results are saved as JSON
+together with the corpus parameters & environment, and --baseline compares them against
+an earlier results file, flagging every benchmark that got slower by more than
+--threshold (the exit status is then 1).
+"""
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("bench_etl")
+logging.getLogger("utils").setLevel(logging.WARNING)  # schema cache messages on every run
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+QUERY_TYPES = ("prefixes", "majors")
+NOISE_FLOOR_S = 0.005  # slowdowns smaller than this are never flagged
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> tuple[list[float], Any]:
+    runs, result = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        runs.append(time.perf_counter() - start)
+    return runs, result
+
+
+def record(results: dict[str, dict], name: str, runs: list[float], rows: int) -> None:
+    best = min(runs)
+    results[name] = {
+        "best_s": best,
+        "median_s": statistics.median(runs),
+        "runs_s": runs,
+        "rows": rows,
+        "rows_per_s": rows / best if best else None,
+    }
+    logger.info(f" {name:<28} {best:8.3f} seconds best, {statistics.median(runs):8.3f} median ({rows:,} rows)")
+
+
+def environment() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "polars": pl.__version__,
+        "platform": platform.platform(),
+        "polars_threads": pl.thread_pool_size(),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """Names of benchmarks whose best time regressed by more than `threshold` (e.g. 0.2 = 20%)."""
+    if baseline["corpus"] != current["corpus"]:
+        logger.warning(f" baseline corpus {baseline['corpus']} differs from {current['corpus']}, timings may not compare")
+
+    regressions = []
+    for name, result in current["results"].items():
+        if (before := baseline["results"].get(name)) is None:
+            continue
+        change = result["best_s"] / before["best_s"] - 1
+        significant = abs(result["best_s"] - before["best_s"]) > NOISE_FLOOR_S
+        flag = "REGRESSION" if change > threshold else "improved" if change < -threshold else ""
+        flag = flag if significant else ""
+        logger.info(f" {name:<28} {before['best_s']:8.3f} -> {result['best_s']:8.3f} seconds ({change:+7.1%}) {flag}")
+        if flag == "REGRESSION":
+            regressions.append(name)
+    return regressions
+
+
+def run_benchmarks(
+    data_dir: Path,
+    schema_dir: Path,
+    repeat: int,
+    dnf_sample: int,
+    max_clauses: int,
+    db_url: str | None,
+) -> dict[str, dict]:
+    results: dict[str, dict] = {}
+    files = {query_type: sorted(data_dir.glob(f"*/*{query_type}.json")) for query_type in QUERY_TYPES}
+    all_files = [fp for query_type in QUERY_TYPES for fp in files[query_type]]
+
+    # 1. schemas: per-file inference, merging, and load_full_schema without & with its cache
+
+    runs, file_schemas = measure(lambda: [_infer_schema(fp) for fp in all_files], 1)
+    record(results, "infer_schemas", runs, len(all_files))
+    runs, _ = measure(lambda: merge_schemas(file_schemas), repeat)
+    record(results, "merge_schemas", runs, len(file_schemas))
+    runs, _ = measure(lambda: tree_merge_schemas(file_schemas), repeat)
+    record(results, "tree_merge_schemas", runs, len(file_schemas))
+
+    def full_schemas(cached: bool) -> dict[str, pl.Schema]:
+        schemas = {}
+        for query_type in QUERY_TYPES:
+            schema_fp = schema_dir / f"schema_{query_type}.json"
+            if not cached:
+                schema_fp.unlink(missing_ok=True)
+            schemas[query_type] = load_full_schema(schema_fp, data_dir, f"*/*{query_type}.json")
+        return schemas
+
+    runs, _ = measure(lambda: full_schemas(cached=False), repeat)
+    record(results, "load_full_schema", runs, len(all_files))
+    runs, schemas = measure(lambda: full_schemas(cached=True), repeat)
+    record(results, "load_full_schema_cached", runs, len(all_files))
+
+    sources = [(files[query_type], schemas[query_type]) for query_type in QUERY_TYPES if files[query_type]]
+
+    # 2. articulations: extraction, DNF conversion & both together as the scripts run them
+
+    def extract() -> pl.DataFrame:
+        return pl.concat([extract_articulations_lazy(source=fs, schema=schema) for fs, schema in sources]).collect()
+
+    runs, articulations = measure(extract, repeat)
+    record(results, "extract_articulations", runs, len(articulations))
+
+    runs, _ = measure(lambda: to_dnf_batch(articulations["articulation"], max_clauses), repeat)
+    record(results, "to_dnf_batch", runs, len(articulations))
+
+    sample = articulations["articulation"].head(dnf_sample)
+    runs, _ = measure(
+        lambda: sample.map_elements(lambda expr: to_dnf(expr, max_clauses), return_dtype=pl.String), repeat
+    )
+    record(results, "to_dnf", runs, len(sample))
+
+    def articulations_pipeline() -> pl.DataFrame:
+        lazy_frames = [extract_articulations_lazy(source=fs, schema=schema) for fs, schema in sources]
+        return articulations_to_dnf(pl.concat(lazy_frames), max_clauses=max_clauses).collect()
+
+    runs, dnf_articulations = measure(articulations_pipeline, repeat)
+    record(results, "articulations_pipeline", runs, len(dnf_articulations))
+
+    # 3. glossary
+
+    # the corpus is raw JSON, parsed eagerly per file before the lazy glossary plan runs
+    def glossary() -> pl.DataFrame:
+        glossaries = [glossary_from_agreements(scan_agreements(source=fs, schema=schema)) for fs, schema in sources]
+        return dedupe_glossary(pl.concat(glossaries)).collect(engine="streaming")
+
+    runs, courses = measure(glossary, repeat)
+    record(results, "glossary_pipeline_json", runs, len(courses))
+
+    # 4. postgres writers (full loads)
+
+    if db_url is not None:
+        runs, _ = measure(lambda: write_glossary_to_psql(glossary=courses, db_url=db_url), repeat)
+        record(results, "write_glossary_to_psql", runs, len(courses))
+        runs, _ = measure(lambda: write_articulations_to_psql(agreements=dnf_articulations, db_url=db_url), repeat)
+        record(results, "write_articulations_to_psql", runs, len(dnf_articulations))
+
+    return results
+
+
+def main(
+    scale: float = 0.1,
+    seed: int = 0,
+    adversarial: bool = False,
+    data_dir: Path | None = None,
+    repeat: int = 3,
+    dnf_sample: int = 20_000,
+    max_clauses: int = MAX_DNF_CLAUSES,
+    db_url: str | None = None,
+    out: Path | None = None,
+    baseline: Path | None = None,
+    threshold: float = 0.2,
+) -> list[str]:
+    with tempfile.TemporaryDirectory(prefix="bench_etl_") as tmp:
+        # 1. generate the corpus, unless an existing one is given
+
+        if data_dir is None:
+            data_dir = Path(tmp) / "data"
+            corpus = {"scale": scale, "seed": seed, "adversarial": adversarial}
+            files = write_corpus(data_dir, scale=scale, seed=seed, adversarial=adversarial)
+            size = sum(fp.stat().st_size for fp in files)
+            logger.info(f" synthetic corpus: {len(files)} agreements, {size / 2**20:.1f} megabytes")
+        else:
+            corpus = {"data_dir": str(data_dir)}
+
+        # 2. run the benchmarks
+
+        logger.info(f" best of {repeat} runs")
+        results = run_benchmarks(
+            data_dir=data_dir,
+            schema_dir=Path(tmp) / "schemas",
+            repeat=repeat,
+            dnf_sample=dnf_sample,
+            max_clauses=max_clauses,
+            db_url=db_url,
+        )
+
+    # 3. save results & compare them against the baseline
+
+    current = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "corpus": corpus,
+        "repeat": repeat,
+        "max_clauses": max_clauses,
+        "environment": environment(),
+        "results": results,
+    }
+    if out is None:
+        out = RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(current, indent=2))
+    logger.info(f" results saved to {out}")
+
+    if baseline is None:
+        return []
+    logger.info(f" compared to {baseline}:")
+    regressions = compare(json.loads(baseline.read_text()), current, threshold)
+    if regressions:
+        logger.warning(f" {len(regressions)} regressions over {threshold:.0%}: {', '.join(regressions)}")
+    return regressions
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the ETL hot paths on a synthetic ASSIST corpus")
+    parser.add_argument("--scale", type=float, default=0.1, help="synthetic corpus size relative to the real one")
+    parser.add_argument("--seed", type=int, default=0, help="random seed of the synthetic corpus")
+    parser.add_argument("--adversarial", action="store_true", help="add DNF-exploding articulations & schema conflicts")
+    parser.add_argument("--data-dir", type=Path, help="benchmark an existing corpus instead of generating one")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument("--dnf-sample", type=int, default=20_000, help="articulations the per-row to_dnf is timed on")
+    parser.add_argument("--max-clauses", type=int, default=MAX_DNF_CLAUSES, help="DNF clause ceiling")
+    parser.add_argument("--db-url", help="also time the postgres writers against this (scratch!) database")
+    parser.add_argument("--out", type=Path, help="results file (default: benchmarks/results/[timestamp].json)")
+    parser.add_argument("--baseline", type=Path, help="earlier results file to flag regressions against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="slowdown flagged as a regression, e.g. 0.2 = 20%%")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    regressions = main(
+        scale=args.scale,
+        seed=args.seed,
+        adversarial=args.adversarial,
+        data_dir=args.data_dir,
+        repeat=args.repeat,
+        dnf_sample=args.dnf_sample,
+        max_clauses=args.max_clauses,
+        db_url=args.db_url,
+        out=args.out,
+        baseline=args.baseline,
+        threshold=args.threshold,
+    )
+    sys.exit(1 if regressions else 0)
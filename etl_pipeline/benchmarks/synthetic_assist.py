@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import logging
+import random
+from pathlib import Path
+
+"""
+Generate a synthetic corpus of ASSIST.org agreements, laid out like one year of
+download_data.py's output (data/year=[year]/[uni]/[cc]to[uni]-[prefixes|majors].json) so
+every ETL stage can run on it.
+
+--scale 1 is roughly the size of the 2024-2025 corpus (32 universities x 116 community
+colleges, a few dozen articulations per agreement); 10 and 100 add universities. With
+--adversarial, some articulations are wide And-of-Ors whose DNF explodes past the clause
+ceiling, and some files vary field types (int vs float units, null-only fields, extra
+struct fields) so schema merging has real conflicts to resolve. ASSIST trees always
+have the same depth (articulation > course groups > courses), so "deep" trees are made
+as wide and as alternating as that shape allows.
+"""
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("synthetic_assist")
+
+BASE_UNIS = 32
+BASE_CCS = 116
+UNI_COURSES = 400  # distinct courses per institution
+CC_COURSES = 1200
+TERMS = ("F2019", "W2020", "S2021", "Su2022", "F2023", "F2024", "")
+PREFIXES = ("MATH", "PHYS", "CHEM", "BIOL", "ENGL", "HIST", "STAT", "CS", "ECON", "PSYC", "ART", "MUS")
+TITLES = (
+    "Calculus", "Linear Algebra", "Physics", "General Chemistry", "Biology", "Composition",
+    "US History", "Statistics", "Programming", "Data Structures", "Microeconomics", "Psychology",
+)
+
+
+def course_id(inst_id: int, number: int) -> int:
+    """courseIdentifierParentId of an institution's `number`-th course, unique across institutions."""
+    return inst_id * 10_000 + number
+
+
+def course(rng: random.Random, inst_id: int, pool: int, odd_types: bool = False) -> dict:
+    number = rng.randrange(pool)
+    units = rng.choice((3, 4, 5))
+    return {
+        "courseIdentifierParentId": course_id(inst_id, number),
+        "courseTitle": f"{TITLES[number % len(TITLES)]} {number // len(TITLES) + 1}",
+        "courseNumber": str(number % 300 + 1) + ("" if number < 300 else "ABCD"[number // 300 % 4]),
+        "prefix": PREFIXES[number % len(PREFIXES)],
+        "prefixDescription": PREFIXES[number % len(PREFIXES)].title(),
+        "departmentParentId": inst_id * 100 + number % len(PREFIXES),
+        "begin": rng.choice(TERMS[:-1]),
+        "end": rng.choice(TERMS),
+        # files whose units are all whole numbers infer Int64, merged with the others' Float64
+        "minUnits": units if odd_types else float(units),
+        "maxUnits": units if odd_types else float(units + rng.choice((0, 0, 1))),
+        "pathways": None,
+    }
+
+
+def course_group(rng: random.Random, cc: int, courses: int, conj: str, odd_types: bool = False) -> dict:
+    items = [course(rng, cc, CC_COURSES, odd_types) for _ in range(courses)]
+    if rng.random() < 0.02:  # a non-course requirement, ids are null
+        items.append({"courseIdentifierParentId": None, "courseTitle": "Any literature course"})
+    return {"courseConjunction": conj, "items": items, "position": 0, "type": "CourseGroup", "advisements": []}
+
+
+def sending_articulation(rng: random.Random, cc: int, adversarial: bool, odd_types: bool) -> dict:
+    if rng.random() < 0.05:  # no articulation for this course
+        return {"items": [], "courseGroupConjunctions": [], "deniedCourses": [], "notes": []}
+
+    if adversarial and rng.random() < 0.02:
+        # (A1 or ... or A5) and (B1 or ...) and ... : up to 5^12 DNF clauses
+        groups = [course_group(rng, cc, rng.randint(2, 5), "Or", odd_types) for _ in range(rng.randint(6, 12))]
+        conjunctions = [{"groupConjunction": "And"}]
+    elif adversarial and rng.random() < 0.02:
+        # many alternating And/Or groups of many courses each
+        groups = [
+            course_group(rng, cc, rng.randint(4, 10), ("And", "Or")[i % 2], odd_types)
+            for i in range(rng.randint(8, 20))
+        ]
+        conjunctions = [{"groupConjunction": rng.choice(("And", "Or"))}]
+    else:
+        groups = [
+            course_group(rng, cc, rng.choice((1, 1, 1, 2, 3)), rng.choice(("And", "Or", "Or")), odd_types)
+            for _ in range(rng.choice((1, 1, 2, 2, 3)))
+        ]
+        conjunctions = [] if len(groups) == 1 or rng.random() < 0.5 else [{"groupConjunction": rng.choice(("And", "Or"))}]
+
+    return {"items": groups, "courseGroupConjunctions": conjunctions, "deniedCourses": [], "notes": []}
+
+
+def articulation(rng: random.Random, cc: int, uni: int, adversarial: bool, odd_types: bool) -> dict:
+    result = {"type": "Course", "sendingArticulation": sending_articulation(rng, cc, adversarial, odd_types)}
+    if rng.random() < 0.15:  # a series of university courses articulated together
+        result["course"] = None
+        result["series"] = {
+            "conjunction": "And",
+            "name": "Series",
+            "courses": [course(rng, uni, UNI_COURSES, odd_types) for _ in range(rng.randint(2, 3))],
+        }
+    else:
+        result["course"] = course(rng, uni, UNI_COURSES, odd_types)
+        result["series"] = None
+    if odd_types:  # a field only some files have
+        result["receivingAttributes"] = {"courseAttributes": [], "seriesAttributes": None}
+    return result
+
+
+def agreement(rng: random.Random, cc: int, uni: int, query_type: str, adversarial: bool) -> list[dict]:
+    """Contents of one agreement file, shaped like ASSIST's AllPrefixes/AllMajors responses."""
+    odd_types = adversarial and rng.random() < 0.1
+    if query_type == "majors":
+        return [
+            {"templateCellId": f"{cc}-{uni}-{i}", "articulation": articulation(rng, cc, uni, adversarial, odd_types)}
+            for i in range(rng.randint(10, 60))
+        ]
+    return [
+        {
+            "name": PREFIXES[i % len(PREFIXES)],
+            "articulations": [articulation(rng, cc, uni, adversarial, odd_types) for _ in range(rng.randint(1, 6))],
+        }
+        for i in range(rng.randint(4, 16))
+    ]
+
+
+def agreement_pairs(scale: float) -> list[tuple[int, int]]:
+    """(cc, uni) pairs of a corpus `scale` times the size of the real one, universities added as needed."""
+    count = max(1, round(BASE_UNIS * BASE_CCS * scale))
+    unis = -(-count // BASE_CCS)
+    return [(cc, uni) for uni in range(1, unis + 1) for cc in range(BASE_UNIS + 1, BASE_UNIS + BASE_CCS + 1)][:count]
+
+
+def write_corpus(data_dir: Path, scale: float = 1.0, seed: int = 0, adversarial: bool = False) -> list[Path]:
+    """Write a synthetic corpus to `data_dir` and return its agreement files (about 30% majors)."""
+    rng = random.Random(seed)
+    files = []
+    for cc, uni in agreement_pairs(scale):
+        query_type = "majors" if rng.random() < 0.3 else "prefixes"
+        fp = data_dir / str(uni) / f"{cc}to{uni}-{query_type}.json"
+        fp.parent.mkdir(parents=True, exist_ok=True)
+        fp.write_text(json.dumps(agreement(rng, cc, uni, query_type, adversarial)))
+        files.append(fp)
+    return files
+
+
+def main(out: Path, scale: float = 1.0, seed: int = 0, adversarial: bool = False) -> None:
+    files = write_corpus(out, scale=scale, seed=seed, adversarial=adversarial)
+    size = sum(fp.stat().st_size for fp in files)
+    logger.info(f" wrote {len(files)} agreements ({size / 2**20:.1f} megabytes) to {out}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus of ASSIST.org agreements")
+    parser.add_argument("out", type=Path, help="data directory to write [uni]/[cc]to[uni]-[query type].json into")
+    parser.add_argument("--scale", type=float, default=1.0, help="corpus size relative to the real one, e.g. 0.1, 1, 10, 100")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--adversarial", action="store_true", help="add DNF-exploding articulations & schema conflicts")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(out=args.out, scale=args.scale, seed=args.seed, adversarial=args.adversarial)
@@ -1,21 +1,44 @@
 #!/usr/bin/env python
 
+import argparse
 import logging
+from pathlib import Path
 
 import polars as pl
 from utils import (
+    annotate,
+    articulations_to_dnf,
+    deploy_sql_functions,
     extract_articulations_lazy,
+    files_size,
     load_full_schema,
+    profiled_collect,
+    profiling,
+    record_load_version,
     timer,
-    to_dnf,
     write_articulations_to_psql,
 )
+from utils.dirty import commit_dirty_pairs, read_dirty_pairs
+from utils.dnf_converter import MAX_DNF_CLAUSES
 from utils.env import PSQL_URL
-from utils.paths import DATA_DIR, SCHEMA_MAJOR_FP, SCHEMA_PREFIX_FP
+from utils.paths import (
+    CURRENT_YEAR,
+    DATA_DIR,
+    RAW_STORE_DIR,
+    SCHEMA_DIR,
+    SCHEMA_MAJOR_FILENAME,
+    SCHEMA_PREFIX_FILENAME,
+    year_dir,
+)
+from utils.raw_store import agreement_sources
 
 """
-Query a local copy of the 2024-2025 ASSIST.org articulation
-agreements and write them to a local (testing) postgres database.
+Query a local copy of one academic year's ASSIST.org articulation
+agreements (--year, 2024-2025 by default) and write them to that
+year's partition of a local (testing) postgres database.
+
+With --dirty-only, only the cc/uni pairs that download_data.py
+marked as changed since the last run are re-processed.
 """
 
 logging.basicConfig(level=logging.INFO)
@@ -23,63 +46,152 @@ logger = logging.getLogger("agreements_to_db")
 
 
 @timer(label="Agreements to DB", logger=logger, level=logging.INFO)
-def main() -> None:
-    # 1. get polars schemas
-
-    with timer("Load schemas", logger=logger, level=logging.INFO):
-        # load schema for prefix-based data
-        schema_prefix = load_full_schema(
-            schema_fp=SCHEMA_PREFIX_FP,
-            data_dir=DATA_DIR,
-            data_glob="*/*prefixes.json",
-            logger=logger,
-        )
+def main(
+    year: int = CURRENT_YEAR,
+    dirty_only: bool = False,
+    from_store: bool = False,
+    max_clauses: int = MAX_DNF_CLAUSES,
+    sync: bool = False,
+) -> None:
+    # 0. find the agreement files to process
+
+    data_dir, store_dir = year_dir(DATA_DIR, year), year_dir(RAW_STORE_DIR, year)
+    pairs = None
+    if dirty_only:
+        pairs, dirty_offset = read_dirty_pairs(consumer="agreements_to_db", year=year)
+        if not pairs:
+            logger.info("No dirty cc/uni pairs, nothing to do")
+            return
+        logger.info(f"Processing {len(pairs)} dirty cc/uni pairs")
+
+    prefix_files, major_files = (
+        agreement_sources(query_type, data_dir, store_dir, from_store=from_store, pairs=pairs)
+        for query_type in ("prefixes", "majors")
+    )
+
+    # 1. get polars schemas (store files carry their own)
+
+    schema_prefix = schema_major = None
+    if not from_store:
+        with timer("Load schemas", logger=logger, level=logging.INFO):
+            # load schema for prefix-based data
+            schema_prefix = load_full_schema(
+                schema_fp=year_dir(SCHEMA_DIR, year) / SCHEMA_PREFIX_FILENAME,
+                data_dir=data_dir,
+                data_glob="*/*prefixes.json",
+                logger=logger,
+            )
 
-        # load schema for major-based data
-        schema_major = load_full_schema(
-            schema_fp=SCHEMA_MAJOR_FP,
-            data_dir=DATA_DIR,
-            data_glob="*/*majors.json",
-            logger=logger,
-        )
+            # load schema for major-based data
+            schema_major = load_full_schema(
+                schema_fp=year_dir(SCHEMA_DIR, year) / SCHEMA_MAJOR_FILENAME,
+                data_dir=data_dir,
+                data_glob="*/*majors.json",
+                logger=logger,
+            )
 
     # 2. Extract Articulations as LazyFrames
 
     with timer(label="LF Extraction", logger=logger, level=logging.INFO):
-        prefixes_lazy = pl.concat(
-            (
-                extract_articulations_lazy(fp=fp, schema=schema_prefix)
-                for fp in DATA_DIR.glob("*/*prefixes.json")
-            )
-        ).with_columns(
-            pl.col("articulation").map_elements(to_dnf, return_dtype=pl.String)
-        )
-
-        majors_lazy = pl.concat(
-            (
-                extract_articulations_lazy(fp=fp, schema=schema_major)
-                for fp in DATA_DIR.glob("*/*majors.json")
-            )
-        ).with_columns(
-            pl.col("articulation").map_elements(to_dnf, return_dtype=pl.String)
-        )
+        annotate(files=len(prefix_files) + len(major_files), bytes_read=files_size([*prefix_files, *major_files]))
+        lazy_frames = [
+            extract_articulations_lazy(source=files, schema=schema)
+            for files, schema in ((prefix_files, schema_prefix), (major_files, schema_major))
+            if files
+        ]
 
     # 3. Collect Articulations
 
     with timer(label="LF Collection", logger=logger, level=logging.INFO):
-        articulations = pl.concat((prefixes_lazy, majors_lazy)).unique().collect()
+        if lazy_frames:
+            articulations = profiled_collect(
+                articulations_to_dnf(pl.concat(lazy_frames), max_clauses=max_clauses, logger=logger),
+                label="articulations",
+            )
+        else:  # every dirty pair had its agreement withdrawn
+            articulations = pl.DataFrame(
+                schema={"course_id": pl.Int32, "cc": pl.Int16, "uni": pl.Int16, "articulation": pl.String}
+            )
         logger.info(
             f" articulations DF estimated size: {articulations.estimated_size('mb'):.2f} megabytes, {len(articulations)} rows"
         )
+        annotate(rows_out=len(articulations))
 
-        del prefixes_lazy, majors_lazy
+        del lazy_frames
 
     # 4. Write articulations to database
 
     with timer(label="Write to PgSQL", logger=logger, level=logging.INFO):
-        write_articulations_to_psql(agreements=articulations, db_url=PSQL_URL)
+        write_articulations_to_psql(
+            agreements=articulations, db_url=PSQL_URL, year=year, pairs=pairs, sync=sync, logger=logger
+        )
+        deployed = deploy_sql_functions(db_url=PSQL_URL)
+        logger.info(f" deployed SQL functions: {', '.join(deployed)}")
+        logger.info(f" load version: {record_load_version(db_url=PSQL_URL, year=year)}")
+
+    if dirty_only:
+        commit_dirty_pairs(consumer="agreements_to_db", offset=dirty_offset, year=year)
     return
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Write ASSIST.org articulations to postgres")
+    parser.add_argument(
+        "--year",
+        type=int,
+        default=CURRENT_YEAR,
+        help=f"ASSIST.org academic year id to process, e.g. 75 for 2024-2025 (default: {CURRENT_YEAR})",
+    )
+    parser.add_argument(
+        "--dirty-only",
+        action="store_true",
+        help="only re-process cc/uni pairs marked dirty by download_data.py",
+    )
+    parser.add_argument(
+        "--from-store",
+        action="store_true",
+        help="read agreements from the columnar store built by ingest_raw.py instead of raw JSON",
+    )
+    parser.add_argument(
+        "--max-clauses",
+        type=int,
+        default=MAX_DNF_CLAUSES,
+        help=f"keep articulations that expand past this many DNF clauses in compact form (default: {MAX_DNF_CLAUSES})",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="apply only the row-level diff against the existing table(s) instead of reloading them",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="TRACE_FP",
+        help="profile the run's stages (RSS, rows, bytes) and write them to TRACE_FP as a Chrome trace",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="with --trace, also record Python allocations per stage (tracemalloc, slower)",
+    )
+    parser.add_argument(
+        "--trace-polars",
+        action="store_true",
+        help="with --trace, also record per-node timings of the polars queries (LazyFrame.profile)",
+    )
+    args = parser.parse_args()
+    if (args.trace_memory or args.trace_polars) and args.trace is None:
+        parser.error("--trace-memory and --trace-polars need --trace")
+    return args
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    with profiling(trace_fp=args.trace, memory=args.trace_memory, polars=args.trace_polars, logger=logger):
+        main(
+            year=args.year,
+            dirty_only=args.dirty_only,
+            from_store=args.from_store,
+            max_clauses=args.max_clauses,
+            sync=args.sync,
+        )
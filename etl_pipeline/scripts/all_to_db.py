@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+from pathlib import Path
+
+import polars as pl
+from utils import (
+    annotate,
+    articulations_from_agreements,
+    articulations_to_dnf,
+    dedupe_glossary,
+    deploy_sql_functions,
+    files_size,
+    glossary_from_agreements,
+    load_full_schema,
+    profiled_collect_all,
+    profiling,
+    record_load_version,
+    timer,
+    write_articulations_to_psql,
+    write_artifacts,
+    write_glossary_to_psql,
+)
+from utils.dirty import commit_dirty_pairs, read_dirty_pairs
+from utils.dnf_converter import MAX_DNF_CLAUSES
+from utils.env import PSQL_URL
+from utils.paths import (
+    ARTIFACT_DIR,
+    CURRENT_YEAR,
+    DATA_DIR,
+    RAW_STORE_DIR,
+    SCHEMA_DIR,
+    SCHEMA_MAJOR_FILENAME,
+    SCHEMA_PREFIX_FILENAME,
+    year_dir,
+)
+from utils.raw_store import agreement_sources, scan_agreements
+
+"""
+Build the articulations and glossary partitions of one academic
+year (--year, 2024-2025 by default) from a local copy of its
+ASSIST.org agreements in a single pass: each agreement file is
+read once and both tables are derived from the same LazyFrame,
+collected together with pl.collect_all.
+"""
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("all_to_db")
+
+
+@timer(label="Articulations & Glossary to DB", logger=logger, level=logging.INFO)
+def main(
+    year: int = CURRENT_YEAR,
+    dirty_only: bool = False,
+    from_store: bool = False,
+    max_clauses: int = MAX_DNF_CLAUSES,
+    sync: bool = False,
+    artifacts: bool = False,
+) -> None:
+    # 0. find the agreement files to process
+
+    data_dir, store_dir = year_dir(DATA_DIR, year), year_dir(RAW_STORE_DIR, year)
+    pairs = None
+    if dirty_only:
+        pairs, dirty_offset = read_dirty_pairs(consumer="all_to_db", year=year)
+        if not pairs:
+            logger.info("No dirty cc/uni pairs, nothing to do")
+            return
+        logger.info(f"Processing {len(pairs)} dirty cc/uni pairs")
+
+    sources = {
+        query_type: agreement_sources(query_type, data_dir, store_dir, from_store=from_store, pairs=pairs)
+        for query_type in ("prefixes", "majors")
+    }
+
+    # 1. get polars schemas (store files carry their own)
+
+    schemas = {"prefixes": None, "majors": None}
+    if not from_store:
+        with timer("Load schemas", logger=logger, level=logging.INFO):
+            schemas["prefixes"] = load_full_schema(
+                schema_fp=year_dir(SCHEMA_DIR, year) / SCHEMA_PREFIX_FILENAME,
+                data_dir=data_dir,
+                data_glob="*/*prefixes.json",
+                logger=logger,
+            )
+            schemas["majors"] = load_full_schema(
+                schema_fp=year_dir(SCHEMA_DIR, year) / SCHEMA_MAJOR_FILENAME,
+                data_dir=data_dir,
+                data_glob="*/*majors.json",
+                logger=logger,
+            )
+
+    # 2. Read each agreement once & build both tables' plans from it
+    #    (prefix & major structs differ, so each query type is scanned separately)
+
+    with timer(label="LF Extraction", logger=logger, level=logging.INFO):
+        agreement_files = [fp for files in sources.values() for fp in files]
+        annotate(files=len(agreement_files), bytes_read=files_size(agreement_files))
+        agreements = [
+            scan_agreements(source=files, schema=schemas[query_type])
+            for query_type, files in sources.items()
+            if files
+        ]
+
+        articulations_lazy = articulations_to_dnf(
+            pl.concat([articulations_from_agreements(lf) for lf in agreements]),
+            max_clauses=max_clauses,
+            logger=logger,
+        ) if agreements else None
+        glossary_lazy = dedupe_glossary(
+            pl.concat([glossary_from_agreements(lf) for lf in agreements])
+        ) if agreements else None
+
+    # 3. Collect both tables together so shared scans are only executed once
+
+    with timer(label="LF Collection", logger=logger, level=logging.INFO):
+        if agreements:
+            articulations, glossary = profiled_collect_all([articulations_lazy, glossary_lazy])
+        else:  # every dirty pair had its agreement withdrawn
+            articulations = pl.DataFrame(
+                schema={"course_id": pl.Int32, "cc": pl.Int16, "uni": pl.Int16, "articulation": pl.String}
+            )
+            glossary = None
+        logger.info(
+            f" articulations DF estimated size: {articulations.estimated_size('mb'):.2f} megabytes, {len(articulations)} rows"
+        )
+        if glossary is not None:
+            logger.info(
+                f" glossary DF estimated size: {glossary.estimated_size('mb'):.2f} megabytes, {len(glossary)} rows"
+            )
+        annotate(rows_out=len(articulations) + (len(glossary) if glossary is not None else 0))
+
+        del agreements, articulations_lazy, glossary_lazy
+
+    # 4. Write both tables to database
+
+    with timer(label="Write to PgSQL", logger=logger, level=logging.INFO):
+        write_articulations_to_psql(
+            agreements=articulations, db_url=PSQL_URL, year=year, pairs=pairs, sync=sync, logger=logger
+        )
+        if glossary is not None:
+            write_glossary_to_psql(
+                glossary=glossary, db_url=PSQL_URL, year=year, upsert=dirty_only, sync=sync, logger=logger
+            )
+        deployed = deploy_sql_functions(db_url=PSQL_URL)
+        logger.info(f" deployed SQL functions: {', '.join(deployed)}")
+        logger.info(f" load version: {record_load_version(db_url=PSQL_URL, year=year)}")
+
+    # 5. Precompute every lambda response as a static artifact
+
+    if artifacts:
+        with timer(label="Write artifacts", logger=logger, level=logging.INFO):
+            write_artifacts(
+                articulations=articulations, glossary=glossary, artifact_dir=year_dir(ARTIFACT_DIR, year), logger=logger
+            )
+
+    if dirty_only:
+        commit_dirty_pairs(consumer="all_to_db", offset=dirty_offset, year=year)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Write ASSIST.org articulations and glossary to postgres")
+    parser.add_argument(
+        "--year",
+        type=int,
+        default=CURRENT_YEAR,
+        help=f"ASSIST.org academic year id to process, e.g. 75 for 2024-2025 (default: {CURRENT_YEAR})",
+    )
+    parser.add_argument(
+        "--dirty-only",
+        action="store_true",
+        help="only re-process cc/uni pairs marked dirty by download_data.py",
+    )
+    parser.add_argument(
+        "--from-store",
+        action="store_true",
+        help="read agreements from the columnar store built by ingest_raw.py instead of raw JSON",
+    )
+    parser.add_argument(
+        "--max-clauses",
+        type=int,
+        default=MAX_DNF_CLAUSES,
+        help=f"keep articulations that expand past this many DNF clauses in compact form (default: {MAX_DNF_CLAUSES})",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="apply only the row-level diff against the existing table(s) instead of reloading them",
+    )
+    parser.add_argument(
+        "--artifacts",
+        action="store_true",
+        help=f"also write every lambda response as a static gzip JSON file under {ARTIFACT_DIR}/year=[year]",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="TRACE_FP",
+        help="profile the run's stages (RSS, rows, bytes) and write them to TRACE_FP as a Chrome trace",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="with --trace, also record Python allocations per stage (tracemalloc, slower)",
+    )
+    parser.add_argument(
+        "--trace-polars",
+        action="store_true",
+        help="with --trace, also record per-node timings of the polars queries (LazyFrame.profile)",
+    )
+    args = parser.parse_args()
+    if (args.trace_memory or args.trace_polars) and args.trace is None:
+        parser.error("--trace-memory and --trace-polars need --trace")
+    if args.artifacts and args.dirty_only:  # artifacts are rebuilt from the full tables
+        parser.error("--artifacts needs a full run, it can't be combined with --dirty-only")
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    with profiling(trace_fp=args.trace, memory=args.trace_memory, polars=args.trace_polars, logger=logger):
+        main(
+            year=args.year,
+            dirty_only=args.dirty_only,
+            from_store=args.from_store,
+            max_clauses=args.max_clauses,
+            sync=args.sync,
+            artifacts=args.artifacts,
+        )
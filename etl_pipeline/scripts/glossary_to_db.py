@@ -1,15 +1,43 @@
 #!/usr/bin/env python
 
+import argparse
 import logging
+from pathlib import Path
 
 import polars as pl
-from utils import create_glossary, load_full_schema, timer, write_glossary_to_psql
+from utils import (
+    annotate,
+    dedupe_glossary,
+    deploy_sql_functions,
+    files_size,
+    glossary_from_agreements,
+    load_full_schema,
+    profiled_collect,
+    profiling,
+    record_load_version,
+    timer,
+    write_glossary_to_psql,
+)
+from utils.dirty import commit_dirty_pairs, read_dirty_pairs
 from utils.env import PSQL_URL
-from utils.paths import DATA_DIR, SCHEMA_MAJOR_FP, SCHEMA_PREFIX_FP
+from utils.paths import (
+    CURRENT_YEAR,
+    DATA_DIR,
+    RAW_STORE_DIR,
+    SCHEMA_DIR,
+    SCHEMA_MAJOR_FILENAME,
+    SCHEMA_PREFIX_FILENAME,
+    year_dir,
+)
+from utils.raw_store import agreement_sources, scan_agreements
 
 """
-Query a local copy of the 2024-2025 ASSIST.org articulations and
-build a reference glossary of every mentioned course by course id
+Query a local copy of one academic year's ASSIST.org articulations
+(--year, 2024-2025 by default) and build that year's partition of a
+reference glossary of every mentioned course by course id
+
+With --dirty-only, only courses mentioned by the cc/uni pairs that
+download_data.py marked as changed are upserted.
 """
 
 logging.basicConfig(level=logging.INFO)
@@ -17,72 +45,122 @@ logger = logging.getLogger("agreements_to_db")
 
 
 @timer(label="Glossary to DB", logger=logger, level=logging.INFO)
-def main():
-
-    # 1. get polars schemas
-
-    with timer("Load schemas", logger=logger, level=logging.INFO):
-        schema_prefix = load_full_schema(
-            schema_fp=SCHEMA_PREFIX_FP,
-            data_dir=DATA_DIR,
-            data_glob="*/*prefixes.json",
-            logger=logger,
-        )
+def main(year: int = CURRENT_YEAR, dirty_only: bool = False, from_store: bool = False, sync: bool = False):
+
+    # 0. find the agreement files to process
+
+    data_dir, store_dir = year_dir(DATA_DIR, year), year_dir(RAW_STORE_DIR, year)
+    pairs = None
+    if dirty_only:
+        pairs, dirty_offset = read_dirty_pairs(consumer="glossary_to_db", year=year)
+        logger.info(f"Processing {len(pairs)} dirty cc/uni pairs")
+
+    prefix_files, major_files = (
+        agreement_sources(query_type, data_dir, store_dir, from_store=from_store, pairs=pairs)
+        for query_type in ("prefixes", "majors")
+    )
+
+    if dirty_only and not (prefix_files or major_files):
+        logger.info("No agreements among dirty cc/uni pairs, nothing to do")
+        commit_dirty_pairs(consumer="glossary_to_db", offset=dirty_offset, year=year)
+        return
+
+    # 1. get polars schemas (store files carry their own)
+
+    schema_prefix = schema_major = None
+    if not from_store:
+        with timer("Load schemas", logger=logger, level=logging.INFO):
+            schema_prefix = load_full_schema(
+                schema_fp=year_dir(SCHEMA_DIR, year) / SCHEMA_PREFIX_FILENAME,
+                data_dir=data_dir,
+                data_glob="*/*prefixes.json",
+                logger=logger,
+            )
 
-        # load schema for major-based data
-        schema_major = load_full_schema(
-            schema_fp=SCHEMA_MAJOR_FP,
-            data_dir=DATA_DIR,
-            data_glob="*/*majors.json",
-            logger=logger,
-        )
+            # load schema for major-based data
+            schema_major = load_full_schema(
+                schema_fp=year_dir(SCHEMA_DIR, year) / SCHEMA_MAJOR_FILENAME,
+                data_dir=data_dir,
+                data_glob="*/*majors.json",
+                logger=logger,
+            )
 
-    # 2. Extract & concatenate glossary dataframes
+    # 2. Extract, concatenate & dedupe glossary rows as one lazy plan on the streaming engine
 
     with timer("Extract & Concat DFs", logger):
-        prefixes_agg = pl.concat(
-            (
-                create_glossary(fp=fp, schema=schema_prefix)
-                for fp in DATA_DIR.glob("*/*prefixes.json")
-            )
-        ).unique()
-        majors_agg = pl.concat(
-            (
-                create_glossary(fp=fp, schema=schema_major)
-                for fp in DATA_DIR.glob("*/*majors.json")
-            )
-        ).unique()
-
-        qmap = {"W": 1, "S": 2, "Su": 3, "F": 4}
-
-        courses = (
-            pl.concat((prefixes_agg, majors_agg), rechunk=True)
-            .unique()
-            .with_columns(
-                eterm=(
-                    pl.col("end").replace("", None).str.slice(-4).cast(pl.UInt16) * 10
-                    + pl.col("end")
-                    .replace("", None)
-                    .str.head(-4)
-                    .replace_strict(qmap, return_dtype=pl.UInt16)
-                ).fill_null(99999)
-            )
-            .sort("eterm", descending=True)
-            .drop("begin", "end", "eterm")
-            .unique(subset=["course_id"], keep="first")
-            .unique(subset=["course_code", "inst_id"], keep="first")
-        )
+        annotate(files=len(prefix_files) + len(major_files), bytes_read=files_size([*prefix_files, *major_files]))
+        glossary_lazy = pl.concat([
+            glossary_from_agreements(scan_agreements(source=files, schema=schema))
+            for files, schema in ((prefix_files, schema_prefix), (major_files, schema_major))
+            if files
+        ])
+
+        courses = profiled_collect(dedupe_glossary(glossary_lazy), label="glossary", engine="streaming")
+        annotate(rows_out=len(courses))
         logger.info(
             f" glossary DF estimated size: {courses.estimated_size('mb'):.2f} megabytes, {len(courses)} rows"
         )
 
-        del prefixes_agg, majors_agg
-
     # 3. Write glossary to db
 
     with timer(label="Write to PgSQL", logger=logger, level=logging.INFO):
-        write_glossary_to_psql(glossary=courses, db_url=PSQL_URL)
+        write_glossary_to_psql(
+            glossary=courses, db_url=PSQL_URL, year=year, upsert=dirty_only, sync=sync, logger=logger
+        )
+        deployed = deploy_sql_functions(db_url=PSQL_URL)
+        logger.info(f" deployed SQL functions: {', '.join(deployed)}")
+        logger.info(f" load version: {record_load_version(db_url=PSQL_URL, year=year)}")
+
+    if dirty_only:
+        commit_dirty_pairs(consumer="glossary_to_db", offset=dirty_offset, year=year)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Write a glossary of ASSIST.org courses to postgres")
+    parser.add_argument(
+        "--year",
+        type=int,
+        default=CURRENT_YEAR,
+        help=f"ASSIST.org academic year id to process, e.g. 75 for 2024-2025 (default: {CURRENT_YEAR})",
+    )
+    parser.add_argument(
+        "--dirty-only",
+        action="store_true",
+        help="only upsert courses from cc/uni pairs marked dirty by download_data.py",
+    )
+    parser.add_argument(
+        "--from-store",
+        action="store_true",
+        help="read agreements from the columnar store built by ingest_raw.py instead of raw JSON",
+    )
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="apply only the row-level diff against the existing table(s) instead of reloading them",
+    )
+    parser.add_argument(
+        "--trace",
+        type=Path,
+        metavar="TRACE_FP",
+        help="profile the run's stages (RSS, rows, bytes) and write them to TRACE_FP as a Chrome trace",
+    )
+    parser.add_argument(
+        "--trace-memory",
+        action="store_true",
+        help="with --trace, also record Python allocations per stage (tracemalloc, slower)",
+    )
+    parser.add_argument(
+        "--trace-polars",
+        action="store_true",
+        help="with --trace, also record per-node timings of the polars queries (LazyFrame.profile)",
+    )
+    args = parser.parse_args()
+    if (args.trace_memory or args.trace_polars) and args.trace is None:
+        parser.error("--trace-memory and --trace-polars need --trace")
+    return args
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    with profiling(trace_fp=args.trace, memory=args.trace_memory, polars=args.trace_polars, logger=logger):
+        main(year=args.year, dirty_only=args.dirty_only, from_store=args.from_store, sync=args.sync)
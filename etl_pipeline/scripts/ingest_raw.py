@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+import argparse
+import logging
+
+from utils import load_full_schema, timer
+from utils.dirty import agreement_files, commit_dirty_pairs, read_dirty_pairs
+from utils.paths import (
+    CURRENT_YEAR,
+    DATA_DIR,
+    RAW_STORE_DIR,
+    SCHEMA_DIR,
+    SCHEMA_MAJOR_FILENAME,
+    SCHEMA_PREFIX_FILENAME,
+    year_dir,
+)
+from utils.raw_store import ingest_agreement, is_ingested, store_files
+
+"""
+Normalize one academic year's downloaded ASSIST.org agreements
+(--year, 2024-2025 by default) into a compressed, hive-partitioned
+Parquet store (raw_store/year=/[query type]/uni=/cc=/) that
+agreements_to_db.py and glossary_to_db.py read with --from-store.
+
+Agreements already ingested since their JSON last changed are skipped,
+pass --force after the full schema changes. The store is a derived
+copy: the JSON stays in data/year=/, where download_data.py --refresh
+and schema inference read it.
+"""
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("ingest_raw")
+
+
+@timer(label="Ingest raw agreements", logger=logger, level=logging.INFO)
+def main(year: int = CURRENT_YEAR, dirty_only: bool = False, force: bool = False) -> None:
+    data_dir, store_dir = year_dir(DATA_DIR, year), year_dir(RAW_STORE_DIR, year)
+
+    # 1. get polars schemas
+
+    with timer("Load schemas", logger=logger, level=logging.INFO):
+        schemas = {
+            "prefixes": load_full_schema(
+                schema_fp=year_dir(SCHEMA_DIR, year) / SCHEMA_PREFIX_FILENAME,
+                data_dir=data_dir,
+                data_glob="*/*prefixes.json",
+                logger=logger,
+            ),
+            "majors": load_full_schema(
+                schema_fp=year_dir(SCHEMA_DIR, year) / SCHEMA_MAJOR_FILENAME,
+                data_dir=data_dir,
+                data_glob="*/*majors.json",
+                logger=logger,
+            ),
+        }
+
+    # 2. Write each changed agreement to the store
+
+    pairs = None
+    if dirty_only:
+        pairs, dirty_offset = read_dirty_pairs(consumer="ingest_raw", year=year)
+        logger.info(f"Ingesting {len(pairs)} dirty cc/uni pairs")
+
+    with timer("Write Parquet", logger=logger, level=logging.INFO):
+        json_bytes = parquet_bytes = ingested = 0
+
+        for query_type, schema in schemas.items():
+            if pairs is None:
+                files = sorted(data_dir.glob(f"*/*{query_type}.json"))
+            else:
+                files = agreement_files(data_dir, query_type, pairs)
+                # agreements withdrawn since the last ingest
+                kept = {fp.name for fp in files}
+                for store_fp in store_files(store_dir, query_type, pairs):
+                    cc, uni = store_fp.parts[-2].removeprefix("cc="), store_fp.parts[-3].removeprefix("uni=")
+                    if f"{cc}to{uni}-{query_type}.json" not in kept:
+                        store_fp.unlink()
+
+            for fp in files:
+                if not force and is_ingested(fp, store_dir):
+                    continue
+                json_bytes += fp.stat().st_size
+                out_fp = ingest_agreement(fp=fp, schema=schema, store_dir=store_dir)
+                parquet_bytes += out_fp.stat().st_size
+                ingested += 1
+
+        logger.info(
+            f" ingested {ingested} agreements: {json_bytes / 2**20:.2f} MB of JSON -> {parquet_bytes / 2**20:.2f} MB of Parquet"
+        )
+
+    if dirty_only:
+        commit_dirty_pairs(consumer="ingest_raw", offset=dirty_offset, year=year)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Ingest raw ASSIST.org agreements into a columnar store")
+    parser.add_argument(
+        "--year",
+        type=int,
+        default=CURRENT_YEAR,
+        help=f"ASSIST.org academic year id to process, e.g. 75 for 2024-2025 (default: {CURRENT_YEAR})",
+    )
+    parser.add_argument(
+        "--dirty-only",
+        action="store_true",
+        help="only ingest cc/uni pairs marked dirty by download_data.py",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="re-ingest agreements even if their store file is up to date",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(year=args.year, dirty_only=args.dirty_only, force=args.force)
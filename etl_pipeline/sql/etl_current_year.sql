@@ -0,0 +1,11 @@
+-- Academic year (ASSIST year id, e.g. 75 = 2024-2025) the other functions serve when called
+-- without p_year: the latest year loaded, recorded by the ETL in etl_meta. Being STABLE, it is
+-- evaluated once per query at executor startup, where it still prunes the partitions of
+-- every other year.
+CREATE OR REPLACE FUNCTION etl_current_year()
+RETURNS INT4
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT value::INT4 FROM etl_meta WHERE key = 'current_year';
+$$;
@@ -0,0 +1,28 @@
+-- Everything the get_articulations lambda returns for one university course, in a single
+-- round trip: [{cc: articulation, ...}, {course_id: glossary row, ...}], where the glossary
+-- holds every community college course referenced by those articulations. Only the p_year
+-- partitions are read (by default the current year, see etl_current_year).
+CREATE OR REPLACE FUNCTION get_articulation_bundle(p_course_id INT4, p_year INT4 DEFAULT NULL)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH matches AS (
+        SELECT cc, articulation, cc_course_ids
+        FROM articulations
+        WHERE course_id = p_course_id
+            AND year = COALESCE(p_year, etl_current_year())
+    )
+    SELECT jsonb_build_array(
+        COALESCE((SELECT jsonb_object_agg(cc, articulation) FROM matches), '{}'::jsonb),
+        COALESCE(
+            (
+                SELECT jsonb_object_agg(g.course_id, to_jsonb(g) - 'year' - 'eterm')
+                FROM glossary g
+                WHERE g.course_id IN (SELECT unnest(cc_course_ids) FROM matches)
+                    AND g.year = COALESCE(p_year, etl_current_year())
+            ),
+            '{}'::jsonb
+        )
+    );
+$$;
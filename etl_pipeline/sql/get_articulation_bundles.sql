@@ -0,0 +1,44 @@
+-- Batch variant of get_articulation_bundle for the get_articulations lambda's course_ids
+-- requests: [{course_id: {cc: articulation, ...}, ...}, {course_id: glossary row, ...}], every
+-- requested course present (possibly empty), optionally only the articulations of the
+-- community colleges in p_ccs, and one glossary shared (deduplicated) across all courses.
+-- Only the p_year partitions are read (by default the current year, see etl_current_year).
+CREATE OR REPLACE FUNCTION get_articulation_bundles(
+    p_course_ids INT4[], p_ccs INT4[] DEFAULT NULL, p_year INT4 DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH matches AS (
+        SELECT course_id, cc, articulation, cc_course_ids
+        FROM articulations
+        WHERE course_id = ANY(p_course_ids)
+            AND (p_ccs IS NULL OR cc = ANY(p_ccs))
+            AND year = COALESCE(p_year, etl_current_year())
+    ),
+    articulation_maps AS (
+        SELECT course_id, jsonb_object_agg(cc, articulation) AS articulation_map
+        FROM matches
+        GROUP BY course_id
+    )
+    SELECT jsonb_build_array(
+        COALESCE(
+            (
+                SELECT jsonb_object_agg(requested.course_id, COALESCE(m.articulation_map, '{}'::jsonb))
+                FROM (SELECT DISTINCT unnest(p_course_ids) AS course_id) requested
+                LEFT JOIN articulation_maps m USING (course_id)
+            ),
+            '{}'::jsonb
+        ),
+        COALESCE(
+            (
+                SELECT jsonb_object_agg(g.course_id, to_jsonb(g) - 'year' - 'eterm')
+                FROM glossary g
+                WHERE g.course_id IN (SELECT unnest(cc_course_ids) FROM matches)
+                    AND g.year = COALESCE(p_year, etl_current_year())
+            ),
+            '{}'::jsonb
+        )
+    );
+$$;
@@ -0,0 +1,19 @@
+-- Every course of an institution for the get_courses lambda: [{course_id, course_code,
+-- course_name}, ...] ordered by course_id, from the p_year partition of the glossary (by
+-- default the current year, see etl_current_year).
+CREATE OR REPLACE FUNCTION get_course_list(p_inst_id INT4, p_year INT4 DEFAULT NULL)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT COALESCE(
+        jsonb_agg(
+            jsonb_build_object('course_id', course_id, 'course_code', course_code, 'course_name', course_name)
+            ORDER BY course_id
+        ),
+        '[]'::jsonb
+    )
+    FROM glossary
+    WHERE inst_id = p_inst_id
+        AND year = COALESCE(p_year, etl_current_year());
+$$;
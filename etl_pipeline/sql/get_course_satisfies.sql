@@ -0,0 +1,61 @@
+-- Reverse articulation lookup for the get_satisfies lambda: every university course a community
+-- college course counts toward, as [{uni: {course_id: articulation}, ...}, {course_id: glossary row}],
+-- optionally only at the universities in p_unis. Each articulation keeps just the DNF clauses that
+-- reference p_cc_course_id (compact articulations, with no clauses to pick, are returned whole),
+-- and the glossary holds the university courses plus every course those articulations reference.
+-- Matches are a prefix scan of course_satisfies' primary key (cc_course_id, uni, ...), in the
+-- p_year partitions only (by default the current year, see etl_current_year).
+CREATE OR REPLACE FUNCTION get_course_satisfies(
+    p_cc_course_id INT4, p_unis INT4[] DEFAULT NULL, p_year INT4 DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH hits AS (
+        SELECT uni, course_id, cc, year, array_agg(clause ORDER BY clause) AS clauses
+        FROM course_satisfies
+        WHERE cc_course_id = p_cc_course_id
+            AND (p_unis IS NULL OR uni = ANY(p_unis))
+            AND year = COALESCE(p_year, etl_current_year())
+        GROUP BY uni, course_id, cc, year
+    ),
+    matches AS (
+        SELECT
+            h.uni,
+            h.course_id,
+            CASE
+                WHEN h.clauses = '{0}' THEN a.articulation
+                ELSE jsonb_build_object(
+                    'conj', 'Or',
+                    'items', (SELECT jsonb_agg(a.articulation -> 'items' -> (c - 1) ORDER BY c) FROM unnest(h.clauses) c)
+                )
+            END AS articulation
+        FROM hits h
+        JOIN articulations a USING (course_id, cc, uni, year)
+        WHERE a.year = COALESCE(p_year, etl_current_year())
+    ),
+    uni_maps AS (
+        SELECT uni, jsonb_object_agg(course_id, articulation) AS articulation_map
+        FROM matches
+        GROUP BY uni
+    ),
+    referenced AS (
+        SELECT course_id FROM matches
+        UNION
+        SELECT jsonb_path_query(articulation, 'strict $.** ? (@.type() == "number")')::INT4 FROM matches
+    )
+    SELECT jsonb_build_array(
+        COALESCE((SELECT jsonb_object_agg(uni, articulation_map) FROM uni_maps), '{}'::jsonb),
+        COALESCE(
+            (
+                SELECT jsonb_object_agg(g.course_id, to_jsonb(g) - 'year' - 'eterm')
+                FROM glossary g
+                -- an array rather than IN (...): the jsonpath's row estimate would make the planner scan the glossary
+                WHERE g.course_id = ANY(ARRAY(SELECT course_id FROM referenced))
+                    AND g.year = COALESCE(p_year, etl_current_year())
+            ),
+            '{}'::jsonb
+        )
+    );
+$$;
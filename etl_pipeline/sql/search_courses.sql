@@ -0,0 +1,41 @@
+-- Top p_limit courses of an institution whose code or name contains p_query (case-insensitive),
+-- for get_courses' search mode: [{course_id, course_code, course_name}, ...], ranked by code
+-- prefix matches, then name prefix matches, then course code. The substring filter is served
+-- by the pg_trgm GIN indexes of the p_year glossary partition (by default the current year, see
+-- etl_current_year), e.g. glossary_75_course_code_trgm_idx & glossary_75_course_name_trgm_idx.
+CREATE OR REPLACE FUNCTION search_courses(
+    p_inst_id INT4, p_query TEXT, p_limit INT4 DEFAULT 20, p_year INT4 DEFAULT NULL
+)
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+    WITH pattern AS (  -- p_query as a literal LIKE pattern
+        SELECT replace(replace(replace(p_query, '\', '\\'), '%', '\%'), '_', '\_') AS escaped
+    ),
+    matches AS (
+        SELECT
+            course_id,
+            course_code,
+            course_name,
+            CASE
+                WHEN course_code ILIKE escaped || '%' THEN 0
+                WHEN course_name ILIKE escaped || '%' THEN 1
+                ELSE 2
+            END AS rank
+        FROM glossary, pattern
+        WHERE inst_id = p_inst_id
+            AND year = COALESCE(p_year, etl_current_year())
+            AND (course_code ILIKE '%' || escaped || '%' OR course_name ILIKE '%' || escaped || '%')
+        ORDER BY rank, course_code, course_id
+        LIMIT p_limit
+    )
+    SELECT COALESCE(
+        jsonb_agg(
+            jsonb_build_object('course_id', course_id, 'course_code', course_code, 'course_name', course_name)
+            ORDER BY rank, course_code, course_id
+        ),
+        '[]'::jsonb
+    )
+    FROM matches;
+$$;
@@ -1,19 +1,51 @@
 #!/usr/bin/env python
 
-from .benchmarking import timer
-from .dnf_converter import to_dnf
-from .generate_articulations import extract_articulations_lazy
-from .generate_glossary import create_glossary
+from .artifacts import write_artifacts
+from .benchmarking import (
+    annotate,
+    files_size,
+    profiled_collect,
+    profiled_collect_all,
+    profiling,
+    span,
+    timer,
+)
+from .dnf_converter import to_dnf, to_dnf_batch
+from .generate_articulations import (
+    articulations_from_agreements,
+    articulations_to_dnf,
+    extract_articulations_lazy,
+)
+from .generate_glossary import create_glossary, dedupe_glossary, glossary_from_agreements
 from .generate_schema import load_full_schema
-from .to_postgres import write_articulations_to_psql, write_glossary_to_psql
+from .to_postgres import (
+    deploy_sql_functions,
+    record_load_version,
+    write_articulations_to_psql,
+    write_glossary_to_psql,
+)
 
 
 __all__ = [
     'timer',
+    'profiling',
+    'span',
+    'annotate',
+    'files_size',
+    'profiled_collect',
+    'profiled_collect_all',
     'to_dnf',
+    'to_dnf_batch',
     'extract_articulations_lazy',
+    'articulations_from_agreements',
+    'articulations_to_dnf',
     'create_glossary',
+    'glossary_from_agreements',
+    'dedupe_glossary',
     'load_full_schema',
+    'deploy_sql_functions',
+    'record_load_version',
     'write_articulations_to_psql',
-    'write_glossary_to_psql'
+    'write_glossary_to_psql',
+    'write_artifacts'
 ]
\ No newline at end of file
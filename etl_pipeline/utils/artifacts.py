@@ -0,0 +1,133 @@
+"""
+Precomputed backend responses, written as static gzip-compressed JSON files so they can be
+served without a database hit (by the lambdas with ARTIFACT_DIR set, or any static host):
+
+    [artifact dir]/articulations/[course_id].json.gz   get_articulations body for a university course
+    [artifact dir]/courses/[inst_id].json.gz           get_courses body for an institution
+    [artifact dir]/VERSION                             content hash of the set (the lambdas' ETag version)
+
+Each academic year gets its own set ([artifact dir] = artifacts/year=[year]). Bodies hold
+the same JSON the lambdas would otherwise build from postgres (for that year): the
+articulation map keyed by cc plus the glossary rows of every course it references, and
+an institution's course list. They are assembled as strings in polars, never parsed.
+"""
+
+import gzip
+import hashlib
+import logging
+import shutil
+from pathlib import Path
+
+import polars as pl
+
+from .generate_articulations import referenced_course_ids
+
+ARTICULATIONS_SUBDIR = "articulations"
+COURSES_SUBDIR = "courses"
+ARTIFACT_SUFFIX = ".json.gz"
+VERSION_FILENAME = "VERSION"
+GLOSSARY_COLUMNS = ("course_id", "inst_id", "course_code", "course_name", "min_units", "max_units")
+COURSE_LIST_COLUMNS = ("course_id", "course_code", "course_name")
+
+
+def _json_members(key: str, value: str) -> pl.Expr:
+    """Comma-joined '"key":value' members of a JSON object, aggregated over a group."""
+    return pl.concat_str(pl.lit('"'), pl.col(key).cast(pl.String), pl.lit('":'), pl.col(value)).str.join(",")
+
+
+def articulation_bodies(articulations: pl.DataFrame, glossary: pl.DataFrame) -> pl.DataFrame:
+    """course_id and get_articulations response body of every university course."""
+    articulations = articulations.select("course_id", "cc", "articulation").sort("course_id", "cc")
+    glossary_rows = glossary.select(
+        "course_id", row=pl.struct(*GLOSSARY_COLUMNS).struct.json_encode()
+    ).rename({"course_id": "ref_id"})
+
+    articulation_maps = articulations.group_by("course_id", maintain_order=True).agg(
+        articulation_map=_json_members("cc", "articulation")
+    )
+    glossary_maps = (
+        articulations
+        .select("course_id", ref_id=referenced_course_ids(pl.col("articulation")))
+        .explode("ref_id")
+        .unique(["course_id", "ref_id"])
+        .join(glossary_rows, on="ref_id")
+        .sort("course_id", "ref_id")
+        .group_by("course_id", maintain_order=True)
+        .agg(glossary_map=_json_members("ref_id", "row"))
+    )
+
+    return articulation_maps.join(glossary_maps, on="course_id", how="left", maintain_order="left").select(
+        "course_id",
+        body=pl.concat_str(
+            pl.lit("[{"), "articulation_map", pl.lit("},{"), pl.col("glossary_map").fill_null(""), pl.lit("}]")
+        ),
+    )
+
+
+def course_list_bodies(glossary: pl.DataFrame) -> pl.DataFrame:
+    """inst_id and get_courses response body of every institution."""
+    return (
+        glossary
+        .sort("course_id")
+        .group_by("inst_id", maintain_order=True)
+        .agg(rows=pl.struct(*COURSE_LIST_COLUMNS).struct.json_encode().str.join(","))
+        .select("inst_id", body=pl.concat_str(pl.lit("["), "rows", pl.lit("]")))
+    )
+
+
+def _content_version(*bodies: pl.DataFrame) -> str:
+    """Hash of every (key, body) pair, so an unchanged set keeps its version across rebuilds."""
+    version = hashlib.blake2b(digest_size=16)
+    for df in bodies:
+        for k, body in df.iter_rows():
+            version.update(f"{df.columns[0]}={k}:{body}\n".encode())
+    return version.hexdigest()
+
+
+def _write_bodies(bodies: pl.DataFrame, key: str, out_dir: Path) -> int:
+    out_dir.mkdir(parents=True)
+    n_bytes = 0
+    for k, body in bodies.select(key, "body").iter_rows():
+        data = gzip.compress(body.encode(), mtime=0)  # mtime=0: unchanged bodies give identical files
+        (out_dir / f"{k}{ARTIFACT_SUFFIX}").write_bytes(data)
+        n_bytes += len(data)
+    return n_bytes
+
+
+def write_artifacts(
+    articulations: pl.DataFrame,
+    glossary: pl.DataFrame,
+    artifact_dir: Path,
+    logger: logging.Logger | None = None,
+) -> None:
+    """
+    Write every course's and institution's response artifact from the full articulations
+    and (deduplicated) glossary tables. Files are written to a sibling directory that then
+    replaces `artifact_dir` as a whole, so readers never see a half-written set and
+    courses that disappeared don't leave stale files behind. The set's VERSION only
+    changes with its content, so clients' cached responses survive no-op rebuilds.
+    """
+    staging_dir = artifact_dir.with_name(f"{artifact_dir.name}.staging")
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    articulation_responses = articulation_bodies(articulations, glossary)
+    course_responses = course_list_bodies(glossary)
+    articulation_bytes = _write_bodies(
+        articulation_responses, key="course_id", out_dir=staging_dir / ARTICULATIONS_SUBDIR
+    )
+    course_bytes = _write_bodies(course_responses, key="inst_id", out_dir=staging_dir / COURSES_SUBDIR)
+    (staging_dir / VERSION_FILENAME).write_text(_content_version(articulation_responses, course_responses))
+
+    # swap the new set in, keeping the old one until the rename succeeded
+    old_dir = artifact_dir.with_name(f"{artifact_dir.name}.old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if artifact_dir.exists():
+        artifact_dir.rename(old_dir)
+    staging_dir.rename(artifact_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    if logger is not None:
+        logger.info(
+            f" wrote {len(articulation_responses)} articulation artifacts ({articulation_bytes / 2**20:.2f} MB)"
+            f" & {len(course_responses)} course list artifacts ({course_bytes / 2**20:.2f} MB) to {artifact_dir}"
+        )
@@ -1,14 +1,275 @@
+import json
+import os
+import sys
+import tracemalloc
+from collections.abc import Iterable, Iterator
 from contextlib import contextmanager
-from logging import Logger, INFO
+from dataclasses import dataclass, field
+from logging import Logger, INFO, getLogger
+from pathlib import Path
 from time import perf_counter
+from typing import Any
+
+import polars as pl
+
+try:  # peak RSS, not available on Windows
+    import resource
+except ImportError:
+    resource = None
+
+"""
+Timing & profiling of ETL runs. `timer` logs the duration of a stage; inside `profiling`,
+every timer (and `span`) also records a nested span with the process RSS, Python
+allocations (tracemalloc) and any rows/bytes figures attached with `annotate`, written
+as a Chrome trace (chrome://tracing, ui.perfetto.dev) when the run ends.
+"""
+
+MB = 2**20
+
+
+def _rss() -> int | None:
+    """Current resident set size in bytes (Linux only)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _peak_rss() -> int | None:
+    """Peak resident set size of the process so far, in bytes."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class Span:
+    label: str
+    depth: int
+    start: float
+    end: float | None = None
+    rss_start: int | None = None
+    rss_end: int | None = None
+    peak_rss: int | None = None
+    py_start: int = 0
+    py_delta: int | None = None
+    py_peak: int | None = None
+    args: dict[str, Any] = field(default_factory=dict)
+    _py_high: int = 0  # highest traced memory seen while the span (or a child) was open
+
+    @property
+    def duration(self) -> float:
+        return (self.end or perf_counter()) - self.start
+
+    def stats(self) -> dict[str, Any]:
+        stats = {
+            "rss_start_mb": self.rss_start / MB if self.rss_start is not None else None,
+            "rss_end_mb": self.rss_end / MB if self.rss_end is not None else None,
+            "peak_rss_mb": self.peak_rss / MB if self.peak_rss is not None else None,
+            "py_alloc_delta_mb": self.py_delta / MB if self.py_delta is not None else None,
+            "py_alloc_peak_mb": self.py_peak / MB if self.py_peak is not None else None,
+        }
+        return {**{k: round(v, 2) for k, v in stats.items() if v is not None}, **self.args}
+
+
+class Profiler:
+    """
+    Records nested spans, opened & closed in stack order on the main thread. With `memory`,
+    tracemalloc (started by `profiling`) adds each span's net and peak Python allocations;
+    with `polars`, frames collected through `profiled_collect` add their per-node timings.
+    """
+
+    def __init__(self, memory: bool = False, polars: bool = False):
+        self.memory = memory
+        self.polars = polars
+        self.origin = perf_counter()
+        self.spans: list[Span] = []
+        self.polars_nodes: list[dict[str, Any]] = []
+        self._stack: list[Span] = []
+
+    def open(self, label: str) -> Span:
+        span = Span(label=label, depth=len(self._stack), start=perf_counter(), rss_start=_rss())
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                self._stack[-1]._py_high = max(self._stack[-1]._py_high, peak)
+            tracemalloc.reset_peak()
+            span.py_start = span._py_high = current
+        self.spans.append(span)
+        self._stack.append(span)
+        return span
+
+    def close(self, span: Span) -> None:
+        span.end = perf_counter()
+        span.rss_end = _rss()
+        span.peak_rss = _peak_rss()
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            span._py_high = max(span._py_high, peak)
+            span.py_delta = current - span.py_start
+            span.py_peak = span._py_high - span.py_start
+        self._stack.remove(span)
+        if self.memory:
+            if self._stack:
+                self._stack[-1]._py_high = max(self._stack[-1]._py_high, span._py_high)
+            tracemalloc.reset_peak()
+
+    def annotate(self, **fields: Any) -> None:
+        if self._stack:
+            self._stack[-1].args.update(fields)
+
+    def collect(self, lfs: list[pl.LazyFrame], label: str, engine: str = "auto") -> list[pl.DataFrame]:
+        """Collect `lfs` one by one with LazyFrame.profile(), recording every plan node's timings."""
+        frames = []
+        for i, lf in enumerate(lfs):
+            if not hasattr(lf, "profile"):  # removed in polars 2, keep the optimized plan instead
+                self.annotate(**{f"{label}_plan_{i}": lf.explain()})
+                frames.append(lf.collect(engine=engine))
+                continue
+            started = perf_counter()
+            df, nodes = lf.profile(engine=engine)
+            offset = (started - self.origin) * 1e6
+            self.polars_nodes.extend(
+                {"name": node["node"], "plan": f"{label} #{i}", "ts": offset + node["start"], "dur": node["end"] - node["start"]}
+                for node in nodes.iter_rows(named=True)
+            )
+            frames.append(df)
+        return frames
+
+    def chrome_trace(self) -> dict[str, Any]:
+        pid = os.getpid()
+        events: list[dict[str, Any]] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": "stages"}},
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": 1, "args": {"name": "polars nodes"}},
+        ]
+        for span in self.spans:
+            ts = (span.start - self.origin) * 1e6
+            events.append({
+                "name": span.label, "cat": "stage", "ph": "X", "pid": pid, "tid": 0,
+                "ts": ts, "dur": span.duration * 1e6, "args": span.stats(),
+            })
+            for at, rss in ((ts, span.rss_start), (ts + span.duration * 1e6, span.rss_end)):
+                if rss is not None:
+                    events.append({"name": "rss_mb", "ph": "C", "pid": pid, "ts": at, "args": {"rss": round(rss / MB, 2)}})
+        events.extend(
+            {"name": node["name"], "cat": "polars", "ph": "X", "pid": pid, "tid": 1,
+             "ts": node["ts"], "dur": node["dur"], "args": {"plan": node["plan"]}}
+            for node in self.polars_nodes
+        )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self) -> list[str]:
+        """One line per span, indented by depth."""
+        lines = []
+        for span in self.spans:
+            stats = span.stats()
+            parts = [f"{span.duration:.2f} seconds"]
+            if "rss_end_mb" in stats:
+                parts.append(f"rss {stats.get('rss_start_mb', 0):.0f} -> {stats['rss_end_mb']:.0f} MB")
+            if "peak_rss_mb" in stats:
+                parts.append(f"peak rss {stats['peak_rss_mb']:.0f} MB")
+            if "py_alloc_delta_mb" in stats:
+                parts.append(f"python {stats['py_alloc_delta_mb']:+.1f} MB (peak +{stats['py_alloc_peak_mb']:.1f})")
+            parts.extend(f"{k} {v:,}" for k, v in span.args.items() if isinstance(v, int))
+            lines.append(f"{'  ' * span.depth}{span.label}: {', '.join(parts)}")
+        return lines
+
+
+_profiler: Profiler | None = None
+
+
+@contextmanager
+def span(label: str) -> Iterator[None]:
+    """Record a span while profiling, without logging anything (see timer)."""
+    profiler = _profiler
+    if profiler is None:
+        yield
+        return
+    opened = profiler.open(label)
+    try:
+        yield
+    finally:
+        profiler.close(opened)
+
+
+def annotate(**fields: Any) -> None:
+    """Attach figures (rows_in, rows_out, bytes_read...) to the innermost open span, if profiling."""
+    if _profiler is not None:
+        _profiler.annotate(**fields)
+
+
+def files_size(files: Iterable[Path]) -> int:
+    """Total size of `files` in bytes, e.g. for annotate(bytes_read=...)."""
+    return sum(fp.stat().st_size for fp in files)
+
+
+def profiled_collect(lf: pl.LazyFrame, label: str = "collect", engine: str = "auto") -> pl.DataFrame:
+    """lf.collect(engine=engine), profiled per plan node when profiling with `polars`."""
+    if _profiler is None or not _profiler.polars:
+        return lf.collect(engine=engine)  # type: ignore
+    return _profiler.collect([lf], label, engine)[0]
+
+
+def profiled_collect_all(lfs: list[pl.LazyFrame], label: str = "collect_all", engine: str = "auto") -> list[pl.DataFrame]:
+    """
+    pl.collect_all(lfs, engine=engine), profiled per plan node when profiling with `polars`. Profiling
+    collects the frames one at a time, so subplans they share are executed once per frame.
+    """
+    if _profiler is None or not _profiler.polars:
+        return pl.collect_all(lfs, engine=engine)  # type: ignore
+    return _profiler.collect(lfs, label, engine)
+
+
+@contextmanager
+def profiling(
+    trace_fp: Path | None,
+    memory: bool = False,
+    polars: bool = False,
+    logger: Logger | None = None,
+) -> Iterator[Profiler | None]:
+    """
+    Profile every timer/span opened inside the block and write them to `trace_fp` as a
+    Chrome trace, logging a summary. Does nothing if `trace_fp` is None.
+
+    :param trace_fp: Chrome trace JSON to write, or None to disable profiling
+    :type trace_fp: Path | None
+    :param memory: also trace Python allocations with tracemalloc (slows Python-heavy stages)
+    :type memory: bool
+    :param polars: collect frames with LazyFrame.profile() for per-node timings (polars < 2)
+    :type polars: bool
+    :param logger: logger for the summary, defaults to this module's
+    :type logger: Logger | None
+    """
+    global _profiler
+    if trace_fp is None:
+        yield None
+        return
+
+    logger = logger or getLogger(__name__)
+    if memory:
+        tracemalloc.start()
+    _profiler = profiler = Profiler(memory=memory, polars=polars)
+    try:
+        yield profiler
+    finally:
+        _profiler = None
+        if memory:
+            tracemalloc.stop()
+        trace_fp.parent.mkdir(parents=True, exist_ok=True)
+        trace_fp.write_text(json.dumps(profiler.chrome_trace()))
+        for line in profiler.summary():
+            logger.info(f" {line}")
+        logger.info(f" trace written to {trace_fp}")
 
 
 @contextmanager
 def timer(label: str = "Timer", logger: Logger | None = None, level: int = INFO):
     """
     Timer context manager / decorator. Reports duration with either a logger object at the
-    given level severity or a print call.
-    
+    given level severity or a print call. Inside `profiling`, also records a span.
+
     :param label: timer name
     :type label: str
     :param logger: an initialized logging.Logger object. If not present, timer reports with print().
@@ -20,9 +281,9 @@ def timer(label: str = "Timer", logger: Logger | None = None, level: int = INFO)
     msg = f"[{label}] Beginning timer"
     logger.log(level=level, msg=msg) if isinstance(logger, Logger) else print(msg)
     try:
-        yield
+        with span(label):
+            yield
     finally:
         duration = perf_counter() - start
         msg = f"[{label}] Execution time: {duration:.2f} seconds"
         logger.log(level=level, msg=msg) if isinstance(logger, Logger) else print(msg)
-        
\ No newline at end of file
@@ -0,0 +1,59 @@
+"""
+Tracking of cc/uni pairs whose raw agreements changed since an ETL script last ran.
+
+download_data.py appends a `cc,uni` line to data/year=[year]/dirty_pairs.csv whenever it
+writes or removes an agreement file of that academic year. Each consumer keeps its own
+byte offset into each year's log, so agreements_to_db.py and glossary_to_db.py catch up
+independently of each other.
+"""
+
+from pathlib import Path
+
+from .paths import CURRENT_YEAR, DATA_DIR, DIRTY_OFFSETS_DIR, DIRTY_PAIRS_FILENAME, year_dir
+
+
+def read_dirty_pairs(
+    consumer: str,
+    year: int = CURRENT_YEAR,
+    data_dir: Path = DATA_DIR,
+    offsets_dir: Path = DIRTY_OFFSETS_DIR,
+) -> tuple[set[tuple[int, int]], int]:
+    """
+    Return the (cc, uni) pairs of `year` logged since `consumer` last committed, along
+    with the log offset to pass to `commit_dirty_pairs` once they have been processed.
+    """
+    log_fp = year_dir(data_dir, year) / DIRTY_PAIRS_FILENAME
+    offset_fp = year_dir(offsets_dir, year) / consumer
+    offset = int(offset_fp.read_text()) if offset_fp.exists() else 0
+
+    if not log_fp.exists():
+        return set(), 0
+
+    with log_fp.open(mode="rb") as fp:
+        fp.seek(offset)
+        lines = fp.read().decode().splitlines()
+        end = fp.tell()
+
+    pairs = set()
+    for line in lines:
+        cc, uni = line.split(",")
+        pairs.add((int(cc), int(uni)))
+    return pairs, end
+
+
+def commit_dirty_pairs(
+    consumer: str,
+    offset: int,
+    year: int = CURRENT_YEAR,
+    offsets_dir: Path = DIRTY_OFFSETS_DIR,
+) -> None:
+    """Mark everything up to `offset` in `year`'s dirty log as processed by `consumer`."""
+    offsets_dir = year_dir(offsets_dir, year)
+    offsets_dir.mkdir(parents=True, exist_ok=True)
+    (offsets_dir / consumer).write_text(str(offset))
+
+
+def agreement_files(data_dir: Path, query_type: str, pairs: set[tuple[int, int]]) -> list[Path]:
+    """Existing `{cc}to{uni}-{query_type}.json` files for the given pairs."""
+    files = (data_dir / str(uni) / f"{cc}to{uni}-{query_type}.json" for cc, uni in sorted(pairs))
+    return [fp for fp in files if fp.exists()]
@@ -9,7 +9,10 @@ becomes
 """
 
 import itertools
+import logging
+import math
 import orjson
+import polars as pl
 
 from typing import Literal, TypedDict, Union
 
@@ -19,10 +22,48 @@ class ArticulationExpr(TypedDict):
     items: list[Union["ArticulationExpr", int]]
 
 
-def _to_dnf(node):
+# ceiling on the clauses an And node may distribute into, beyond which an articulation
+# is kept in its compact (nested, non-DNF) form instead
+MAX_DNF_CLAUSES = 256
+
+
+class _ClauseLimitExceeded(Exception):
+    pass
+
+
+def _minimize(matrix) -> list[tuple[int, ...]]:
+    """
+    Simplify a DNF matrix: dedup courses within & across clauses, drop clauses absorbed by a
+    subset of themselves (A or (A and B) = A) and sort clauses canonically by (length, ids).
+    """
+    clauses = sorted({tuple(sorted(set(clause))) for clause in matrix}, key=lambda clause: (len(clause), clause))
+
+    minimal, minimal_sets = [], []
+    for clause in clauses:  # subsets always sort before their supersets
+        courses = set(clause)
+        if not any(kept <= courses for kept in minimal_sets):
+            minimal.append(clause)
+            minimal_sets.append(courses)
+    return minimal
+
+
+def _canonical(node):
+    """The tree with every node's items sorted (ids, then nulls, then subtrees by their JSON)."""
+    if not isinstance(node, dict) or node.get("items") is None:
+        return node
+
+    def key(item):
+        if isinstance(item, dict):
+            return (2, orjson.dumps(item))
+        return (0, item) if item is not None else (1, 0)
+
+    return {**node, "items": sorted((_canonical(item) for item in node["items"]), key=key)}
+
+
+def _to_dnf(node, max_clauses: int = MAX_DNF_CLAUSES):
     # base: no conjunctions
     if not isinstance(node, dict):
-        return [[node]] if node is not None else []
+        return [(node,)] if node is not None else []
 
     # extract logic & children
     conj = node.get("conj")
@@ -33,49 +74,255 @@ def _to_dnf(node):
     # base: And/Or depth=1
     if all(isinstance(child, int) for child in children):
         if conj == "And":
-            return [children]  # And(1, 2) -> [[1, 2]]
-        else: 
-            return [[x] for x in children]  # Or(1, 2) -> [[1], [2]]
+            return _minimize([children])  # And(1, 2) -> [[1, 2]]
+        else:
+            return _minimize([[x] for x in children])  # Or(1, 2) -> [[1], [2]]
 
-    # recurse children to child matrices
-    child_matrices = [_to_dnf(child) for child in children]
+    # recurse children to (minimized) child matrices
+    child_matrices = [_to_dnf(child, max_clauses) for child in children]
 
     # DNF algorithm: apply associative property on Or(1, 2, Or(3))
     if conj == "Or":
-        merged_matrix = []
-        for matrix in child_matrices:
-            merged_matrix.extend(matrix)
-        return merged_matrix
+        return _minimize(itertools.chain.from_iterable(child_matrices))
 
     # DNF algorithm: apply distributive property (And over Or)
     #    (A OR B) AND (C OR D)
     # => (A AND (C OR D)) OR (B AND (C OR D))
     # => (A AND C) OR (A AND D) OR (B AND C) OR (B AND D)
     elif conj == "And":
+        if math.prod(len(matrix) for matrix in child_matrices) > max_clauses:
+            raise _ClauseLimitExceeded
+
         product = itertools.product(*child_matrices)
-        
-        merged_matrix = []
-        for combination in product:
-            new_clause = []
-            for clause in combination:
-                new_clause.extend(clause)
-            merged_matrix.append(new_clause)
-            
-        return merged_matrix
-    
+        return _minimize(itertools.chain.from_iterable(combination) for combination in product)
+
     return []
 
 
-def to_dnf(expr: dict | int) -> str:
+def to_dnf(expr: dict | int, max_clauses: int = MAX_DNF_CLAUSES) -> str:
     """
-    Recursively flattens a logic tree of arbitrary depth into a DNF-formatted tree.
+    Recursively flattens a logic tree of arbitrary depth into a minimal DNF-formatted tree,
+    with clauses' course ids sorted and clauses sorted by (length, ids).
 
     Formatted as: "{'conj': 'Or', 'items': [{'conj': 'And', 'items': [1, ...]}, ...]}".
+    If distributing an And node would exceed `max_clauses` clauses, the tree is returned
+    in its nested form instead, with each node's items sorted so that it serializes the
+    same however its items were ordered.
     """
-    
-    mat = _to_dnf(expr)
+    try:
+        mat = _to_dnf(expr, max_clauses)
+    except _ClauseLimitExceeded:
+        return orjson.dumps(_canonical(expr)).decode()
+
     dnf_articulation = {
         "conj": "Or",
         "items": [{"conj": "And", "items": row} for row in mat]
     }
     return orjson.dumps(dnf_articulation).decode()
+
+
+# Vectorized engine
+#
+# articulations_from_agreements() builds trees of a fixed depth:
+#     Or(                                   <- top level, one per course_id/cc/uni
+#         {conj, items: [                   <- level 1, one per sending articulation
+#             {conj, items: [int, ...]},    <- level 2, a course group
+#             ...
+#         ]},
+#         ...
+#     )
+# so _to_dnf's recursion unrolls into a handful of explodes/joins over the whole column.
+# Minimizing only once at the end gives the same clauses as _to_dnf minimizing at every
+# node: with no negations, the minimal DNF (the prime implicants) is unique.
+
+_CLAUSE_KEYS = ["_row", "_l1"]
+
+
+def _group_clauses(groups: pl.DataFrame) -> pl.DataFrame:
+    """Clauses of each level 2 group, mirroring _to_dnf on an {conj, items: [int, ...]} node."""
+    ids = pl.col("_group").struct.field("items")
+    conj = pl.col("_group").struct.field("conj")
+    has_null = ids.list.len() != ids.list.drop_nulls().list.len()
+
+    groups = groups.with_columns(
+        _ids=ids,
+        _kind=(
+            pl.when(ids.is_null() | (ids.list.len() == 0)).then(pl.lit("none"))
+            .when(~has_null & (conj == "And")).then(pl.lit("single"))  # And(1, 2) -> [[1, 2]]
+            .when(~has_null | (conj == "Or")).then(pl.lit("split"))    # Or(1, 2) -> [[1], [2]]
+            .otherwise(pl.lit("none"))  # And(1, None) -> [], Xor(1, None) -> []
+        ),
+    )
+
+    single = groups.filter(pl.col("_kind") == "single").select(*_CLAUSE_KEYS, "_g", _clause="_ids")
+    split = (
+        groups
+        .filter(pl.col("_kind") == "split")
+        .select(*_CLAUSE_KEYS, "_g", _ids=pl.col("_ids").list.drop_nulls().list.unique())
+        .explode("_ids")
+        .drop_nulls("_ids")  # an all-null group explodes to a null row, not a clause
+        .select(*_CLAUSE_KEYS, "_g", _clause=pl.concat_list("_ids"))
+    )
+    return pl.concat([single, split])
+
+
+def _over_limit(clauses: pl.DataFrame, and_nodes: pl.DataFrame, max_clauses: int) -> pl.Series:
+    """Rows with an And node whose groups' clause counts multiply past max_clauses."""
+    sizes = (
+        clauses
+        .group_by(*_CLAUSE_KEYS, "_g")
+        .agg(_k=pl.len())
+        .group_by(_CLAUSE_KEYS)
+        .agg(_nonempty=pl.len(), _size=pl.col("_k").cast(pl.Float64).product())
+    )
+    return (
+        and_nodes
+        .join(sizes, on=_CLAUSE_KEYS)
+        .filter((pl.col("_nonempty") == pl.col("_n")) & (pl.col("_size") > max_clauses))
+        .get_column("_row")
+        .unique()
+    )
+
+
+def _product_clauses(clauses: pl.DataFrame, n_groups: pl.DataFrame) -> pl.DataFrame:
+    """Distribute And over each level 1 node's group clauses."""
+    # a clause-less group empties the product, as product() does: drop such nodes up front
+    # rather than distribute over their other groups first
+    n_groups = (
+        clauses
+        .group_by(_CLAUSE_KEYS)
+        .agg(_nonempty=pl.col("_g").n_unique())
+        .join(n_groups, on=_CLAUSE_KEYS)
+        .filter(pl.col("_nonempty") == pl.col("_n"))
+        .select(*_CLAUSE_KEYS, "_n")
+    )
+    max_groups = n_groups.get_column("_n").max() or 0
+    steps = clauses.partition_by("_g", as_dict=True, include_key=False)
+    empty = clauses.clear().drop("_g")
+
+    acc = steps.get((0,), empty).join(n_groups, on=_CLAUSE_KEYS).select(*_CLAUSE_KEYS, "_n", "_clause")
+    for g in range(1, max_groups):
+        done = acc.filter(pl.col("_n") <= g)
+        active = (
+            acc
+            .filter(pl.col("_n") > g)
+            .join(steps.get((g,), empty), on=_CLAUSE_KEYS)
+            .select(*_CLAUSE_KEYS, "_n", _clause=pl.concat_list("_clause", "_clause_right"))
+        )
+        acc = pl.concat([done, active])
+
+    return acc.select(*_CLAUSE_KEYS, "_clause")
+
+
+def _minimal_clauses(clauses: pl.DataFrame) -> pl.DataFrame:
+    """_minimize over each row's clauses: dedup, absorption & canonical (length, ids) order."""
+    clauses = (
+        clauses
+        .select("_row", _clause=pl.col("_clause").list.unique().list.sort())
+        .with_columns(
+            _len=pl.col("_clause").list.len(),
+            _key=pl.col("_clause").list.eval(pl.element().cast(pl.String)).list.join(","),
+        )
+        .unique(["_row", "_key"])
+    )
+
+    # a clause is absorbed by any shorter clause of the same row that is a subset of it
+    candidates = clauses.filter(pl.col("_len").min().over("_row") < pl.col("_len").max().over("_row"))
+    supersets = candidates.select(
+        "_row", _key_sup="_key", _len_sup="_len", _clause_sup="_clause", _id="_clause"
+    ).explode("_id")
+    absorbed = (  # pair clauses with the longer ones containing their first course
+        candidates
+        .with_columns(_id=pl.col("_clause").list.first())
+        .join(supersets, on=["_row", "_id"])
+        .filter(pl.col("_len") < pl.col("_len_sup"))
+        .filter(pl.col("_clause").list.set_difference("_clause_sup").list.len() == 0)
+        .select("_row", _key="_key_sup")
+        .unique()
+    )
+    return clauses.join(absorbed, on=["_row", "_key"], how="anti").sort("_row", "_len", "_clause")
+
+
+def to_dnf_batch(
+    articulations: pl.Series,
+    max_clauses: int = MAX_DNF_CLAUSES,
+    logger: logging.Logger | None = None,
+) -> pl.Series:
+    """
+    Vectorized to_dnf over a column of articulations shaped like the output of
+    articulations_from_agreements() (top-level Or, see above). Produces byte-identical
+    JSON to map_elements(to_dnf), without a Python call per row (save for articulations
+    over `max_clauses`, which are serialized in their sorted nested form).
+    """
+    frame = pl.DataFrame({"_art": articulations}).with_row_index("_row")
+
+    # 1. level 1 nodes, with their position under the top-level Or
+    level1 = (
+        frame
+        .select("_row", _node=pl.col("_art").struct.field("items"))
+        .with_columns(_l1=pl.int_ranges(pl.col("_node").list.len(), dtype=pl.UInt32))
+        .explode("_node", "_l1")
+        .drop_nulls("_node")
+        .select(
+            *_CLAUSE_KEYS,
+            _conj=pl.col("_node").struct.field("conj"),
+            _groups=pl.col("_node").struct.field("items"),
+        )
+        .with_columns(_n=pl.col("_groups").list.len().fill_null(0).cast(pl.UInt32))
+        .filter(pl.col("_n") > 0)
+    )
+
+    # 2. level 2 groups and their clauses
+    groups = (
+        level1
+        .select(*_CLAUSE_KEYS, "_conj", _group="_groups")
+        .with_columns(_g=pl.int_ranges(pl.col("_group").list.len(), dtype=pl.UInt32))
+        .explode("_group", "_g")
+    )
+    clauses = _group_clauses(groups.filter(pl.col("_conj").is_in(["And", "Or"])))
+    and_nodes = level1.filter(pl.col("_conj") == "And").select(*_CLAUSE_KEYS, "_n")
+
+    # 3. set aside articulations that would distribute into too many clauses
+    over_limit = _over_limit(clauses, and_nodes, max_clauses)
+    if logger is not None:
+        logger.info(
+            f" {len(over_limit)} of {len(articulations)} articulations exceed {max_clauses} DNF clauses,"
+            " kept in compact form"
+        )
+    if len(over_limit):
+        clauses = clauses.filter(~pl.col("_row").is_in(over_limit.implode()))
+
+    # 4. Or nodes concatenate their groups' clauses, And nodes take their product
+    or_clauses = clauses.join(
+        level1.filter(pl.col("_conj") == "Or"), on=_CLAUSE_KEYS, how="semi"
+    ).select(*_CLAUSE_KEYS, "_clause")
+    and_clauses = _product_clauses(clauses.join(and_nodes, on=_CLAUSE_KEYS, how="semi"), and_nodes)
+
+    # 5. minimize & serialize each row's clauses, as orjson would
+    serialized = (
+        _minimal_clauses(pl.concat([or_clauses, and_clauses]))
+        .group_by("_row", maintain_order=True)
+        .agg(_items=pl.concat_str(pl.lit('{"conj":"And","items":['), "_key", pl.lit("]}")).str.join(","))
+        .select("_row", _dnf=pl.concat_str(pl.lit('{"conj":"Or","items":['), "_items", pl.lit("]}")))
+    )
+    compact = (
+        frame
+        .filter(pl.col("_row").is_in(over_limit.implode()))
+        .select(
+            "_row",
+            _compact=pl.col("_art").map_elements(
+                lambda expr: orjson.dumps(_canonical(expr)).decode(), return_dtype=pl.String
+            ),
+        )
+    )
+    return (
+        frame
+        .join(serialized, on="_row", how="left", maintain_order="left")
+        .join(compact, on="_row", how="left", maintain_order="left")
+        .select(
+            pl.when(pl.col("_art").is_not_null())
+            .then(pl.coalesce("_compact", "_dnf", pl.lit('{"conj":"Or","items":[]}')))
+            .alias(articulations.name)
+        )
+        .to_series()
+    )
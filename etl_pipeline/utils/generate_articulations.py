@@ -1,51 +1,126 @@
 #!/usr/bin/env python
 
-import polars as pl
+import logging
+from functools import partial
 from pathlib import Path
 
+import polars as pl
+
+from .dnf_converter import MAX_DNF_CLAUSES, to_dnf_batch
+from .raw_store import scan_agreements
 
-def extract_articulations_lazy(fp: Path, schema: pl.Schema) -> pl.LazyFrame:
-    uni = int(fp.parts[-2])
-    cc  = int(fp.parts[-1].split('to')[0])
 
-    lf = pl.read_json(source=fp, schema=schema).lazy()
+def extract_articulations_lazy(source: Path | str | list[Path], schema: pl.Schema | None = None) -> pl.LazyFrame:
+    """
+    Articulations of every agreement of one query type in `source` (a file, a list of
+    files, a glob pattern, or a columnar store directory) as a single plan. Raw JSON is
+    parsed with `schema`, store files carry their own.
+    """
+    return articulations_from_agreements(scan_agreements(source=source, schema=schema))
 
-    # Normalize structure (Explode list vs Rename single)
-    if "prefixes" in str(fp):
-        lf = lf.explode("articulations").rename({"articulations": "articulation"})
 
+def articulations_to_dnf(
+    lf: pl.LazyFrame,
+    max_clauses: int = MAX_DNF_CLAUSES,
+    logger: logging.Logger | None = None,
+) -> pl.LazyFrame:
+    """
+    Serialize each articulation in minimal disjunctive normal form and drop duplicate rows.
+    Articulations that would expand past `max_clauses` clauses are kept in compact form
+    (their count is logged to `logger`).
+    """
+    return (
+        lf
+        .with_columns(  # vectorized to_dnf over the whole column, see dnf_converter
+            pl.col("articulation").map_batches(
+                partial(to_dnf_batch, max_clauses=max_clauses, logger=logger), return_dtype=pl.String
+            )
+        )
+        .unique()
+    )
+
+
+def referenced_course_ids(articulation: pl.Expr) -> pl.Expr:
+    """Sorted, unique community college course ids referenced by DNF/compact articulations."""
+    # every number in a DNF/compact articulation is a course id
+    return (
+        articulation
+        .str.extract_all(r"\d+")
+        .list.eval(pl.element().cast(pl.Int32))
+        .list.unique()
+        .list.sort()
+    )
+
+
+# a serialized DNF articulation (see dnf_converter.to_dnf): an Or of And clauses of course ids
+_DNF_CLAUSE = r'\{"conj":"And","items":\[[\d,]*\]\}'
+_DNF_ARTICULATION = rf'^\{{"conj":"Or","items":\[(?:{_DNF_CLAUSE},?)*\]\}}$'
+
+
+def course_satisfies(articulations: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Reverse index of articulations: which university courses each community college
+    course counts toward. One row per (cc_course_id, uni, course_id, cc, clause), where
+    clause is the 1-based position of a DNF clause referencing the cc course (its index
+    in the articulation's items) and clause_size that clause's course count. Articulations
+    kept in compact form (past the DNF clause ceiling) have no clauses to point into, so
+    their courses get a single row with clause 0 and no clause_size.
+    """
+    articulation = pl.col("articulation")
+    is_dnf = articulation.str.contains(_DNF_ARTICULATION)
+    return (
+        articulations
+        .select(
+            "course_id",
+            "cc",
+            "uni",
+            clause_json=pl.when(is_dnf)
+            .then(articulation.str.extract_all(_DNF_CLAUSE))
+            .otherwise(pl.concat_list(articulation)),
+            clause=pl.when(is_dnf)
+            .then(pl.int_ranges(1, articulation.str.count_matches(_DNF_CLAUSE) + 1, dtype=pl.Int16))
+            .otherwise(pl.concat_list(pl.lit(0, dtype=pl.Int16))),
+        )
+        .explode("clause_json", "clause")
+        .with_columns(cc_course_id=referenced_course_ids(pl.col("clause_json")))
+        .with_columns(
+            clause_size=pl.when(pl.col("clause") > 0).then(pl.col("cc_course_id").list.len().cast(pl.Int16))
+        )
+        .explode("cc_course_id")
+        .drop_nulls("cc_course_id")
+        .select("cc_course_id", "uni", "course_id", "cc", "clause", "clause_size")
+    )
+
+
+def articulations_from_agreements(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Articulations (course_id, cc, uni, articulation) of normalized agreement rows, as
+    produced by utils.raw_store.read_agreement.
+    """
     return (
         lf
         .filter(  # 1. Filter empty articulations immediately
-            pl.col("articulation")
-            .struct.field("sendingArticulation")
-            .struct.field("items")
-            .list.len() > 0
+            pl.col("sending_items").list.len() > 0
         )
         .select(  # 2. Extract Fields & Merge Source IDs
+            pl.col("cc"),
+            pl.col("uni"),
             series_ids=(  # list of university course ids in series
-                pl.col("articulation")
-                .struct.field("series")
-                .struct.field("courses")
+                pl.col("series_courses")
                 .list.eval(
                     pl.element()
                     .struct.field("courseIdentifierParentId")
                 )
             ),
             root_id=(  # university course id for individual courses
-                pl.col("articulation")
-                .struct.field("course")
+                pl.col("course")
                 .struct.field("courseIdentifierParentId")
             ),
             sending_items=(  # articulation data
-                pl.col("articulation")
-                .struct.field("sendingArticulation")
-                .struct.field("items")
+                pl.col("sending_items")
             ),
             global_conj=(
-                pl.col("articulation")
-                .struct.field("sendingArticulation")
-                .struct.field("courseGroupConjunctions")
+                pl.col("group_conjunctions")
                 .list.first()
                 .struct.field("groupConjunction")
                 .fill_null("Or")
@@ -62,8 +137,8 @@ def extract_articulations_lazy(fp: Path, schema: pl.Schema) -> pl.LazyFrame:
         .drop_nulls("source_ids")  # handle non-class requirements "need 1 literature class (pick 1 of any of these)"
         # 4. Final Construction
         .select(
-            cc=pl.lit(cc),
-            uni=pl.lit(uni),
+            cc=pl.col("cc"),
+            uni=pl.col("uni"),
             course_id=pl.col("source_ids"),
             articulation=pl.struct(
                 conj=pl.col("global_conj"),
@@ -4,6 +4,9 @@ from pathlib import Path
 
 import polars as pl
 
+from .benchmarking import profiled_collect
+from .raw_store import scan_agreements
+
 
 def _coalesce_courses(field: str):
     return pl.coalesce(
@@ -29,27 +32,27 @@ def _concat_coalesce_courses(*fields):
     )
 
 
-def create_glossary(fp: Path, schema: pl.Schema) -> pl.DataFrame:
-    uni = int(fp.parts[-2])
-    cc = int(fp.parts[-1].split("to")[0])
-
-    lf = pl.read_json(source=fp, schema=schema).lazy()
+def create_glossary(source: Path | str | list[Path], schema: pl.Schema | None = None) -> pl.DataFrame:
+    """
+    Glossary of every course mentioned by the agreements of one query type in `source`
+    (a file, a list of files, a glob pattern, or a columnar store directory). Raw JSON
+    is parsed with `schema`, store files carry their own.
+    """
+    return profiled_collect(
+        glossary_from_agreements(scan_agreements(source=source, schema=schema)), label="glossary", engine="streaming"
+    )
 
-    if "prefix" in fp.name:
-        lf = lf.explode("articulations").rename({"articulations": "articulation"})
 
+def glossary_from_agreements(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Glossary rows of normalized agreement rows, as produced by
+    utils.raw_store.read_agreement. Not deduplicated.
+    """
     cc_courses = (
-        lf.select(
-            cc_courses=(
-                pl.col("articulation")
-                .struct.field("sendingArticulation")
-                .drop_nulls()
-                .struct.field("items")
-                .explode()
-                .struct.field("items")
-                .explode()
-            )
-        )
+        lf.select(pl.col("cc"), cc_courses=pl.col("sending_items"))
+        .explode("cc_courses")
+        .with_columns(cc_courses=pl.col("cc_courses").struct.field("items"))
+        .explode("cc_courses")
         .select(
             course_id=pl.col("cc_courses").struct.field("courseIdentifierParentId"),
             course_code=pl.col("cc_courses").struct.field("prefix")
@@ -60,16 +63,15 @@ def create_glossary(fp: Path, schema: pl.Schema) -> pl.DataFrame:
             max_units=pl.col("cc_courses").struct.field("maxUnits"),
             begin=pl.col("cc_courses").struct.field("begin"),
             end=pl.col("cc_courses").struct.field("end"),
-            inst_id=pl.lit(cc),
+            inst_id=pl.col("cc"),
         )
     )
 
     uni_courses = (
         lf.select(
-            uni_courses=pl.col("articulation").struct.field("course"),
-            uni_series_courses=pl.col("articulation")
-            .struct.field("series")
-            .struct.field("courses"),
+            pl.col("uni"),
+            uni_courses=pl.col("course"),
+            uni_series_courses=pl.col("series_courses"),
         )
         .explode("uni_series_courses")
         .select(
@@ -80,8 +82,43 @@ def create_glossary(fp: Path, schema: pl.Schema) -> pl.DataFrame:
             max_units=_coalesce_courses("maxUnits"),
             begin=_coalesce_courses("begin"),
             end=_coalesce_courses("end"),
-            inst_id=pl.lit(uni),
+            inst_id=pl.col("uni"),
         )
     )
 
-    return pl.concat([cc_courses, uni_courses]).drop_nulls().collect()
+    return pl.concat([cc_courses, uni_courses]).drop_nulls()
+
+
+END_TERM_QUARTERS = {"W": 1, "S": 2, "Su": 3, "F": 4}
+
+
+def _end_term() -> pl.Expr:
+    """[year][quarter] of the term a course version ends, 99999 for still-active courses."""
+    end = pl.col("end").replace("", None)
+    return (
+        end.str.slice(-4).cast(pl.UInt32) * 10
+        + end.str.head(-4).replace_strict(END_TERM_QUARTERS, return_dtype=pl.UInt32)
+    ).fill_null(99999)
+
+
+def _latest_per(lf: pl.LazyFrame, key: list[str]) -> pl.LazyFrame:
+    """The row with the latest eterm of every `key` group (any one of them on ties)."""
+    return lf.group_by(key).agg(pl.all().get(pl.col("eterm").arg_max()))
+
+
+def dedupe_glossary(lf: pl.LazyFrame) -> pl.LazyFrame:
+    """
+    Keep one row per course_id and per (course_code, inst_id), preferring the course
+    version whose term ends latest (still-active courses first). That end term is kept
+    as `eterm`, which the glossary's upserts compare against.
+
+    Both are grouped arg-maxes rather than a global sort, so the streaming engine only
+    holds one row per group, however many agreements (and years) feed the glossary.
+    """
+    columns = [col for col in lf.collect_schema().names() if col not in ("begin", "end")] + ["eterm"]
+    latest = lf.with_columns(eterm=_end_term()).drop("begin", "end")
+
+    return (
+        _latest_per(_latest_per(latest, ["course_id"]), ["course_code", "inst_id"])
+        .select(columns)
+    )
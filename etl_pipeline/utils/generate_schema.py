@@ -1,13 +1,22 @@
 """
 Utilities for creating the polars schema for a local copy of ASSIST's articulation
 agreements. Agreements live in project/data/[university-id].
+
+Per-file schemas are inferred on a process pool and folded pairwise (a tree reduction)
+into the full schema. Both are cached as JSON alongside a fingerprint of the input files
+and the polars version, so the cache is readable without polars and is invalidated or
+incrementally extended when the data changes.
 """
 
 import polars as pl
+from concurrent.futures import Executor, ProcessPoolExecutor
 from functools import lru_cache
+import hashlib
+import json
 import logging
-import pickle
+import multiprocessing
 from pathlib import Path
+from typing import Any
 
 
 @lru_cache(maxsize=128)
@@ -19,10 +28,11 @@ def _resolve_supertype(dtype1: pl.DataType, dtype2: pl.DataType) -> pl.DataType:
     """
     try:
         # diagonal_relaxed allows Polars to determine the common supertype
+        # (Series only support the strict vertical strategy, so concat one-column frames)
         return pl.concat(
-            [pl.Series([None], dtype=dtype1), pl.Series([None], dtype=dtype2)],
+            [pl.Series("v", [None], dtype=dtype1).to_frame(), pl.Series("v", [None], dtype=dtype2).to_frame()],
             how="diagonal_relaxed",
-        ).dtype
+        )["v"].dtype
     except Exception:
         raise TypeError(f"Could not merge incompatible types: {dtype1} and {dtype2}")
     return
@@ -95,17 +105,178 @@ def merge_schemas(schemas: list[pl.Schema]) -> pl.Schema:
     return pl.Schema(current_schema_map)
 
 
-def load_full_schema(schema_fp: Path, data_dir: Path, data_glob: str, logger: logging.Logger | None = None) -> pl.Schema:
-    if schema_fp.exists():
-        if logger:
-            logger.info(f"Loading precomputed schema for {schema_fp.name}")
-        with schema_fp.open(mode='rb') as fp:
-            schema: pl.Schema = pickle.load(file=fp)
-    else:
-        if logger:
-            logger.info(f"No precomputed schema found at {schema_fp.name}, inferring from data...")
-        schema_list = [pl.read_json(fp, infer_schema_length=None).schema for fp in data_dir.glob(data_glob)]
-        schema = merge_schemas(schemas=schema_list)
-        with schema_fp.open(mode='wb') as fp:
-            pickle.dump(obj=schema, file=fp)
+def _infer_schema(fp: Path) -> pl.Schema:
+    return pl.read_json(fp, infer_schema_length=None).schema
+
+
+def _merge_pair(schema1: pl.Schema, schema2: pl.Schema) -> pl.Schema:
+    return merge_schemas(schemas=[schema1, schema2])
+
+
+def tree_merge_schemas(schemas: list[pl.Schema], executor: Executor | None = None) -> pl.Schema:
+    """
+    Merge schemas pairwise, level by level, so each level's merges can run in parallel
+    on `executor` (serially if None).
+    """
+    if not schemas:
+        return pl.Schema()
+
+    while len(schemas) > 1:
+        lefts, rights = schemas[0::2], schemas[1::2]
+        leftover = [lefts.pop()] if len(lefts) > len(rights) else []
+        merged = executor.map(_merge_pair, lefts, rights) if executor else map(_merge_pair, lefts, rights)
+        schemas = [*merged, *leftover]
+    return schemas[0]
+
+
+def dtype_to_json(dtype: pl.DataType) -> Any:
+    """Portable JSON form of a polars dtype, e.g. {"List": {"Struct": {"id": "Int64"}}}."""
+    if isinstance(dtype, pl.List):
+        return {"List": dtype_to_json(dtype.inner)}  # type: ignore
+    if isinstance(dtype, pl.Struct):
+        return {"Struct": {name: dtype_to_json(inner) for name, inner in dtype.to_schema().items()}}
+    if isinstance(dtype, pl.Datetime):
+        return {"Datetime": [dtype.time_unit, dtype.time_zone]}
+    if dtype != dtype.base_type()():
+        raise TypeError(f"Cannot serialize parametrized dtype {dtype}")
+    return str(dtype.base_type().__name__)
+
+
+def dtype_from_json(obj: Any) -> pl.DataType:
+    if isinstance(obj, str):
+        return getattr(pl, obj)()
+    if "List" in obj:
+        return pl.List(dtype_from_json(obj["List"]))
+    if "Struct" in obj:
+        return pl.Struct({name: dtype_from_json(inner) for name, inner in obj["Struct"].items()})
+    if "Datetime" in obj:
+        return pl.Datetime(*obj["Datetime"])
+    raise TypeError(f"Unknown serialized dtype {obj}")
+
+
+def schema_to_json(schema: pl.Schema) -> dict[str, Any]:
+    return {name: dtype_to_json(dtype) for name, dtype in schema.items()}
+
+
+def schema_from_json(obj: dict[str, Any]) -> pl.Schema:
+    return pl.Schema({name: dtype_from_json(dtype) for name, dtype in obj.items()})
+
+
+SCHEMA_CACHE_FORMAT = 1
+
+
+def _file_keys(data_dir: Path, files: list[Path]) -> dict[str, list[int]]:
+    keys = {}
+    for fp in files:
+        stat = fp.stat()
+        keys[fp.relative_to(data_dir).as_posix()] = [stat.st_mtime_ns, stat.st_size]
+    return keys
+
+
+def _fingerprint(keys: dict[str, list[int]]) -> str:
+    return hashlib.sha256(json.dumps(keys, sort_keys=True).encode()).hexdigest()
+
+
+def _read_cache(schema_fp: Path) -> dict[str, Any] | None:
+    if not schema_fp.exists():
+        return None
+    try:
+        cache = json.loads(schema_fp.read_text())
+    except json.JSONDecodeError:
+        return None
+    if cache.get("format") != SCHEMA_CACHE_FORMAT or cache.get("polars_version") != pl.__version__:
+        return None
+    return cache
+
+
+def _write_cache(
+    schema_fp: Path,
+    keys: dict[str, list[int]],
+    file_schemas: dict[str, pl.Schema],
+    schema: pl.Schema,
+) -> None:
+    # many agreements share a schema, so per-file entries point into a table of distinct ones
+    distinct: dict[str, int] = {}
+    files = {}
+    for path, (mtime_ns, size) in keys.items():
+        serialized = json.dumps(schema_to_json(file_schemas[path]))
+        files[path] = [mtime_ns, size, distinct.setdefault(serialized, len(distinct))]
+
+    cache = {
+        "format": SCHEMA_CACHE_FORMAT,
+        "polars_version": pl.__version__,
+        "fingerprint": _fingerprint(keys),
+        "schema": schema_to_json(schema),
+        "file_schemas": [json.loads(serialized) for serialized in distinct],
+        "files": files,
+    }
+    schema_fp.parent.mkdir(parents=True, exist_ok=True)
+    schema_fp.write_text(json.dumps(cache))
+
+
+def _cached_file_schemas(cache: dict[str, Any] | None) -> dict[str, tuple[list[int], pl.Schema]]:
+    if cache is None:
+        return {}
+    distinct = [schema_from_json(obj) for obj in cache["file_schemas"]]
+    return {path: ([mtime_ns, size], distinct[idx]) for path, (mtime_ns, size, idx) in cache["files"].items()}
+
+
+def _new_executor(max_workers: int | None) -> ProcessPoolExecutor:
+    # polars is multithreaded, so workers are spawned rather than forked
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def load_full_schema(
+    schema_fp: Path,
+    data_dir: Path,
+    data_glob: str,
+    logger: logging.Logger | None = None,
+    max_workers: int | None = None,
+) -> pl.Schema:
+    """
+    Full schema of every file matching `data_glob`, through the JSON cache at `schema_fp`.
+    Logs which path was taken:
+
+    - cache hit: the file set (paths, mtimes, sizes) and polars version are unchanged
+    - incremental merge: files were only added, so just those are inferred and merged
+      into the cached schema
+    - full rebuild: files changed or disappeared (or there is no usable cache), so the
+      schema is re-merged from per-file schemas, re-inferring only files that changed
+    """
+    logger = logger or logging.getLogger(__name__)
+    files = sorted(data_dir.glob(data_glob))
+    keys = _file_keys(data_dir, files)
+    cache = _read_cache(schema_fp)
+
+    if cache is not None and cache["fingerprint"] == _fingerprint(keys):
+        logger.info(f"Schema cache hit for {schema_fp.name} ({len(keys)} files)")
+        return schema_from_json(cache["schema"])
+
+    cached = _cached_file_schemas(cache)
+    unchanged = {path for path, key in keys.items() if path in cached and cached[path][0] == key}
+    to_infer = [fp for fp, path in zip(files, keys) if path not in unchanged]
+    file_schemas = {path: cached[path][1] for path in unchanged}
+
+    only_added = cache is not None and unchanged == cached.keys()
+
+    with _new_executor(max_workers) as executor:
+        inferred = executor.map(_infer_schema, to_infer, chunksize=16) if to_infer else []
+        new_schemas = dict(zip((fp.relative_to(data_dir).as_posix() for fp in to_infer), inferred))
+        file_schemas.update(new_schemas)
+
+        if only_added:
+            logger.info(f"Schema cache incremental merge for {schema_fp.name}: {len(new_schemas)} new files")
+            schema = tree_merge_schemas(
+                schemas=[schema_from_json(cache["schema"]), *new_schemas.values()],  # type: ignore
+                executor=executor,
+            )
+        else:
+            reason = "no usable cache" if cache is None else f"{len(cached) - len(unchanged)} files changed or removed"
+            logger.info(
+                f"Schema cache full rebuild for {schema_fp.name} ({reason}): "
+                f"inferred {len(new_schemas)}/{len(keys)} files"
+            )
+            schema = tree_merge_schemas(schemas=[file_schemas[path] for path in keys], executor=executor)
+
+    _write_cache(schema_fp=schema_fp, keys=keys, file_schemas=file_schemas, schema=schema)
     return schema
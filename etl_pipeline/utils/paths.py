@@ -3,9 +3,24 @@
 from pathlib import Path
 
 # common ETL pipeline paths
+# every per-agreement path is partitioned by academic year, see year_dir
 
 PROJECTDIR = Path("/home/akash/Main/projects/CACourses")
 DATA_DIR = PROJECTDIR / "data"
 ETL_DIR = PROJECTDIR / "etl_pipeline"
-SCHEMA_PREFIX_FP = ETL_DIR / "schemas/schema_prefix.pickle"
-SCHEMA_MAJOR_FP = ETL_DIR / "schemas/schema_major.pickle"
+SCHEMA_DIR = ETL_DIR / "schemas"
+SCHEMA_PREFIX_FILENAME = "schema_prefix.json"
+SCHEMA_MAJOR_FILENAME = "schema_major.json"
+DIRTY_PAIRS_FILENAME = "dirty_pairs.csv"
+DIRTY_OFFSETS_DIR = ETL_DIR / ".dirty_offsets"
+RAW_STORE_DIR = PROJECTDIR / "raw_store"
+ARTIFACT_DIR = PROJECTDIR / "artifacts"
+SQL_DIR = ETL_DIR / "sql"
+
+# ASSIST's id of the academic year the ETL loads by default (75 = 2024-2025, as in assist.org URLs)
+CURRENT_YEAR = 75
+
+
+def year_dir(root: Path, year: int) -> Path:
+    """The directory of `root` holding one academic year's files, e.g. data/year=75."""
+    return root / f"year={year}"
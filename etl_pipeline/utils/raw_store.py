@@ -0,0 +1,159 @@
+"""
+Utilities for reading raw ASSIST agreements, either straight from the downloaded JSON
+(project/data/year=[year]/[university-id]/[cc]to[uni]-[query type].json) or from the
+compressed columnar copy built by scripts/ingest_raw.py.
+
+The columnar store holds one zstd-compressed Parquet file per agreement, hive-partitioned
+as raw_store/year=[year]/[query type]/uni=[uni]/cc=[cc]/0.parquet. Rows are normalized to one
+articulation each and only the top-level fields the ETL reads are kept, so scans can
+prune partitions by uni/cc and project away what a stage doesn't need.
+"""
+
+import itertools
+from pathlib import Path
+
+import polars as pl
+
+from .dirty import agreement_files
+
+# normalized agreement columns, as produced by read_agreement() / scan_agreements()
+AGREEMENT_COLUMNS = ("cc", "uni", "course", "series_courses", "sending_items", "group_conjunctions")
+STORE_FILENAME = "0.parquet"
+HIVE_SCHEMA = {"year": pl.Int32, "uni": pl.Int32, "cc": pl.Int32}
+
+
+def parse_agreement_fp(fp: Path) -> tuple[int, int, str]:
+    """(cc, uni, query type) of a raw JSON agreement or a columnar store file."""
+    if fp.suffix == ".parquet":
+        uni = int(fp.parts[-3].removeprefix("uni="))
+        cc = int(fp.parts[-2].removeprefix("cc="))
+        return cc, uni, fp.parts[-4]
+
+    name = fp.name.removesuffix(".json")
+    cc, _, rest = name.partition("to")
+    uni, _, query_type = rest.partition("-")
+    return int(cc), int(uni), query_type
+
+
+def store_fp(store_dir: Path, query_type: str, cc: int, uni: int) -> Path:
+    return store_dir / query_type / f"uni={uni}" / f"cc={cc}" / STORE_FILENAME
+
+
+def _normalize(lf: pl.LazyFrame, query_type: str) -> pl.LazyFrame:
+    # prefix agreements nest a list of articulations per row, majors hold a single one
+    if query_type == "prefixes":
+        lf = lf.explode("articulations").rename({"articulations": "articulation"})
+
+    return lf.select(
+        course=pl.col("articulation").struct.field("course"),
+        series_courses=pl.col("articulation").struct.field("series").struct.field("courses"),
+        sending_items=pl.col("articulation").struct.field("sendingArticulation").struct.field("items"),
+        group_conjunctions=(
+            pl.col("articulation")
+            .struct.field("sendingArticulation")
+            .struct.field("courseGroupConjunctions")
+        ),
+    )
+
+
+def read_agreement(fp: Path, schema: pl.Schema | None = None) -> pl.LazyFrame:
+    """
+    Normalized LazyFrame (see AGREEMENT_COLUMNS) for a single agreement. JSON files are
+    parsed with the given full schema, columnar store files are scanned lazily.
+    """
+    cc, uni, query_type = parse_agreement_fp(fp)
+
+    if fp.suffix == ".parquet":
+        lf = pl.scan_parquet(fp, hive_partitioning=False)
+    else:
+        lf = _normalize(pl.read_json(source=fp, schema=schema).lazy(), query_type)
+
+    return lf.select(cc=pl.lit(cc), uni=pl.lit(uni), *AGREEMENT_COLUMNS[2:])
+
+
+def _expand_source(source: Path | str | list[Path]) -> list[Path]:
+    if isinstance(source, list):
+        return source
+    source = Path(source)
+    if source.is_file():
+        return [source]
+    if source.is_dir():  # a query type's directory in the columnar store
+        return sorted(source.glob(f"uni=*/cc=*/{STORE_FILENAME}"))
+
+    # glob pattern, expanded from its longest wildcard-free prefix
+    anchor = Path(*itertools.takewhile(lambda part: not any(c in part for c in "*?["), source.parts))
+    return sorted(anchor.glob(source.relative_to(anchor).as_posix()))
+
+
+def scan_agreements(source: Path | str | list[Path], schema: pl.Schema | None = None) -> pl.LazyFrame:
+    """
+    Normalized agreements (see AGREEMENT_COLUMNS) of many files of one query type as a
+    single LazyFrame. `source` is a list of files, a glob pattern, or a query type's
+    directory in the columnar store.
+
+    Store files are read by one hive-partitioned Parquet scan, with cc/uni taken from
+    their uni=/cc= directories, so polars parallelizes across files and prunes
+    partitions on cc/uni predicates. Raw JSON arrays can't be scanned lazily, so they
+    fall back to one (eager) read per file.
+    """
+    files = _expand_source(source)
+    if not files:
+        raise FileNotFoundError(f"No agreements found at {source}")
+
+    if all(fp.suffix == ".parquet" for fp in files):
+        return pl.scan_parquet(
+            files, hive_partitioning=True, hive_schema=HIVE_SCHEMA  # type: ignore
+        ).select(*AGREEMENT_COLUMNS)
+
+    return pl.concat([read_agreement(fp=fp, schema=schema) for fp in files])
+
+
+def store_files(store_dir: Path, query_type: str, pairs: set[tuple[int, int]] | None = None) -> list[Path]:
+    """Columnar store files of a query type, optionally only those of the given (cc, uni) pairs."""
+    if pairs is None:
+        return sorted(store_dir.glob(f"{query_type}/uni=*/cc=*/{STORE_FILENAME}"))
+    files = (store_fp(store_dir, query_type, cc, uni) for cc, uni in sorted(pairs))
+    return [fp for fp in files if fp.exists()]
+
+
+def agreement_sources(
+    query_type: str,
+    data_dir: Path,
+    store_dir: Path,
+    from_store: bool = False,
+    pairs: set[tuple[int, int]] | None = None,
+) -> list[Path]:
+    """
+    Agreement files of a query type to process: raw JSON under `data_dir` or columnar
+    store files under `store_dir`, optionally only those of the given (cc, uni) pairs.
+    """
+    if from_store:
+        return store_files(store_dir, query_type, pairs)
+    if pairs is not None:
+        return agreement_files(data_dir, query_type, pairs)
+    return sorted(data_dir.glob(f"*/*{query_type}.json"))
+
+
+def ingest_agreement(fp: Path, schema: pl.Schema, store_dir: Path) -> Path:
+    """
+    Write one raw JSON agreement to the columnar store. The JSON stays in place, as
+    download_data.py --refresh and schema inference read it.
+    """
+    cc, uni, query_type = parse_agreement_fp(fp)
+    out_fp = store_fp(store_dir, query_type, cc, uni)
+    out_fp.parent.mkdir(parents=True, exist_ok=True)
+
+    (
+        _normalize(pl.read_json(source=fp, schema=schema).lazy(), query_type)
+        .collect()
+        .write_parquet(out_fp, compression="zstd", statistics=True)
+    )
+
+    return out_fp
+
+
+def is_ingested(fp: Path, store_dir: Path) -> bool:
+    """Whether a JSON agreement's store file exists and is at least as new as the JSON."""
+    cc, uni, query_type = parse_agreement_fp(fp)
+    out_fp = store_fp(store_dir, query_type, cc, uni)
+    return out_fp.exists() and out_fp.stat().st_mtime >= fp.stat().st_mtime
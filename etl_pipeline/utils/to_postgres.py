@@ -1,43 +1,362 @@
 #!/usr/bin/env python
 
+import logging
+from pathlib import Path
+
 from adbc_driver_postgresql import dbapi
 import polars as pl
 
+from .benchmarking import annotate, span
+from .generate_articulations import course_satisfies, referenced_course_ids
+from .paths import CURRENT_YEAR, SQL_DIR
+
+SATISFIES_TABLE = "course_satisfies"
+SATISFIES_KEY = ["cc_course_id", "uni", "course_id", "cc", "clause"]
+
+
+def _pairs_values(pairs: set[tuple[int, int]]) -> str:
+    return ", ".join(f"({int(cc)}, {int(uni)})" for cc, uni in sorted(pairs))
+
+
+def _ingest(cur: dbapi.Cursor, df: pl.DataFrame, tablename: str, casts: dict[str, str] | None = None) -> None:
+    """
+    COPY (ADBC bulk ingest) `df` into the existing table `tablename`. Columns in `casts`
+    ({column: SQL type}) are types ADBC can't COPY directly (e.g. JSONB): they are sent as
+    text to a temporary table and cast on the server.
+    """
+    if df.is_empty():
+        return
+    if not casts:
+        cur.adbc_ingest(tablename, df.to_arrow(), mode="append")
+        return
+
+    raw = f"{tablename}_raw"
+    cur.adbc_ingest(raw, df.to_arrow(), mode="replace", temporary=True)
+    cur.execute(f"""
+        INSERT INTO {tablename} ({', '.join(df.columns)})
+        SELECT {', '.join(f'{col}::{casts[col]}' if col in casts else col for col in df.columns)}
+        FROM {raw};
+    """)
+    cur.execute(f"DROP TABLE {raw};")
+
+
+def _partition_name(tablename: str, year: int) -> str:
+    """Name of the partition of `tablename` holding academic year `year`, e.g. articulations_75."""
+    return f"{tablename}_{int(year)}"
+
+
+def _create_partitioned(cur: dbapi.Cursor, tablename: str, columns: str, primary_key: str) -> str:
+    """
+    Create `tablename` as a table partitioned by year (LIST) if it doesn't exist, and return
+    the partitioned table to attach to. A plain table of the same name, left by loads from
+    before tables were partitioned, holds a single unlabelled year: it stays live, and the
+    partitioned table is created next to it as [tablename]_partitioned, for _swap_load to
+    put in its place.
+    """
+    cur.execute(f"SELECT relkind::text FROM pg_class WHERE oid = to_regclass('{tablename}')")
+    row = cur.fetchone()
+    parent = tablename if row is None or row[0] == "p" else f"{tablename}_partitioned"
+    cur.execute(f"""
+        CREATE TABLE IF NOT EXISTS {parent} ({columns}, PRIMARY KEY ({primary_key}))
+        PARTITION BY LIST (year);
+    """)
+    return parent
+
+
+def _swap_load(
+    df: pl.DataFrame,
+    db_url: str,
+    tablename: str,
+    year: int,
+    columns: str,
+    primary_key: str,
+    indexes: dict[str, str] | None = None,
+    casts: dict[str, str] | None = None,
+) -> None:
+    """
+    Replace the `year` partition of `tablename` with the contents of `df` without it ever
+    being empty or missing; other years' partitions are not touched.
+
+    `df` is COPYed (ADBC bulk ingest) into an unindexed [partition]_staging table, then the
+    primary key and `indexes` ({name suffix: "USING ... (columns)"}) are built in bulk and
+    the table is ANALYZEd. Only then is the live partition dropped and the staging table
+    renamed & attached in its place, in one short transaction: readers block for the swap
+    and see the new rows. `columns` and `primary_key` (which must include year) also define
+    the partitioned parent table, created on first load. A plain (pre-partitioning)
+    `tablename` is only replaced by the new parent in that same swap transaction, so it
+    serves reads until then. `casts` are passed on to _ingest.
+    """
+    partition = _partition_name(tablename, year)
+    staging = f"{partition}_staging"
+    indexes = indexes or {}
+
+    with dbapi.connect(db_url) as conn:
+        # 1. load & index staging table (a leftover from a failed run is discarded)
+        with conn.cursor() as cur:
+            parent = _create_partitioned(cur, tablename, columns, primary_key)
+            cur.execute(f"DROP TABLE IF EXISTS {staging};")
+            cur.execute(f"CREATE TABLE {staging} ({columns});")
+            with span(f"COPY {staging}"):
+                annotate(rows_in=len(df))
+                _ingest(cur, df, staging, casts)
+            with span(f"index {staging}"):
+                cur.execute(f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_pkey PRIMARY KEY ({primary_key});")
+                for suffix, definition in indexes.items():
+                    cur.execute(f"CREATE INDEX {staging}_{suffix} ON {staging} {definition};")
+                # proves the partition bound, so ATTACH PARTITION below doesn't scan the table
+                cur.execute(f"ALTER TABLE {staging} ADD CONSTRAINT {staging}_year CHECK (year = {int(year)});")
+                cur.execute(f"ANALYZE {staging};")
+        conn.commit()
+
+        # 2. atomic swap of the year's partition
+        with span(f"swap {partition}"):
+            with conn.cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS {partition};")
+                cur.execute(f"ALTER TABLE {staging} RENAME TO {partition};")
+                cur.execute(f"ALTER TABLE {partition} RENAME CONSTRAINT {staging}_pkey TO {partition}_pkey;")
+                for suffix in indexes:
+                    cur.execute(f"ALTER INDEX {staging}_{suffix} RENAME TO {partition}_{suffix};")
+                cur.execute(f"ALTER TABLE {parent} ATTACH PARTITION {partition} FOR VALUES IN ({int(year)});")
+                cur.execute(f"ALTER TABLE {partition} DROP CONSTRAINT {staging}_year;")
+                if parent != tablename:  # retire the pre-partitioning plain table
+                    cur.execute(f"DROP TABLE {tablename};")
+                    cur.execute(f"ALTER TABLE {parent} RENAME TO {tablename};")
+                    cur.execute(f"ALTER TABLE {tablename} RENAME CONSTRAINT {parent}_pkey TO {tablename}_pkey;")
+            conn.commit()
 
-def write_articulations_to_psql(agreements: pl.DataFrame, db_url: str) -> None:
+
+def _table_columns(db_url: str, tablename: str) -> set[str]:
+    """Column names of the live table, empty if it doesn't exist."""
+    with dbapi.connect(db_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT attname FROM pg_attribute
+                WHERE attrelid = to_regclass('{tablename}') AND attnum > 0 AND NOT attisdropped
+            """)
+            return {row[0] for row in cur.fetchall()}
+
+
+def _sync_table(
+    df: pl.DataFrame,
+    db_url: str,
+    tablename: str,
+    key: list[str],
+    scope: str | None = None,
+    delete: bool = True,
+    update_if: str | None = None,
+    casts: dict[str, str] | None = None,
+    logger: logging.Logger | None = None,
+) -> dict[str, int]:
+    """
+    Bring the rows of `tablename` in line with `df` by applying only the row-level diff,
+    in one transaction: `df` is COPYed into a temporary table, rows whose key is new are
+    inserted and rows whose other columns differ are updated (one MERGE), and with
+    `delete`, rows missing from `df` are deleted. `scope` is a SQL condition on the live
+    table (aliased t) limiting which rows are considered for deletion, and `update_if` one
+    on both tables (t, s) that a changed row must also meet to be updated. Columns in
+    `casts` ({column: SQL type}) are staged as text and cast on the server (see _ingest).
+
+    Unchanged rows are never rewritten, so a refresh with few changes writes little WAL.
+    Returns (and logs) the number of inserted, updated & deleted rows.
+    """
+    staging = f"{tablename}_sync"
+    casts = casts or {}
+    values = [col for col in df.columns if col not in key]
+    incoming = {col: f"s.{col}::{casts[col]}" if col in casts else f"s.{col}" for col in df.columns}
+    key_match = " AND ".join(f"t.{col} = s.{col}" for col in key)
+    changed = (
+        f"({', '.join(f't.{col}' for col in values)}) IS DISTINCT FROM "
+        f"({', '.join(incoming[col] for col in values)})"
+    )
+    if update_if is not None:
+        changed = f"{changed} AND {update_if}"
+
+    with dbapi.connect(db_url) as conn:
+        with conn.cursor() as cur:
+            # 1. stage incoming rows next to the live table
+            with span(f"COPY {staging}"):
+                annotate(rows_in=len(df))
+                cur.adbc_ingest(staging, df.to_arrow(), mode="replace", temporary=True)
+                cur.execute(f"ANALYZE {staging};")
+
+            # 2. size the diff
+            cur.execute(f"""
+                SELECT
+                    count(*) FILTER (WHERE t.{key[0]} IS NULL),
+                    count(*) FILTER (WHERE t.{key[0]} IS NOT NULL AND {changed})
+                FROM {staging} s LEFT JOIN {tablename} t ON {key_match}
+            """)  # no trailing ; as ADBC wraps queries in COPY (...) TO STDOUT
+            inserted, updated = cur.fetchone()
+
+            # 3. inserts & updates
+            if inserted or updated:
+                cur.execute(f"""
+                    MERGE INTO {tablename} t
+                    USING {staging} s ON {key_match}
+                    WHEN MATCHED AND {changed} THEN
+                        UPDATE SET {', '.join(f'{col} = {incoming[col]}' for col in values)}
+                    WHEN NOT MATCHED THEN
+                        INSERT ({', '.join(df.columns)})
+                        VALUES ({', '.join(incoming.values())});
+                """)
+
+            # 4. deletes
+            deleted = 0
+            if delete:
+                cur.execute(f"""
+                    DELETE FROM {tablename} t
+                    WHERE {scope or 'TRUE'}
+                    AND NOT EXISTS (SELECT 1 FROM {staging} s WHERE {key_match});
+                """)
+                deleted = cur.rowcount
+
+            cur.execute(f"DROP TABLE {staging};")
+        conn.commit()
+
+    counts = {"inserted": inserted, "updated": updated, "deleted": deleted}
+    if logger is not None:
+        logger.info(
+            f" {tablename} sync: {inserted} inserted, {updated} updated, {deleted} deleted, "
+            f"{len(df) - inserted - updated} unchanged"
+        )
+    return counts
+
+
+def write_articulations_to_psql(
+    agreements: pl.DataFrame,
+    db_url: str,
+    year: int = CURRENT_YEAR,
+    pairs: set[tuple[int, int]] | None = None,
+    sync: bool = False,
+    logger: logging.Logger | None = None,
+) -> None:
+    """
+    Replace the `year` partition of the articulations table with `agreements` (staged &
+    swapped in, see _swap_load). If `pairs` is given, only the rows of those (cc, uni) pairs
+    are replaced, in a single transaction. With `sync`, only the row-level diff against the
+    partition is applied (see _sync_table), limited to `pairs` if given. Other academic
+    years are never read or written.
+
+    Articulations are stored as JSONB, next to the sorted course ids each one references
+    (cc_course_ids, GIN-indexed), so readers can look up glossary rows without parsing.
+    The course_satisfies reverse index (see generate_articulations.course_satisfies) is
+    written alongside, in the same mode, so it always mirrors the articulations table.
+    """
     tablename = "articulations"
+    casts = {"articulation": "JSONB"}
 
     agreements = agreements.cast({
         "course_id": pl.Int32,
         "cc": pl.Int16,
         "uni": pl.Int16,
         "articulation": pl.String
-    })
+    }).with_columns(
+        cc_course_ids=referenced_course_ids(pl.col("articulation")),
+        year=pl.lit(year, dtype=pl.Int16),
+    )
+    satisfies = course_satisfies(agreements.lazy()).with_columns(year=pl.lit(year, dtype=pl.Int16)).collect()
+    # sync & pairs modes work on the year's partition alone, where year is constant and left out of keys
+    tables = (
+        (_partition_name(tablename, year), agreements, ["course_id", "cc", "uni"], casts),
+        (_partition_name(SATISFIES_TABLE, year), satisfies, SATISFIES_KEY, None),
+    )
 
-    with dbapi.connect(db_url) as conn:
-        with conn.cursor() as cur:
-            
-            cur.execute(f"DROP TABLE IF EXISTS {tablename};")
-            cur.execute(f"""
-                CREATE TABLE {tablename} (
-                    course_id INT4 NOT NULL,
-                    cc INT2 NOT NULL,
-                    uni INT2 NOT NULL,
-                    articulation TEXT NOT NULL,
-                    PRIMARY KEY (course_id, cc, uni)
-                );
-            """)
-        conn.commit()
-    
-    agreements.write_database(
-        table_name=tablename,
-        connection=db_url,
-        if_table_exists="append",
-        engine="adbc"
+    if sync and any(_table_columns(db_url, name) != set(df.columns) for name, df, _, _ in tables):
+        outdated = f"{tablename} or {SATISFIES_TABLE} partition of year {year} is missing or outdated"
+        if pairs is not None:
+            raise RuntimeError(f"{outdated}, run a full load first")
+        if logger is not None:
+            logger.warning(f" {outdated}, doing a full load instead of a sync")
+        sync = False
+
+    if sync:
+        if pairs is not None and not pairs:
+            return
+        for name, df, key, table_casts in tables:
+            _sync_table(
+                df,
+                db_url=db_url,
+                tablename=name,
+                key=key,
+                scope=f"(t.cc, t.uni) IN (VALUES {_pairs_values(pairs)})" if pairs is not None else None,
+                casts=table_casts,
+                logger=logger,
+            )
+        return
+
+    if pairs is not None:
+        if not pairs:
+            return
+        with dbapi.connect(db_url) as conn:
+            with conn.cursor() as cur:
+                for name, df, _, table_casts in tables:
+                    cur.execute(f"""
+                        DELETE FROM {name}
+                        WHERE (cc, uni) IN (VALUES {_pairs_values(pairs)});
+                    """)
+                    _ingest(cur, df, name, table_casts)
+            conn.commit()
+        return
+
+    _swap_load(
+        agreements,
+        db_url=db_url,
+        tablename=tablename,
+        year=year,
+        columns="""
+            course_id INT4 NOT NULL,
+            cc INT2 NOT NULL,
+            uni INT2 NOT NULL,
+            articulation JSONB NOT NULL,
+            cc_course_ids INT4[] NOT NULL,
+            year INT2 NOT NULL
+        """,
+        primary_key="course_id, cc, uni, year",
+        indexes={
+            "cc_uni_idx": "(cc, uni)",  # per-agreement deletes of --dirty-only runs
+            "cc_course_ids_idx": "USING GIN (cc_course_ids)",  # articulations referencing a cc course
+        },
+        casts=casts,
+    )
+    _swap_load(
+        satisfies,
+        db_url=db_url,
+        tablename=SATISFIES_TABLE,
+        year=year,
+        columns="""
+            cc_course_id INT4 NOT NULL,
+            uni INT2 NOT NULL,
+            course_id INT4 NOT NULL,
+            cc INT2 NOT NULL,
+            clause INT2 NOT NULL,
+            clause_size INT2,
+            year INT2 NOT NULL
+        """,
+        # lookups by cc course (get_course_satisfies, optionally per uni) are prefix scans of the key
+        primary_key=", ".join([*SATISFIES_KEY, "year"]),
+        indexes={
+            "cc_uni_idx": "(cc, uni)",  # per-agreement deletes of --dirty-only runs
+        },
     )
 
 
-def write_glossary_to_psql(glossary: pl.DataFrame, db_url: str) -> None:
+def write_glossary_to_psql(
+    glossary: pl.DataFrame,
+    db_url: str,
+    year: int = CURRENT_YEAR,
+    upsert: bool = False,
+    sync: bool = False,
+    logger: logging.Logger | None = None,
+) -> None:
+    """
+    Replace the `year` partition of the glossary table with `glossary` (staged & swapped
+    in, see _swap_load). With `upsert`, rows are instead merged into the existing partition
+    by course_id, leaving courses not in `glossary` untouched. A merged row only replaces
+    one whose course version ends no later (eterm), so re-reading a few agreements can't
+    bring back a version the full glossary dropped. With `sync`, only the row-level diff
+    against the partition is applied (see _sync_table); courses missing from `glossary`
+    are deleted unless also upserting.
+    """
     tablename = "glossary"
 
     glossary = glossary.select([
@@ -46,35 +365,133 @@ def write_glossary_to_psql(glossary: pl.DataFrame, db_url: str) -> None:
         "course_code",
         "course_name",
         "min_units",
-        "max_units"
+        "max_units",
+        "eterm"
     ]).cast({
         "course_id": pl.Int32,
         "inst_id": pl.Int16,
         "course_code": pl.String,
         "course_name": pl.String,
         "min_units": pl.Float32,
-        "max_units": pl.Float32
-    })
+        "max_units": pl.Float32,
+        "eterm": pl.Int32
+    }).with_columns(year=pl.lit(year, dtype=pl.Int16))
+    partition = _partition_name(tablename, year)
+
+    if sync and _table_columns(db_url, partition) == set(glossary.columns):
+        _sync_table(
+            glossary, db_url=db_url, tablename=partition, key=["course_id"], delete=not upsert,
+            update_if="s.eterm >= t.eterm" if upsert else None, logger=logger
+        )
+        return
+
+    if upsert:
+        if glossary.is_empty():
+            return
+        with dbapi.connect(uri=db_url) as conn:
+            with conn.cursor() as cur:
+                cur.adbc_ingest(f"{partition}_upsert", glossary.to_arrow(), mode="replace", temporary=True)
+                cur.execute(f"""
+                    INSERT INTO {partition} (course_id, inst_id, course_code, course_name, min_units, max_units, eterm, year)
+                    SELECT course_id, inst_id, course_code, course_name, min_units, max_units, eterm, year
+                    FROM {partition}_upsert
+                    ON CONFLICT (course_id, year) DO UPDATE SET
+                        inst_id = EXCLUDED.inst_id,
+                        course_code = EXCLUDED.course_code,
+                        course_name = EXCLUDED.course_name,
+                        min_units = EXCLUDED.min_units,
+                        max_units = EXCLUDED.max_units,
+                        eterm = EXCLUDED.eterm
+                    WHERE EXCLUDED.eterm >= {partition}.eterm;
+                """)
+            conn.commit()
+        return
 
     with dbapi.connect(uri=db_url) as conn:
         with conn.cursor() as cur:
+            cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")  # trigram indexes below
+        conn.commit()
 
-            cur.execute(f"DROP TABLE IF EXISTS {tablename};")
-            cur.execute(f"""
-                CREATE TABLE IF NOT EXISTS {tablename} (
-                    course_id INT4 PRIMARY KEY,
-                    inst_id INT2 NOT NULL,
-                    course_code TEXT NOT NULL,
-                    course_name TEXT NOT NULL,
-                    min_units REAL NOT NULL,
-                    max_units REAL NOT NULL
+    _swap_load(
+        glossary,
+        db_url=db_url,
+        tablename=tablename,
+        year=year,
+        columns="""
+            course_id INT4 NOT NULL,
+            inst_id INT2 NOT NULL,
+            course_code TEXT NOT NULL,
+            course_name TEXT NOT NULL,
+            min_units REAL NOT NULL,
+            max_units REAL NOT NULL,
+            eterm INT4 NOT NULL,
+            year INT2 NOT NULL
+        """,
+        primary_key="course_id, year",
+        indexes={
+            "inst_id_idx": "(inst_id)",  # get_courses lambda (sql/get_course_list.sql)
+            # substring search of get_courses' search mode (sql/search_courses.sql)
+            "course_code_trgm_idx": "USING GIN (course_code gin_trgm_ops)",
+            "course_name_trgm_idx": "USING GIN (course_name gin_trgm_ops)",
+        },
+    )
+
+
+def deploy_sql_functions(db_url: str, sql_dir: Path = SQL_DIR) -> list[str]:
+    """
+    (Re)create the SQL functions the backend calls over RPC, one CREATE OR REPLACE statement
+    per file in `sql_dir`, named after its function. Other overloads of that name are dropped
+    first, so a changed signature replaces the deployed function instead of adding an
+    ambiguous one. Function bodies are only checked when called, so they can be deployed
+    before every table they read exists. Returns the deployed files' names.
+    """
+    sql_fps = sorted(sql_dir.glob("*.sql"))
+    if not sql_fps:
+        raise FileNotFoundError(f"No SQL functions found in {sql_dir}")
+
+    with dbapi.connect(db_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL check_function_bodies = off;")
+            for sql_fp in sql_fps:
+                cur.execute(f"""
+                    SELECT oid::regprocedure::text FROM pg_proc
+                    WHERE proname = '{sql_fp.stem}' AND pg_function_is_visible(oid)
+                """)
+                for (signature,) in cur.fetchall():
+                    cur.execute(f"DROP FUNCTION {signature};")
+                cur.execute(sql_fp.read_text())
+        conn.commit()
+    return [sql_fp.stem for sql_fp in sql_fps]
+
+
+def record_load_version(db_url: str, year: int = CURRENT_YEAR) -> str:
+    """
+    Stamp the database with a new load version (etl_meta.load_version) after the tables
+    were written, which the lambdas' response caches compare against to drop stale entries.
+    The latest academic year loaded so far is kept as etl_meta.current_year, the year the
+    SQL functions serve when not asked for one. Returns the new version.
+    """
+    with dbapi.connect(db_url) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS etl_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
                 );
             """)
+            cur.execute("""
+                INSERT INTO etl_meta (key, value) VALUES ('load_version', clock_timestamp()::text)
+                ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = now()
+                RETURNING value
+            """)
+            (version,) = cur.fetchone()  # type: ignore
+            # loading a past year doesn't move the default year back
+            cur.execute(f"""
+                INSERT INTO etl_meta (key, value) VALUES ('current_year', '{int(year)}')
+                ON CONFLICT (key) DO UPDATE SET
+                    value = GREATEST(etl_meta.value::int, EXCLUDED.value::int)::text,
+                    updated_at = now();
+            """)
         conn.commit()
-
-    glossary.write_database(
-        table_name=tablename,
-        connection=db_url,
-        if_table_exists="append",
-        engine="adbc"
-    )
+    return version
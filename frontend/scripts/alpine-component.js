@@ -17,6 +17,7 @@ document.addEventListener('alpine:init', () => {
         loadingCourses: false,
         courses: [],
         courseSearching: '',
+        searchTimeout: null,
         course: null,
         courseID: null,
         showCourseOpts: false,
@@ -32,6 +33,12 @@ document.addEventListener('alpine:init', () => {
                 .map(([id, name]) => [name, id])
                 .sort(([n1], [n2]) => n1.localeCompare(n2));
             this.loadingUnis = false;
+
+            // courses are searched server-side as the user types, debounced
+            this.$watch('courseSearching', () => {
+                if (this.searchTimeout) clearTimeout(this.searchTimeout);
+                this.searchTimeout = setTimeout(() => this.fetchCourses(), 150);
+            });
         },
 
         // --- Getters (Computed Logic) --
@@ -52,7 +59,7 @@ document.addEventListener('alpine:init', () => {
         },
 
         get searchCourses() {
-            const term = this.courseSearching.toLowerCase();
+            const term = this.courseSearching.trim().toLowerCase();
             return this.courses.filter((course) => {
                 return course.course_name.toLowerCase().includes(term) || 
                        course.course_code.toLowerCase().includes(term);
@@ -68,22 +75,30 @@ document.addEventListener('alpine:init', () => {
                 this.univ = name;
                 this.univID = id;
                 this.courseSearching = '';
+                this.courses = [];
                 this.course = null;
                 this.courseID = null;
-                await this.fetchCourses();
             }
             if (this.blurTimeout) clearTimeout(this.blurTimeout);
         },
 
         async fetchCourses() {
-            if (this.univID in courseCache) {
-                this.courses = courseCache[this.univID];
+            const term = this.courseSearching.trim();
+            const key = `${this.univID}:${term.toLowerCase()}`;
+            if (this.univID === null || term === '') {
+                this.courses = [];
+                return;
+            }
+            if (key in courseCache) {
+                this.courses = courseCache[key];
                 return;
             }
             this.loadingCourses = true;
             try {
-                this.courses = await _fetchCourses(this.univID);
-                courseCache[this.univID] = this.courses;
+                const courses = await _searchCourses(this.univID, term);
+                courseCache[key] = courses;
+                // a slower response for an older term must not replace newer results
+                if (term === this.courseSearching.trim()) this.courses = courses;
             } catch (error) {
                 console.error("Error fetching courses:", error);
             } finally {
@@ -4,6 +4,49 @@ const GET_COURSES_LAMBDA_URL = 'https://kedlmmemb2qvdqlzu5srtnqoi40icpqk.lambda-
 const CC_PATH = '../data/institutions_cc.json'
 const UNI_PATH = '../data/institutions_state.json'
 
+/**
+ * Flattens an articulation node into the courses of one AND block. DNF clauses are flat
+ * lists of ids; articulations too large for DNF arrive nested, in which case each nested
+ * OR is shown as a single entry ("A or B").
+ * @param {Object|number|null} node - course id or {conj, items} node.
+ * @param {Object} courses - course details by id.
+ * @returns {Array<Object<string, string>>} [{code, name}, ...]
+ */
+function _andBlock(node, courses) {
+    if (node === null) return [];
+    if (typeof node === "number") {
+        return [{
+            code: courses[node]?.course_code ?? "Unknown",
+            name: courses[node]?.course_name ?? "Unknown"
+        }];
+    }
+    const children = (node.items ?? []).map(child => _andBlock(child, courses));
+    if (node.conj === "And") return children.flat();
+
+    const options = children.filter(block => block.length > 0);
+    if (options.length === 0) return [];
+    return [{
+        code: options.map(block => block.map(course => course.code).join(" and ")).join(" or "),
+        name: options.map(block => block.map(course => course.name).join(" and ")).join(" or ")
+    }];
+}
+
+
+/**
+ * Splits an articulation into its OR blocks, each a list of courses to take together.
+ * @param {Object|number|null} node - course id or {conj, items} node.
+ * @param {Object} courses - course details by id.
+ * @returns {Array<Array<Object<string, string>>>} [[{code, name}, ...], ...]
+ */
+function _orBlocks(node, courses) {
+    if (node !== null && typeof node === "object" && node.conj === "Or") {
+        return (node.items ?? []).flatMap(child => _orBlocks(child, courses));
+    }
+    const block = _andBlock(node, courses);
+    return block.length > 0 ? [block] : [];
+}
+
+
 /**
  * Retrieves articulation agreements and maps IDs to course details.
  * @param {string} courseID - ID from the search input.
@@ -17,18 +60,11 @@ async function _fetchArticulations(courseID) {
     const [articulations, courses] = await response.json();
 
     const result = Object.fromEntries(
-        Object.entries(articulations).map(([cc, jsonstr]) => {
+        Object.entries(articulations).map(([cc, articulation]) => {
             try {
-                const agreement = JSON.parse(jsonstr);
-                const matrix = agreement.items.map(andblock => 
-                    andblock.items.map(
-                        id => ({
-                            code: courses[id]?.course_code ?? "Unknown",
-                            name: courses[id]?.course_name ?? "Unknown"
-                        })
-                    )
-                )
-                return [cc, matrix];
+                // JSONB objects, or JSON strings from older deployments
+                const agreement = typeof articulation === "string" ? JSON.parse(articulation) : articulation;
+                return [cc, _orBlocks(agreement, courses)];
             } catch (e) {
                 console.error("Invalid JSON for CC:", cc);
                 return [cc, []]; // Fallback for failed parses
@@ -40,18 +76,20 @@ async function _fetchArticulations(courseID) {
 
 
 /**
- * Retrieves all courses associated with a university.
+ * Retrieves a university's best matches for a search term (course code or name), ranked
+ * server-side so the full catalog never has to be downloaded.
  * @param {string} univID
+ * @param {string} query
+ * @param {number} limit
  * @returns {Promise<Array<Object<string, string>>>}
  */
-async function _fetchCourses(univID) {
-    const response = await fetch(`${GET_COURSES_LAMBDA_URL}/?inst_id=${encodeURIComponent(univID)}`);
-
-    if (!response.ok) throw new Error("Failed to fetch course data");
+async function _searchCourses(univID, query, limit = 20) {
+    const params = new URLSearchParams({ inst_id: univID, q: query, limit: limit });
+    const response = await fetch(`${GET_COURSES_LAMBDA_URL}/?${params}`);
 
-    const courses = await response.json();
+    if (!response.ok) throw new Error("Failed to search courses");
 
-    return courses.sort((a, b) => a.course_code.localeCompare(b.course_code));
+    return await response.json();
 }
 
 
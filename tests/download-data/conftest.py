@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# download_data.py lives at the project root
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
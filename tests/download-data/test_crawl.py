@@ -0,0 +1,194 @@
+import asyncio
+import json
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+
+import pytest
+from download_data import crawl, payload_hash
+
+"""
+crawl() against a local mock of ASSIST's agreements API: the query fallback chain,
+429s with Retry-After pausing every worker, and the sliding rate window. --refresh
+runs go through the whole script.
+"""
+
+SCRIPT = Path(__file__).resolve().parents[2] / "download_data.py"
+
+ARTICULATIONS = [{"templateCellId": "1", "articulation": {"course": {"courseIdentifierParentId": 1}}}]
+
+
+class MockAssist(ThreadingHTTPServer):
+    """
+    Serves GET /api?Key=[year]/[cc]/to/[uni]/[query type]. Each (cc, uni, query type)
+    answers from its queue of (status, headers, articulations) responses, the last one
+    repeating, and 400 if it has none. Every request's arrival time is recorded.
+    """
+
+    def __init__(self, responses: dict[tuple[int, int, str], list[tuple[int, dict, list | None]]]):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.responses = {key: list(queue) for key, queue in responses.items()}
+        self.requests: list[tuple[float, int, int, str]] = []
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api?Key=75/"
+
+    def respond(self, cc: int, uni: int, query_type: str) -> tuple[int, dict, list | None]:
+        with self.lock:
+            self.requests.append((time.monotonic(), cc, uni, query_type))
+            queue = self.responses.get((cc, uni, query_type))
+            if not queue:
+                return 400, {}, None
+            return queue.pop(0) if len(queue) > 1 else queue[0]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        cc, _, uni, query_type = unquote(self.path).partition("Key=75/")[2].split("/")
+        status, headers, articulations = self.server.respond(int(cc), int(uni), query_type)
+
+        body = json.dumps({"result": {"articulations": json.dumps(articulations or [])}}).encode()
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def mock_assist():
+    servers = []
+
+    def start(responses):
+        server = MockAssist(responses)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def run_crawl(server: MockAssist, jobs: list, data_dir, **kwargs) -> dict[tuple[int, int], tuple]:
+    results = {}
+
+    def on_result(cc, uni, outcome, query_type, meta):
+        results[(cc, uni)] = (outcome, query_type, meta)
+
+    asyncio.run(crawl(
+        jobs=[(cc, uni, "AllPrefixes", None) for cc, uni in jobs],
+        base_url=server.base_url,
+        data_dir=str(data_dir),
+        on_result=on_result,
+        **kwargs,
+    ))
+    return results
+
+
+def test_fallback_chain(mock_assist, tmp_path):
+    server = mock_assist({
+        (1, 10, "AllPrefixes"): [(200, {}, ARTICULATIONS)],
+        (2, 10, "AllDepartments"): [(200, {}, ARTICULATIONS)],
+        (3, 10, "AllMajors"): [(500, {}, None)],
+    })
+    results = run_crawl(server, [(1, 10), (2, 10), (3, 10), (4, 10)], tmp_path, rate_limit=100, rate_window=1)
+
+    assert {pair: outcome for pair, (outcome, _, _) in results.items()} == {
+        (1, 10): "AllPrefixes",
+        (2, 10): "AllDepartments",
+        (3, 10): "400",  # a 400 on an earlier query means no agreement
+        (4, 10): "400",
+    }
+    assert json.loads((tmp_path / "10" / "1to10-prefixes.json").read_text()) == ARTICULATIONS
+    assert json.loads((tmp_path / "10" / "2to10-departments.json").read_text()) == ARTICULATIONS
+    assert results[(1, 10)][2]["changed"] is True
+
+
+def test_429_retry_after_pauses_every_worker(mock_assist, tmp_path):
+    server = mock_assist({
+        (1, 10, "AllPrefixes"): [(429, {"Retry-After": "1"}, None), (200, {}, ARTICULATIONS)],
+        **{(cc, 10, "AllPrefixes"): [(200, {}, ARTICULATIONS)] for cc in range(2, 9)},
+    })
+    start = time.monotonic()
+    results = run_crawl(server, [(cc, 10) for cc in range(1, 9)], tmp_path, rate_limit=100, rate_window=1, num_workers=2)
+
+    assert all(outcome == "AllPrefixes" for outcome, _, _ in results.values())
+    assert len(server.requests) == 9  # the 429 was retried once
+
+    # besides a request the other worker already had in flight, nobody requests
+    # until Retry-After has passed
+    rate_limited_at = next(ts for ts, cc, _, _ in server.requests if cc == 1)
+    during = [ts - rate_limited_at for ts, _, _, _ in server.requests if 0 < ts - rate_limited_at < 0.9]
+    assert len(during) <= 1 and all(delay < 0.1 for delay in during)
+    assert time.monotonic() - start < 5
+
+
+def test_rate_window(mock_assist, tmp_path):
+    limit, window = 4, 0.5
+    pairs = [(cc, 10) for cc in range(1, 13)]
+    server = mock_assist({(cc, uni, "AllPrefixes"): [(200, {}, ARTICULATIONS)] for cc, uni in pairs})
+    results = run_crawl(server, pairs, tmp_path, rate_limit=limit, rate_window=window, num_workers=6)
+
+    assert len(results) == len(pairs)
+    starts = sorted(ts for ts, _, _, _ in server.requests)
+    # never more than `limit` requests within any `window` seconds (with a little slack
+    # for requests reaching the server later than the limiter released them)
+    for i, ts in enumerate(starts):
+        assert sum(1 for other in starts[i:] if other - ts < window * 0.9) <= limit
+    assert starts[-1] - starts[0] >= (len(pairs) // limit - 1) * window * 0.9
+
+
+def test_timeouts_are_retried(mock_assist, tmp_path, monkeypatch):
+    import download_data
+
+    server = mock_assist({(1, 10, "AllPrefixes"): [(200, {}, ARTICULATIONS)]})
+    calls = defaultdict(int)
+    original = download_data.fetch_data
+
+    async def flaky_fetch(client, limiter, cc, uni, query_type, *args):
+        calls[query_type] += 1
+        if calls[query_type] < download_data.MAX_TIMEOUT_RETRIES:
+            return None, {}
+        return await original(client, limiter, cc, uni, query_type, *args)
+
+    monkeypatch.setattr(download_data, "fetch_data", flaky_fetch)
+    results = run_crawl(server, [(1, 10)], tmp_path, rate_limit=100, rate_window=1)
+    assert results[(1, 10)][0] == "AllPrefixes"
+    assert calls["AllPrefixes"] == download_data.MAX_TIMEOUT_RETRIES
+
+
+def test_refresh_empty_agreement(mock_assist, tmp_path):
+    """An agreement that comes back without articulations is removed like a withdrawn one."""
+    (tmp_path / "institutions_cc.json").write_text(json.dumps({"1": "cc"}))
+    (tmp_path / "institutions_state.json").write_text(json.dumps({"10": "uni"}))
+    year_dir = tmp_path / "year=75"
+    (year_dir / "10").mkdir(parents=True)
+    (year_dir / "10" / "1to10-prefixes.json").write_text(json.dumps(ARTICULATIONS))
+    record = {"cc": 1, "uni": 10, "state": "prefixes", "ts": 0, "sha256": payload_hash(ARTICULATIONS)}
+    (year_dir / "crawl_journal.jsonl").write_text(json.dumps(record) + "\n")
+
+    server = mock_assist({(1, 10, "AllPrefixes"): [(200, {}, [])]})
+    subprocess.run(
+        [sys.executable, str(SCRIPT), "--refresh", "--data-dir", str(tmp_path), "--base-url", server.base_url,
+         "--rate-limit", "100", "--rate-window", "1"],
+        check=True, capture_output=True,
+    )
+
+    assert not (year_dir / "10" / "1to10-prefixes.json").exists()
+    assert (year_dir / "dirty_pairs.csv").read_text() == "1,10\n"
+    last = json.loads((year_dir / "crawl_journal.jsonl").read_text().splitlines()[-1])
+    assert (last["state"], last["query_type"]) == ("empty", "AllPrefixes")
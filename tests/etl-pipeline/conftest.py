@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# the ETL modules are imported as the scripts import them, from etl_pipeline/
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "etl_pipeline"))
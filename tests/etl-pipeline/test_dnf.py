@@ -0,0 +1,152 @@
+import json
+from pathlib import Path
+
+import polars as pl
+import pytest
+from utils import articulations_from_agreements, articulations_to_dnf, to_dnf, to_dnf_batch
+
+"""
+to_dnf_batch must serialize every articulation exactly as map_elements(to_dnf) does.
+The cases are dnf.ipynb's, reshaped into the fixed-depth trees of
+articulations_from_agreements() where they fit, plus null & empty groups.
+"""
+
+ARTICULATION_DTYPE = pl.Struct({
+    "conj": pl.String,
+    "items": pl.List(pl.Struct({
+        "conj": pl.String,
+        "items": pl.List(pl.Struct({
+            "conj": pl.String,
+            "items": pl.List(pl.Int64),
+        })),
+    })),
+})
+
+
+def notebook_cases() -> list[tuple[str, dict, dict]]:
+    """dnf.ipynb's comprehensive_suite: (id, expr, expected) tuples."""
+    notebook = json.loads((Path(__file__).parent / "dnf.ipynb").read_text())
+    namespace = {}
+    for cell in notebook["cells"][:2]:  # Expr/TestCase helpers, then the cases
+        exec("".join(cell["source"]), namespace)
+    return namespace["comprehensive_suite"]
+
+
+def as_articulation(expr: dict | int) -> dict | None:
+    """expr as Or(level 1 node(groups of ints)), or None if it is nested deeper than that."""
+
+    def group(node):
+        if not isinstance(node, dict):
+            return {"conj": "And", "items": [node]}
+        if all(not isinstance(item, dict) for item in node["items"]):
+            return node
+        return None
+
+    if not isinstance(expr, dict):
+        expr = {"conj": "And", "items": [expr]}
+    groups = [group(node) for node in expr["items"]]
+    if any(g is None for g in groups):
+        return None
+    return {"conj": "Or", "items": [{"conj": expr["conj"], "items": groups}]}
+
+
+NOTEBOOK_CASES = notebook_cases()
+
+EDGE_CASES = {
+    "null_articulation": None,
+    "empty_top_or": {"conj": "Or", "items": []},
+    "null_level1": {"conj": "Or", "items": [None]},
+    "empty_level1": {"conj": "Or", "items": [{"conj": "And", "items": []}]},
+    "null_group_or": {"conj": "Or", "items": [{"conj": "Or", "items": [None, {"conj": "And", "items": [5]}]}]},
+    "null_group_and": {"conj": "Or", "items": [{"conj": "And", "items": [None, {"conj": "Or", "items": [1, 2]}]}]},
+    "empty_group_or": {"conj": "Or", "items": [{"conj": "Or", "items": [{"conj": "Or", "items": []}, {"conj": "And", "items": [5]}]}]},
+    "empty_group_and": {"conj": "Or", "items": [{"conj": "And", "items": [{"conj": "Or", "items": []}, {"conj": "Or", "items": [1, 2]}]}]},
+    "all_null_ids_or": {"conj": "Or", "items": [{"conj": "Or", "items": [{"conj": "Or", "items": [None]}, {"conj": "And", "items": [5]}]}]},
+    "all_null_ids_only": {"conj": "Or", "items": [{"conj": "Or", "items": [{"conj": "Or", "items": [None]}]}]},
+    "all_null_ids_and": {"conj": "Or", "items": [{"conj": "And", "items": [{"conj": "Or", "items": [None, None]}, {"conj": "And", "items": [5]}]}]},
+    "null_id_in_and_group": {"conj": "Or", "items": [{"conj": "Or", "items": [{"conj": "And", "items": [1, None]}, {"conj": "Or", "items": [2, None]}]}]},
+    "null_conj_group": {"conj": "Or", "items": [{"conj": "Or", "items": [{"conj": None, "items": [1, 2]}, {"conj": None, "items": [3, None]}]}]},
+    "wide_and_null_group_last": {"conj": "Or", "items": [{"conj": "And", "items": [
+        *({"conj": "Or", "items": [10 * g + i for i in range(4)]} for g in range(8)),
+        {"conj": "Or", "items": [None]},
+    ]}]},
+    "over_max_clauses": {"conj": "Or", "items": [{"conj": "And", "items": [
+        {"conj": "Or", "items": [10 * g + i for i in range(3)]} for g in range(6)
+    ]}]},
+}
+
+
+@pytest.mark.parametrize(("expr", "expected"), [(expr, expected) for _, expr, expected in NOTEBOOK_CASES],
+                         ids=[test_id for test_id, _, _ in NOTEBOOK_CASES])
+def test_to_dnf(expr, expected):
+    assert json.loads(to_dnf(expr)) == expected
+
+
+def test_notebook_cases_reshaped():
+    """Reshaping into articulation depth keeps the notebook's expected DNF."""
+    for test_id, expr, expected in NOTEBOOK_CASES:
+        articulation = as_articulation(expr)
+        if articulation is not None:
+            assert json.loads(to_dnf(articulation)) == expected, test_id
+
+
+def test_to_dnf_batch_matches_to_dnf():
+    reshaped = [as_articulation(expr) for _, expr, _ in NOTEBOOK_CASES]
+    cases = [a for a in reshaped if a is not None] + list(EDGE_CASES.values())
+    assert len(cases) > len(EDGE_CASES) + len(NOTEBOOK_CASES) // 2  # most notebook cases fit
+
+    articulations = pl.Series("articulation", cases, dtype=ARTICULATION_DTYPE)
+    expected = articulations.map_elements(to_dnf, return_dtype=pl.String).to_list()
+    actual = to_dnf_batch(articulations).to_list()
+    for expr, row, batch in zip(cases, expected, actual):
+        assert batch == row, expr
+
+
+@pytest.mark.parametrize("name", EDGE_CASES)
+def test_to_dnf_batch_edge_case(name):
+    articulations = pl.Series("articulation", [EDGE_CASES[name]], dtype=ARTICULATION_DTYPE)
+    expected = articulations.map_elements(to_dnf, return_dtype=pl.String).to_list()
+    assert to_dnf_batch(articulations, max_clauses=256).to_list() == expected
+
+
+def test_compact_form_is_canonical():
+    """Over-limit articulations serialize the same whatever order their items come in."""
+    expr = EDGE_CASES["over_max_clauses"]
+    level1 = expr["items"][0]
+    shuffled = {"conj": "Or", "items": [{
+        "conj": "And",
+        "items": [{"conj": "Or", "items": group["items"][::-1]} for group in level1["items"][::-1]],
+    }]}
+    articulations = pl.Series("articulation", [expr, shuffled], dtype=ARTICULATION_DTYPE)
+
+    by_row = articulations.map_elements(to_dnf, return_dtype=pl.String).to_list()
+    assert by_row[0] == by_row[1]
+    assert to_dnf_batch(articulations).to_list() == by_row
+
+
+def test_articulations_serialize_deterministically():
+    """The same agreements give the same rows on every run, whatever order group_by returns."""
+    sending_items = [
+        {"courseConjunction": "Or", "items": [{"courseIdentifierParentId": 10 * s + i} for i in range(3)]}
+        for s in range(6)
+    ]
+    # a course with several sending articulations, each over max_clauses on its own
+    rows = [
+        (course_id, sending_items[k:] + sending_items[:k]) for course_id in (100, 200) for k in range(4)
+    ]
+
+    def run(rows: list[tuple]) -> list[tuple]:
+        agreements = pl.LazyFrame({
+            "cc": [1] * len(rows),
+            "uni": [10] * len(rows),
+            "course": [{"courseIdentifierParentId": course_id} for course_id, _ in rows],
+            "series_courses": [None] * len(rows),
+            "sending_items": [items for _, items in rows],
+            "group_conjunctions": [[{"groupConjunction": "And"}]] * len(rows),
+        }, schema_overrides={"series_courses": pl.List(pl.Struct({"courseIdentifierParentId": pl.Int64}))})
+        return sorted(articulations_to_dnf(articulations_from_agreements(agreements)).collect().rows())
+
+    first = run(rows)
+    assert all(isinstance(json.loads(row[-1])["items"][0]["items"][0], dict) for row in first)  # compact
+    assert run(rows) == first
+    assert run(rows[::-1]) == first